@@ -1,15 +1,33 @@
+import csv
+import io
 import os
-import requests
-from functools import wraps
+import sys
+import tempfile
+import threading
+import time
+import click
+import psycopg
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache, wraps
 
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, date, timezone
 from zoneinfo import ZoneInfo  # Python 3.9+from functools import wraps
 from flask import (
     Flask, render_template, request, redirect, url_for,
-    session, flash
+    session, flash, Response, stream_with_context,
+    before_render_template, template_rendered, has_request_context,
 )
 from dotenv import load_dotenv
-from psycopg_pool import ConnectionPool
+from psycopg import Cursor, ServerCursor
+from psycopg_pool import ConnectionPool, PoolTimeout, TooManyRequests
+
+from checkout import CartError, parse_cart
+from metrics import COUNT_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry, RequestTimings
+from report_cache import ReportCache
+from sql_trace import SqlTracer
+from suggest_index import BuyerSuggestIndex, ItemSuggestIndex, phone_query_digits
+from wa_client import WAClient
 
 # =========================
 # Config & App init
@@ -21,39 +39,328 @@ class Config:
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     DATABASE_URL = os.getenv("DATABASE_URL")
     TZ = os.getenv("TZ", "Asia/Jakarta")
+    # koneksi per proses; di gunicorn diisi otomatis = threads + 2 (gunicorn.conf.py)
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT_SEC", "10"))      # tunggu koneksi maks
+    DB_POOL_MAX_WAITING = int(os.getenv("DB_POOL_MAX_WAITING", "0"))         # 0 = antrean tak terbatas
+    DB_POOL_MAX_IDLE_SEC = float(os.getenv("DB_POOL_MAX_IDLE_SEC", "600"))
+    DB_POOL_MAX_LIFETIME_SEC = float(os.getenv("DB_POOL_MAX_LIFETIME_SEC", "3600"))
+    DB_POOL_SLOW_WAIT_MS = float(os.getenv("DB_POOL_SLOW_WAIT_MS", "100"))   # log kalau antre lebih lama
+    # 0 = tanpa prepared statement (wajib kalau lewat pgbouncer mode transaction)
+    DB_PREPARE = os.getenv("DB_PREPARE", "1") == "1"
+    WA_API_URL = os.getenv("WA_API_URL", "https://blast.sukipli.work/send-message")
+    WA_POOL_SIZE = int(os.getenv("WA_POOL_SIZE", "10"))                      # koneksi keep-alive ke gateway
+    WA_CONNECT_TIMEOUT_SEC = float(os.getenv("WA_CONNECT_TIMEOUT_SEC", "3.05"))
+    WA_READ_TIMEOUT_SEC = float(os.getenv("WA_READ_TIMEOUT_SEC", "10"))
+    WA_RETRIES = int(os.getenv("WA_RETRIES", "2"))                           # connect error / 429 / 5xx
+    WA_RETRY_BACKOFF_SEC = float(os.getenv("WA_RETRY_BACKOFF_SEC", "0.5"))
+    ITEM_INDEX_TTL_SEC = float(os.getenv("ITEM_INDEX_TTL_SEC", "300"))
+    BUYER_INDEX_TTL_SEC = float(os.getenv("BUYER_INDEX_TTL_SEC", "120"))
+    LAPORAN_PAGE_SIZE = int(os.getenv("LAPORAN_PAGE_SIZE", "100"))
+    BUYERS_PAGE_SIZE = int(os.getenv("BUYERS_PAGE_SIZE", "50"))
+    # cache laporan per proses; 0 = nonaktif
+    REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "128"))
+    REPORT_CACHE_TTL_SEC = float(os.getenv("REPORT_CACHE_TTL_SEC", "600"))
+    REPORT_CACHE_TODAY_TTL_SEC = float(os.getenv("REPORT_CACHE_TODAY_TTL_SEC", "15"))
+    SALES_DAILY_FLUSH_SEC = float(os.getenv("SALES_DAILY_FLUSH_SEC", "30"))   # lipat delta rekap; 0 = off
+    RECEIPT_CACHE_SIZE = int(os.getenv("RECEIPT_CACHE_SIZE", "2048"))          # nota WA jadi, per proses
+    CART_MAX_LINES = int(os.getenv("CART_MAX_LINES", "500"))                   # baris per transaksi
+    PRICE_OUTLIER_RATIO = float(os.getenv("PRICE_OUTLIER_RATIO", "3"))         # 0 = tanpa cek harga
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"                # hook latency + /metrics
+    # tracing SQL (sql_trace.py); bisa dinyalakan saat jalan lewat /debug/sql-trace
+    SQL_TRACE = os.getenv("SQL_TRACE", "0") == "1"
+    SQL_SLOW_MS = float(os.getenv("SQL_SLOW_MS", "200"))
+    SQL_N_PLUS_ONE = int(os.getenv("SQL_N_PLUS_ONE", "10"))                  # query sama per request
+    PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))   # partisi sales dibuat di muka
+    SQL_TRACE_FLAG_FILE = os.getenv("SQL_TRACE_FLAG_FILE",
+                                    os.path.join(tempfile.gettempdir(), "waserda-sql-trace"))
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.config.from_object(Config)
 STORE_NAME = "Toko Waserda"
+try:
+    # sekali saja; dipakai nota WA & export
+    LOCAL_TZ = ZoneInfo(app.config["TZ"])
+except Exception:
+    LOCAL_TZ = None
+
+# =========================
+# Metrics (Prometheus, per proses)
+# =========================
+# Diisi oleh hook request (bagian Health & metrics), TimedCursor, render
+# template dan send_wa_message; dibaca lewat GET /metrics.
+metrics = Registry()
+request_timings = RequestTimings()
+
+HTTP_REQUESTS = metrics.counter(
+    "waserda_http_requests_total", "Request HTTP per endpoint, method dan status.",
+    ("endpoint", "method", "status"))
+HTTP_SECONDS = metrics.histogram(
+    "waserda_http_request_duration_seconds", "Lama request sampai response dikembalikan ke server.",
+    ("endpoint", "method"))
+HTTP_DB_SECONDS = metrics.histogram(
+    "waserda_http_request_db_seconds", "Waktu di query DB (execute) per request.", ("endpoint",))
+HTTP_RENDER_SECONDS = metrics.histogram(
+    "waserda_http_request_render_seconds", "Waktu render template Jinja per request.", ("endpoint",))
+HTTP_PYTHON_SECONDS = metrics.histogram(
+    "waserda_http_request_python_seconds", "Sisa waktu request di luar DB, render dan WA.", ("endpoint",))
+HTTP_DB_QUERIES = metrics.histogram(
+    "waserda_http_request_db_queries", "Jumlah query DB per request.", ("endpoint",), COUNT_BUCKETS)
+DB_QUERY_SECONDS = metrics.histogram(
+    "waserda_db_query_duration_seconds", "Lama satu execute ke Postgres (semua jalur, termasuk worker).")
+WA_SEND_SECONDS = metrics.histogram(
+    "waserda_wa_send_duration_seconds", "Lama satu kiriman ke gateway WA (termasuk retry).", ("result",))
+
+sql_tracer = SqlTracer(
+    default=app.config["SQL_TRACE"],
+    slow_ms=app.config["SQL_SLOW_MS"],
+    n_plus_one=app.config["SQL_N_PLUS_ONE"],
+    flag_file=app.config["SQL_TRACE_FLAG_FILE"],
+    logger=app.logger,
+)
+
+def timed_render(chunks):
+    """
+    Bungkus template streaming (generate()): waktunya dihitung sebagai render
+    di metrik, dikurangi query DB yang berjalan di dalamnya (baris laporan).
+    """
+    t = request_timings
+    it = iter(chunks)
+    while True:
+        t0, db0 = time.perf_counter(), t.db
+        try:
+            chunk = next(it)
+        except StopIteration:
+            return
+        finally:
+            if t.active:
+                t.render += time.perf_counter() - t0 - (t.db - db0)
+        yield chunk
+
 # =========================
 # Database (PostgreSQL)
 # =========================
+class TimedCursor(Cursor):
+    """
+    Cursor pool yang mengukur tiap execute: metrik (DB_QUERY_SECONDS + request
+    berjalan) dan, kalau aktif, tracing SQL (fingerprint, baris, route).
+    """
+
+    def execute(self, query, params=None, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            record_query(time.perf_counter() - t0, self, query, self.rowcount)
+
+    def executemany(self, query, params_seq, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(query, params_seq, **kwargs)
+        finally:
+            record_query(time.perf_counter() - t0, self, query, self.rowcount)
+
+class TimedServerCursor(ServerCursor):
+    """
+    Idem untuk cursor bernama (laporan, export). Iterasi = FETCH per
+    `itersize` baris seperti bawaan psycopg, tapi tiap FETCH ikut diukur.
+    """
+
+    def execute(self, query, params=None, **kwargs):
+        self._traced_query = query
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            record_query(time.perf_counter() - t0, self, query, None)
+
+    def fetchmany(self, size: int = 0):
+        t0 = time.perf_counter()
+        rows = []
+        try:
+            rows = super().fetchmany(size)
+            return rows
+        finally:
+            record_query(time.perf_counter() - t0, self, None, len(rows))
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(self.itersize)
+            yield from rows
+            if len(rows) < self.itersize:
+                return
+
+def record_query(dt: float, cur, query, rows):
+    if app.config["METRICS_ENABLED"]:
+        DB_QUERY_SECONDS.observe(dt)
+        t = request_timings
+        if t.active:
+            t.db += dt
+            t.queries += 1
+    if sql_tracer.poll():
+        if query is None:
+            # FETCH dari cursor bernama: dikelompokkan per query DECLARE-nya
+            sql = "FETCH " + query_text(cur, getattr(cur, "_traced_query", ""))
+        else:
+            sql = query_text(cur, query)
+        route = (request.endpoint or "unmatched") if has_request_context() else threading.current_thread().name
+        sql_tracer.record(sql, dt * 1000, rows, route)
+
+def query_text(cur, query) -> str:
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode(errors="replace")
+    try:
+        return query.as_string(cur.connection)   # psycopg.sql.Composed
+    except Exception:
+        return str(query)
+
 # Kita bikin pool sejak awal walau login masih user statis,
 # supaya nanti gampang gunakan DB di halaman lain.
+# Pool belum dibuka saat import: koneksi tidak boleh ikut ter-fork ke worker
+# gunicorn. Dibuka oleh open_db_pool() (hook gunicorn / __main__), atau
+# otomatis saat db_conn() pertama kali dipanggil (CLI, wa_worker, bench).
+def configure_db_conn(conn):
+    """Dipanggil pool sekali per koneksi baru (bukan tiap checkout)."""
+    # pakai TZ dari Config (default: Asia/Jakarta)
+    conn.execute("SELECT set_config('TimeZone', %s, false)", (app.config["TZ"],))
+    conn.commit()  # pool mensyaratkan koneksi idle setelah configure
+    if not app.config["DB_PREPARE"]:
+        conn.prepare_threshold = None  # query ad-hoc juga jangan di-prepare otomatis
+    # selalu dipasang supaya tracing SQL bisa dinyalakan tanpa restart
+    conn.cursor_factory = TimedCursor
+    conn.server_cursor_factory = TimedServerCursor
+
 db_pool = None
 if app.config["DATABASE_URL"]:
-    db_pool = ConnectionPool(conninfo=app.config["DATABASE_URL"], max_size=10)
+    db_pool = ConnectionPool(
+        conninfo=app.config["DATABASE_URL"],
+        min_size=min(app.config["DB_POOL_MIN_SIZE"], app.config["DB_POOL_MAX_SIZE"]),
+        max_size=app.config["DB_POOL_MAX_SIZE"],
+        timeout=app.config["DB_POOL_TIMEOUT_SEC"],
+        max_waiting=app.config["DB_POOL_MAX_WAITING"],
+        max_idle=app.config["DB_POOL_MAX_IDLE_SEC"],
+        max_lifetime=app.config["DB_POOL_MAX_LIFETIME_SEC"],
+        configure=configure_db_conn,
+        name="waserda",
+        open=False,
+    )
+_db_pool_lock = threading.Lock()
+
+def open_db_pool(wait: bool = False):
+    """
+    Buka pool. wait=True → tunggu min_size koneksi siap (warm-up saat start),
+    supaya request pertama tidak ikut menanggung biaya connect.
+    """
+    if db_pool and db_pool.closed:
+        with _db_pool_lock:
+            if db_pool.closed:
+                db_pool.open()
+                app.logger.info("db pool open pid=%s min_size=%s max_size=%s",
+                                os.getpid(), db_pool.min_size, db_pool.max_size)
+    if db_pool and wait:
+        try:
+            db_pool.wait(timeout=app.config["DB_POOL_TIMEOUT_SEC"])
+        except Exception as e:
+            app.logger.warning("db pool warm-up failed: %s", e)
+
+def close_db_pool():
+    if db_pool and not db_pool.closed:
+        db_pool.close()
+
+class PoolTimings:
+    """Waktu tunggu & lama pinjam koneksi (ms); N sampel terakhir disimpan untuk persentil."""
+
+    def __init__(self, window: int = 2048):
+        self._lock = threading.Lock()
+        self._wait = deque(maxlen=window)
+        self._hold = deque(maxlen=window)
+        self.checkouts = 0
+        self.wait_max_ms = 0.0
+        self.hold_max_ms = 0.0
+        self.slow_waits = 0
+        self.errors = 0
+
+    def record(self, wait_ms: float, hold_ms: float):
+        with self._lock:
+            self.checkouts += 1
+            self._wait.append(wait_ms)
+            self._hold.append(hold_ms)
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            self.hold_max_ms = max(self.hold_max_ms, hold_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            wait, hold = sorted(self._wait), sorted(self._hold)
+
+        def pct(xs, p):
+            return round(xs[min(len(xs) - 1, int(len(xs) * p))], 2) if xs else None
+
+        return {
+            "checkouts": self.checkouts,
+            "wait_ms": {"p50": pct(wait, .5), "p95": pct(wait, .95), "p99": pct(wait, .99),
+                        "max": round(self.wait_max_ms, 2)},
+            "hold_ms": {"p50": pct(hold, .5), "p95": pct(hold, .95), "p99": pct(hold, .99),
+                        "max": round(self.hold_max_ms, 2)},
+            "slow_waits": self.slow_waits,
+            "checkout_errors": self.errors,
+        }
 
+pool_timings = PoolTimings()
+
+@contextmanager
 def db_conn():
     """Ambil koneksi dari pool. Gunakan: with db_conn() as conn: ..."""
     if not db_pool:
         raise RuntimeError("DATABASE_URL belum diset. Cek .env")
+    if db_pool.closed:
+        open_db_pool()
+
+    t0 = time.perf_counter()
+    try:
+        with db_pool.connection() as conn:
+            t1 = time.perf_counter()
+            wait_ms = (t1 - t0) * 1000
+            if wait_ms >= app.config["DB_POOL_SLOW_WAIT_MS"]:
+                pool_timings.slow_waits += 1
+                st = db_pool.get_stats()
+                app.logger.warning("db pool wait %.0fms (size=%s available=%s waiting=%s)",
+                                   wait_ms, st.get("pool_size"), st.get("pool_available"),
+                                   st.get("requests_waiting"))
+            try:
+                yield conn
+            finally:
+                pool_timings.record(wait_ms, (time.perf_counter() - t1) * 1000)
+    except (PoolTimeout, TooManyRequests):
+        # semua koneksi terpakai lebih lama dari DB_POOL_TIMEOUT_SEC / antrean penuh
+        pool_timings.errors += 1
+        raise
+
+def db_pool_stats() -> dict:
+    """Statistik pool: bawaan psycopg_pool (kumulatif sejak start) + waktu tunggu/pinjam."""
+    if not db_pool:
+        return {}
+    return {"pool": db_pool.get_stats(), "closed": db_pool.closed, **pool_timings.stats()}
+
+# ---------- Prepared statements ----------
+# SQL di jalur panas didaftarkan dengan nama dan dijalankan lewat run_stmt().
+# psycopg mem-PREPARE statement saat pertama dipakai di tiap koneksi pool,
+# lalu request berikutnya hanya mengirim nama + parameter (tanpa parse/plan
+# ulang). Cache prepared per koneksi ikut hilang saat koneksi di-recycle,
+# dan psycopg membuang semuanya setiap ada ROLLBACK di koneksi itu (lalu
+# di-prepare lagi saat dipakai) → jangan rollback di jalur normal.
+STATEMENTS = {}
 
-#    with db_pool.connection() as conn:
-#        try:
-#            with conn.cursor() as cur:
-#                # pakai TZ dari Config (default: Asia/Jakarta)
-#                cur.execute("SET TIME ZONE %s", (app.config["TZ"],))
-#        except Exception as e:
-#            # tidak fatal, tapi log supaya kelihatan kalau gagal
-#            app.logger.warning("SET TIME ZONE gagal: %s", e)
-#        yield conn
-    return db_pool.connection()
+def statement(name: str, sql: str) -> str:
+    """Daftarkan SQL dengan nama; return sql supaya bisa dipakai sebagai konstanta."""
+    STATEMENTS[name] = sql
+    return sql
 
-#with db_conn() as conn:
-#    with conn.cursor() as cur:
-#        cur.execute("SELECT now(), current_setting('TimeZone')")
-#        app.logger.debug("DB now=%s TZ=%s", *cur.fetchone())
+def run_stmt(cur, name: str, params=()):
+    """cur.execute statement terdaftar; di-prepare kecuali DB_PREPARE=0."""
+    return cur.execute(STATEMENTS[name], params, prepare=app.config["DB_PREPARE"])
 
 
 # =========================
@@ -71,52 +378,266 @@ def login_required(fn):
     return wrapper
 
 
+@lru_cache(maxsize=8192)
+def _rupiah(n: int) -> str:
+    # harga & total yang sama muncul berulang (nota, laporan) → cukup format sekali
+    return "Rp " + f"{n:,}".replace(",", ".")
+
 def rupiah(n: int) -> str:
     # format "Rp 12.345" tanpa desimal
-    return "Rp {:,}".format(int(n)).replace(",", ".")
+    return _rupiah(int(n))
 
 @app.template_filter("rupiah")
 def jinja_rupiah(value):
     try:
-        return "Rp " + f"{int(value):,}".replace(",", ".")
+        return _rupiah(int(value))
     except Exception:
         return "Rp 0"
 
-def build_receipt_text(*, sale_date: str, buyer_name: str, items: list, total: int, paid: int, change: int) -> str:
-    """
-    items: list[ {nama, qty, jual} ] — harga beli tidak dikirim ke pembeli
-    """
-    # Tanggal & jam lokal
-    try:
-        now_local = datetime.now(ZoneInfo(app.config.get("TZ", "Asia/Jakarta")))
-        ts = now_local.strftime("%Y-%m-%d %H:%M")
-    except Exception:
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M")
+# ---------- Nota WA ----------
+# Bagian tetap nota dirangkai sekali di sini; per nota tinggal format angka
+# dan sambung string. Nota yang sudah jadi di-memo per (sale_id, isi), jadi
+# kirim ulang / retry nota yang sama tidak merender ulang.
+RECEIPT_LINE = "--------------------------------"
+_RECEIPT_HEAD = "*" + STORE_NAME.replace("{", "{{").replace("}", "}}") + "*\nNota Belanja\nTanggal : {} {}\n"
+_RECEIPT_BUYER = "Pembeli : {}\n"
+_RECEIPT_ITEM = "{}\n{} x {} = {}\n"
+_RECEIPT_FOOT = (RECEIPT_LINE + "\nTotal   : *{}*\nBayar   : {}\nKembali : {}\n"
+                 + RECEIPT_LINE + "\nTerima kasih 🙏")
 
-    lines = []
-    lines.append(f"*{STORE_NAME}*")
-    lines.append("Nota Belanja")
-    lines.append(f"Tanggal : {sale_date} {ts[11:]}")
+def _receipt_time(created_at) -> str:
+    # jam transaksi kalau ada; tanpa itu jam sekarang (perilaku lama)
+    t = created_at or datetime.now(LOCAL_TZ)
+    if LOCAL_TZ and t.tzinfo:
+        t = t.astimezone(LOCAL_TZ)
+    return f"{t.hour:02d}:{t.minute:02d}"
+
+def _render_receipt(sale_date, time_str, buyer_name, items, total, paid, change) -> str:
+    parts = [_RECEIPT_HEAD.format(sale_date, time_str)]
     if buyer_name:
-        lines.append(f"Pembeli : {buyer_name}")
-    lines.append("--------------------------------")
-    # Daftar barang
-    for it in items:
-        nama = it["nama"]
-        qty  = int(it["qty"])
-        jual = int(it["jual"])
-        subtotal = qty * jual
+        parts.append(_RECEIPT_BUYER.format(buyer_name))
+    parts.append(RECEIPT_LINE + "\n")
+    item_fmt = _RECEIPT_ITEM.format
+    for nama, qty, jual in items:
         # contoh: Indomie Goreng
         #         2 x Rp 3.500 = Rp 7.000
-        lines.append(nama)
-        lines.append(f"{qty} x {rupiah(jual)} = {rupiah(subtotal)}")
-    lines.append("--------------------------------")
-    lines.append(f"Total   : *{rupiah(total)}*")
-    lines.append(f"Bayar   : {rupiah(paid)}")
-    lines.append(f"Kembali : {rupiah(change)}")
-    lines.append("--------------------------------")
-    lines.append("Terima kasih 🙏")
-    return "\n".join(lines)
+        parts.append(item_fmt(nama, qty, _rupiah(jual), _rupiah(qty * jual)))
+    parts.append(_RECEIPT_FOOT.format(_rupiah(total), _rupiah(paid), _rupiah(change)))
+    return "".join(parts)
+
+@lru_cache(maxsize=app.config["RECEIPT_CACHE_SIZE"])
+def _render_receipt_cached(sale_id, sale_date, time_str, buyer_name, items, total, paid, change) -> str:
+    # sale_id ikut di key: isi sama milik transaksi lain tidak berbagi entri
+    return _render_receipt(sale_date, time_str, buyer_name, items, total, paid, change)
+
+def build_receipt_text(*, sale_date: str, buyer_name: str, items: list, total: int, paid: int, change: int,
+                       sale_id=None, created_at=None) -> str:
+    """
+    items: list[ {nama, qty, jual} ] — harga beli tidak dikirim ke pembeli.
+    Dengan sale_id (+ created_at untuk jam nota) hasilnya di-memo per isi nota.
+    """
+    lines = ((it["nama"], int(it["qty"]), int(it["jual"])) for it in items)
+    if sale_id is None:
+        return _render_receipt(sale_date, _receipt_time(created_at), buyer_name, lines,
+                               int(total), int(paid), int(change))
+    # key memo = sale_id + seluruh isi nota (baris barang jadi tuple supaya bisa di-hash)
+    return _render_receipt_cached(str(sale_id), sale_date, _receipt_time(created_at), buyer_name,
+                                  tuple(lines), int(total), int(paid), int(change))
+
+def receipt_cache_stats() -> dict:
+    info = _render_receipt_cached.cache_info()
+    total = info.hits + info.misses
+    return {"entries": info.currsize, "maxsize": info.maxsize, "hits": info.hits, "misses": info.misses,
+            "hit_ratio": round(info.hits / total, 3) if total else None}
+
+# =========================
+# WhatsApp
+# =========================
+# Nota WA tidak dikirim di dalam request checkout. Transaksi cukup ditandai
+# wa_status='pending' (outbox) lalu wa_worker.py yang mengirim + retry.
+WA_OUTBOX_CHANNEL = "wa_outbox"
+
+def wa_number(phone) -> str:
+    # API WA pakai format 62xxxxxxxx (tanpa tanda +)
+    return (phone or "").strip().lstrip("+").strip()
+
+wa_client = WAClient(
+    app.config["WA_API_URL"],
+    pool_size=app.config["WA_POOL_SIZE"],
+    connect_timeout=app.config["WA_CONNECT_TIMEOUT_SEC"],
+    read_timeout=app.config["WA_READ_TIMEOUT_SEC"],
+    retries=app.config["WA_RETRIES"],
+    backoff=app.config["WA_RETRY_BACKOFF_SEC"],
+)
+
+def send_wa_message(number: str, message: str):
+    """Kirim satu pesan ke gateway WA (koneksi keep-alive). Return (ok, status_code, body)."""
+    t0 = time.perf_counter()
+    result = "error"
+    try:
+        ok, status_code, body = wa_client.send(number, message)
+        result = "ok" if ok else "http_error"
+        return ok, status_code, body
+    finally:
+        dt = time.perf_counter() - t0
+        WA_SEND_SECONDS.observe(dt, result)
+        if request_timings.active:
+            request_timings.wa += dt
+# =========================
+# Saran barang (index di memori)
+# =========================
+# item_stats dijaga trigger di sale_items (migrations/002_item_stats.sql),
+# jadi query ini tidak ikut melambat walau histori penjualan jutaan baris.
+SQL_ITEM_SUGGEST_COLUMNS = """
+    item_key, last_name, last_sale_price, last_cost_price,
+    round(sum_sale_price / NULLIF(times, 0)) AS avg_sale_price,
+    round(sum_cost_price / NULLIF(times, 0)) AS avg_cost_price,
+    times, total_qty, last_sold
+"""
+
+def item_suggest_row(r) -> dict:
+    return {
+        "item_key": r[0],
+        "name": r[1],
+        "last_sale_price": int(r[2] or 0),
+        "last_cost_price": int(r[3] or 0),
+        "avg_sale_price": int(r[4] or 0),
+        "avg_cost_price": int(r[5] or 0),
+        "times": int(r[6] or 0),
+        "total_qty": int(r[7] or 0),
+        "last_sold": r[8].isoformat() if r[8] else None
+    }
+
+def like_escape(s: str) -> str:
+    """Escape wildcard LIKE (\\, %, _) supaya input user dicari apa adanya."""
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+statement("item_suggest_all", f"SELECT {SQL_ITEM_SUGGEST_COLUMNS} FROM item_stats")
+statement("item_suggest_top", f"""
+    SELECT {SQL_ITEM_SUGGEST_COLUMNS}
+    FROM item_stats
+    ORDER BY times DESC, last_sold DESC
+    LIMIT %s
+""")
+statement("item_suggest_prefix", f"""
+    SELECT {SQL_ITEM_SUGGEST_COLUMNS}
+    FROM item_stats
+    WHERE item_key LIKE %s
+    ORDER BY times DESC, last_sold DESC
+    LIMIT %s
+""")
+
+def load_item_suggest_rows():
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            run_stmt(cur, "item_suggest_all")
+            return [item_suggest_row(r) for r in cur.fetchall()]
+
+def item_suggest_fallback_query(q: str, limit: int):
+    """(nama statement, params) prefix langsung ke item_stats, dipakai kalau index di memori gagal."""
+    if not q:
+        return "item_suggest_top", (limit,)
+    return "item_suggest_prefix", (like_escape(q) + "%", limit)
+
+item_index = ItemSuggestIndex(load_item_suggest_rows, ttl=app.config["ITEM_INDEX_TTL_SEC"])
+
+def warm_up():
+    """Isi cache/index di memori saat start (gagal tidak fatal, nanti dimuat saat dipakai)."""
+    if not db_pool:
+        return
+    start_report_cache_listener()
+    try:
+        n = item_index.load()
+        app.logger.info("item index loaded: %s items", n)
+    except Exception as e:
+        app.logger.warning("item index warm-up failed: %s", e)
+    try:
+        n = buyer_index.load()
+        app.logger.info("buyer index loaded: %s buyers", n)
+    except Exception as e:
+        app.logger.warning("buyer index warm-up failed: %s", e)
+    try:
+        probe_report_sources(force=True)
+        start_sales_daily_flusher()
+    except Exception as e:
+        app.logger.warning("probe report sources failed: %s", e)
+    try:
+        probe_buyer_search(force=True)
+    except Exception as e:
+        app.logger.warning("probe buyer search failed: %s", e)
+    try:
+        if probe_sales_schema(force=True)["partitioned"]:
+            n = ensure_sales_partitions(app.config["PARTITION_MONTHS_AHEAD"])
+            app.logger.info("sales partitions ready: %s created", n)
+    except Exception as e:
+        app.logger.warning("ensure sales partitions failed: %s", e)
+
+@app.cli.command("rebuild-item-stats")
+def rebuild_item_stats_cmd():
+    """Hitung ulang tabel item_stats dari seluruh sale_items."""
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT item_stats_rebuild()")
+            n = cur.fetchone()[0]
+    print(f"item_stats: {n} barang")
+
+@app.cli.command("rebuild-sales-daily")
+@click.option("--from", "from_date", default=None, help="YYYY-MM-DD (default: semua)")
+@click.option("--to", "to_date", default=None, help="YYYY-MM-DD (default: semua)")
+def rebuild_sales_daily_cmd(from_date, to_date):
+    """Hitung ulang rollup sales_daily dari tabel sales."""
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT sales_daily_rebuild(%s, %s)", (from_date, to_date))
+            n = cur.fetchone()[0]
+    print(f"sales_daily: {n} hari")
+
+@app.cli.command("flush-sales-daily")
+def flush_sales_daily_cmd():
+    """Lipat delta rekap harian (migrasi 010) ke sales_daily sekarang."""
+    print(f"sales_daily: {flush_sales_daily()} hari diperbarui")
+
+@app.cli.command("check-sales-daily")
+@click.option("--from", "from_date", default=None, help="YYYY-MM-DD (default: semua)")
+@click.option("--to", "to_date", default=None, help="YYYY-MM-DD (default: semua)")
+def check_sales_daily_cmd(from_date, to_date):
+    """Bandingkan sales_daily dengan agregat mentah sales. Exit 1 kalau ada selisih."""
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT * FROM sales_daily_check(%s, %s)", (from_date, to_date))
+            rows = cur.fetchall()
+    for day, r_trx, trx, r_amt, amt, r_laba, laba in rows:
+        print(f"{day}: trx {r_trx} vs {trx}, penjualan {r_amt} vs {amt}, laba {r_laba} vs {laba}")
+    if rows:
+        print(f"{len(rows)} hari tidak cocok (rollup vs sales). Jalankan rebuild-sales-daily.")
+        sys.exit(1)
+    print("sales_daily cocok dengan sales")
+
+@app.cli.command("ensure-partitions")
+@click.option("--months-ahead", type=int, default=None,
+              help="jumlah bulan ke depan (default: PARTITION_MONTHS_AHEAD)")
+@click.option("--from", "from_date", default=None, help="YYYY-MM-DD (default: bulan ini)")
+def ensure_partitions_cmd(months_ahead, from_date):
+    """Buat partisi bulanan sales/sale_items yang belum ada (aman dijalankan dari cron)."""
+    if months_ahead is None:
+        months_ahead = app.config["PARTITION_MONTHS_AHEAD"]
+    n = ensure_sales_partitions(months_ahead, from_date)
+    print(f"partisi sales: {n} bulan baru")
+
+@app.cli.command("detach-sales-month")
+@click.argument("month")
+def detach_sales_month_cmd(month):
+    """Lepas partisi satu bulan (YYYY-MM) menjadi tabel archived_sales_*/archived_sale_items_*."""
+    try:
+        first = datetime.strptime(month, "%Y-%m").date()
+    except ValueError:
+        raise click.BadParameter("format bulan YYYY-MM", param_hint="MONTH")
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT detach_sales_month(%s)", (first,))
+            tables = cur.fetchone()[0]
+    print(f"diarsip: {tables}")
+
 # =========================
 # Routes
 # =========================
@@ -147,18 +668,131 @@ def logout():
     session.clear()
     return redirect(url_for("login"))
 
+# Partisi bulanan sales/sale_items (migrasi 008). Partisi dibuat di muka saat
+# start / cron (flask ensure-partitions); checkout untuk bulan di luar itu
+# (mis. input tanggal lampau) membuatnya dulu dalam transaksi pendek sendiri.
+# Database yang belum menjalankan 008 (sale_items tanpa sale_date) tetap
+# dilayani: diputuskan sekali lewat probe_sales_schema(), statement sale_items
+# didaftar ulang ke versi lama (lihat probe_report_sources).
+SALES_SCHEMA = {}
+
+def sales_partitioned() -> bool:
+    return SALES_SCHEMA.get("partitioned", True)
+
+SQL_SALES_PARTITIONS_ENSURE = statement("sales_partitions_ensure",
+                                        "SELECT ensure_sales_partitions(%s::date, %s::date)")
+# "YYYY-MM" yang partisinya sudah pasti ada (per proses)
+SALES_PARTITION_MONTHS = set()
+
+def month_span(first: date, last: date):
+    """'YYYY-MM' tiap bulan dari first sampai last."""
+    y, m = first.year, first.month
+    while (y, m) <= (last.year, last.month):
+        yield f"{y:04d}-{m:02d}"
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+
+def ensure_sales_partitions(months_ahead: int, from_date: str = None) -> int:
+    """Buat partisi bulan from_date (default bulan ini) s/d months_ahead bulan ke depan. Return jumlah baru."""
+    first = (date.fromisoformat(from_date) if from_date else date.today()).replace(day=1)
+    y, m = divmod(first.month - 1 + months_ahead, 12)
+    last = date(first.year + y, m + 1, 1)
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            run_stmt(cur, "sales_partitions_ensure", (first, last))
+            n = cur.fetchone()[0]
+    SALES_PARTITION_MONTHS.update(month_span(first, last))
+    return n
+
+SQL_SALE_HEADER_INSERT = statement("sale_header_insert", f"""
+    WITH s AS (
+        INSERT INTO sales
+          (sale_date, buyer_id, total_amount, total_cost, total_profit,
+           paid_amount, change_amount, wa_status)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,
+                CASE WHEN EXISTS (
+                       SELECT 1 FROM buyers
+                       WHERE id = %s AND btrim(COALESCE(phone_e164,'')) <> ''
+                     ) THEN 'pending' ELSE 'none' END)
+        RETURNING id, wa_status
+    )
+    SELECT s.id, s.wa_status,
+           CASE WHEN s.wa_status = 'pending' THEN pg_notify('{WA_OUTBOX_CHANNEL}', '') END
+    FROM s
+""")
+
+SQL_SALE_ITEMS_INSERT = statement("sale_items_insert", """
+    INSERT INTO sale_items
+      (sale_id, sale_date, item_name, cost_price, sale_price, qty, line_total, line_cost, line_profit)
+    SELECT %s, %s, u.*
+    FROM unnest(%s::text[], %s::bigint[], %s::bigint[], %s::int[],
+                %s::bigint[], %s::bigint[], %s::bigint[]) AS u
+""")
+# sebelum 008: parameter sama, sale_date tidak disimpan
+SQL_SALE_ITEMS_INSERT_NO_DATE = """
+    INSERT INTO sale_items
+      (sale_id, item_name, cost_price, sale_price, qty, line_total, line_cost, line_profit)
+    SELECT p.sale_id, u.*
+    FROM (SELECT %s::uuid AS sale_id, %s::date AS sale_date) p,
+         unnest(%s::text[], %s::bigint[], %s::bigint[], %s::int[],
+                %s::bigint[], %s::bigint[], %s::bigint[]) AS u
+"""
+
+SQL_SALES_SCHEMA_PROBE = """
+    SELECT EXISTS (SELECT 1 FROM pg_attribute
+                   WHERE attrelid = to_regclass('sale_items') AND attname = 'sale_date'
+                     AND NOT attisdropped)
+"""
+
+def set_sales_schema(partitioned: bool):
+    """Hasil probe (juga dipakai app_async.py, yang memprobe lewat pool async)."""
+    SALES_SCHEMA["partitioned"] = partitioned
+    statement("sale_items_insert", SQL_SALE_ITEMS_INSERT if partitioned else SQL_SALE_ITEMS_INSERT_NO_DATE)
+    statement("sale_detail_items", SQL_SALE_DETAIL_ITEMS if partitioned else SQL_SALE_DETAIL_ITEMS_NO_DATE)
+    app.logger.info("sales schema: %s", "partitioned" if partitioned else "before migration 008")
+
+def probe_sales_schema(force: bool = False) -> dict:
+    if SALES_SCHEMA and not force:
+        return SALES_SCHEMA
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(SQL_SALES_SCHEMA_PROBE)
+            set_sales_schema(cur.fetchone()[0])
+    return SALES_SCHEMA
+
+def parse_sale(data: dict, lookup=None):
+    """
+    Body JSON checkout → parameter SQL_SALE_HEADER_INSERT & SQL_SALE_ITEMS_INSERT.
+    Validasi + hitung total sekali jalan (checkout.parse_cart); CartError kalau
+    data tidak valid. `lookup` (ItemSuggestIndex.lookup) mengaktifkan cek harga
+    terhadap statistik barang. Dipakai juga oleh app_async.py.
+    """
+    cart = parse_cart(data, lookup=lookup,
+                      outlier_ratio=app.config["PRICE_OUTLIER_RATIO"],
+                      max_lines=app.config["CART_MAX_LINES"])
+    return {
+        "tgl": cart.tgl,
+        "header": (cart.tgl, cart.buyer_id, cart.total, cart.cost, cart.profit,
+                   cart.paid, cart.change, cart.buyer_id),
+        # kolom detail dalam bentuk array → satu INSERT ... unnest() untuk semua baris
+        "columns": cart.columns,
+        "warnings": cart.warnings,
+    }
+
+def sale_committed(sale: dict):
+    """Update state di memori setelah transaksi commit."""
+    names, costs, prices, qtys = sale["columns"][:4]
+    # barang baru/harga terbaru langsung muncul di saran
+    item_index.record_sale(sale["tgl"], zip(names, costs, prices, qtys))
+    report_cache.invalidate_date(sale["tgl"])
+    SALES_PARTITION_MONTHS.add(sale["tgl"][:7])
+
 @app.route("/penjualan")
 @login_required
 def penjualan():
     # sementara hanya placeholder, nanti kita isi HTML Jinja atau render halaman JS/Tailwind
     #return render_template("base.html", page_title="Penjualan", body="<div class='p-4'>Halaman Penjualan (placeholder)</div>")
-    buyers = []
-    with db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, name, phone_e164 FROM buyers ORDER BY name ASC LIMIT 500")
-            for rid, name, phone in cur.fetchall():
-                buyers.append({"id": rid, "name": name, "phone_e164": phone})
-    return render_template("penjualan.html", buyers=buyers)
+    # pembeli tidak dirender di halaman; dicari lewat /api/buyers/suggest
+    return render_template("penjualan.html")
 
 @app.route("/penjualan", methods=["POST"])
 @login_required
@@ -173,163 +807,188 @@ def penjualan_save():
     }
     Simpan ke sales + sale_items dalam satu transaksi.
     """
-    data = request.get_json(silent=True) or {}
-    tgl = data.get("tgl")
-    buyer_id = data.get("buyer_id")
-    items = data.get("items") or []
-    paid_amount = int(data.get("paid_amount") or 0)
-
-    if not tgl or not buyer_id or not items:
-      return {"ok": False, "error": "Data tidak lengkap"}, 400
-
-    # hitung total untuk header (sebenarnya trigger juga akan menghitung, tapi kita isi saja)
-    total_amount = sum(int(it["jual"]) * int(it["qty"]) for it in items)
-    total_cost   = sum(int(it["beli"]) * int(it["qty"]) for it in items)
-    total_profit = total_amount - total_cost
-    change_amount = max(0, paid_amount - total_amount)
+    try:
+        sale = parse_sale(request.get_json(silent=True) or {}, item_index.lookup)
+    except CartError as e:
+        return {"ok": False, "error": str(e)}, 400
 
     try:
+        # 0) bulan di luar partisi yang dibuat di muka → buat dulu di transaksi
+        #    sendiri: CREATE TABLE ... PARTITION OF mengunci sales sampai commit,
+        #    jangan sampai ikut tertahan selama transaksi checkout.
+        probe_sales_schema()
+        if sales_partitioned() and sale["tgl"][:7] not in SALES_PARTITION_MONTHS:
+            ensure_sales_partitions(0, sale["tgl"])
+
         with db_conn() as conn:
             with conn.cursor() as cur:
-                # ambil info pembeli dulu (untuk WA)
-                cur.execute("SELECT name, phone_e164 FROM buyers WHERE id=%s", (buyer_id,))
-                row = cur.fetchone()
-                if row:
-                    buyer_name, buyer_phone = row[0], row[1]
-                wa_status = 'pending' if (buyer_phone and buyer_phone.strip()) else 'none'
-                # 1) insert sales (header)
-                cur.execute("""
-                    INSERT INTO sales
-                      (sale_date, buyer_id, total_amount, total_cost, total_profit,
-                       paid_amount, change_amount, wa_status)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-                    RETURNING id
-                """, (tgl, buyer_id, total_amount, total_cost, total_profit, paid_amount, change_amount, wa_status))
+                # 1) insert sales (header) + cek nomor WA pembeli dalam satu query.
+                #    'pending' = masuk outbox; pg_notify baru terkirim saat commit
+                #    dan membangunkan wa_worker.
+                run_stmt(cur, "sale_header_insert", sale["header"])
                 sale_id = cur.fetchone()[0]
 
-                # 2) insert items (detail)
-                for it in items:
-                    nama = it["nama"]
-                    beli = int(it["beli"])
-                    jual = int(it["jual"])
-                    qty  = int(it["qty"])
-                    line_total  = jual * qty
-                    line_cost   = beli * qty
-                    line_profit = line_total - line_cost
-
-                    cur.execute("""
-                        INSERT INTO sale_items
-                          (sale_id, item_name, cost_price, sale_price, qty, line_total, line_cost, line_profit)
-                        VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-                    """, (sale_id, nama, beli, jual, qty, line_total, line_cost, line_profit))
+                # 2) insert items (detail) sekaligus, 1 round trip berapapun isi keranjang
+                run_stmt(cur, "sale_items_insert", (sale_id, sale["tgl"], *sale["columns"]))
 
                 # 3) selesai → commit otomatis (keluar from-with)
-#        return {"ok": True, "sale_id": sale_id}
     except Exception as e:
         app.logger.exception("Gagal simpan transaksi")
         return {"ok": False, "error": str(e)}, 500
 
-    # === Kirim WA setelah transaksi disimpan ===
-    # Jika tidak ada nomor, cukup kembalikan sukses tanpa kirim.
-    if not buyer_phone:
-        return {"ok": True, "sale_id": sale_id}
-
-    # Build pesan nota
-    message_text = build_receipt_text(
-        sale_date=tgl,
-        buyer_name=buyer_name or "",
-        items=[{"nama": it["nama"], "qty": it["qty"], "jual": it["jual"]} for it in items],
-        total=total_amount,
-        paid=paid_amount,
-        change=change_amount
-    )
-
-    # Pastikan nomor dalam format 62xxxxxxxx (API kamu tidak pakai tanda +)
-    number = (buyer_phone or "").lstrip("+").strip()
-
-    try:
-        resp = requests.post(
-            "https://blast.sukipli.work/send-message",
-            json={"number": number, "message": message_text},
-            timeout=10
-        )
-        ok = 200 <= resp.status_code < 300
-        with db_conn() as conn:
-            with conn.cursor() as cur:
-                if ok:
-                    cur.execute(
-                        "UPDATE sales SET wa_status='sent', wa_sent_at=now() WHERE id=%s",
-                        (sale_id,)
-                    )
-                else:
-                    cur.execute(
-                        "UPDATE sales SET wa_status='failed' WHERE id=%s",
-                        (sale_id,)
-                    )
-        app.logger.info("WA send status=%s body=%s", resp.status_code, resp.text)
-    except Exception as e:
-        app.logger.warning("WA send failed: %s", e)
-        # tandai failed
-        try:
-            with db_conn() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("UPDATE sales SET wa_status='failed' WHERE id=%s", (sale_id,))
-        except Exception:
-            pass
-
-    return {"ok": True, "sale_id": sale_id}
+    sale_committed(sale)
+    if sale["warnings"]:
+        app.logger.warning("sale %s price warnings: %s", sale_id, sale["warnings"])
+    return {"ok": True, "sale_id": sale_id, "warnings": sale["warnings"]}
 
 @app.get("/api/items/suggest")
 @login_required
 def api_items_suggest():
     """
     Query param:
-      - q: prefix nama barang (case-insensitive). kosong -> item terlaris terbaru
+      - q: nama barang (case-insensitive): prefix, awal kata, substring, atau fuzzy.
+           kosong -> item terlaris terbaru
       - limit: default 12
     """
     q = (request.args.get("q") or "").strip().lower()
     limit = min(int(request.args.get("limit") or 12), 50)
 
+    try:
+        item_index.ensure_fresh()
+        return {"ok": True, "items": item_index.search(q, limit)}
+    except Exception as e:
+        app.logger.warning("item index unavailable: %s. Fallback query item_stats.", e)
+
     rows = []
     try:
       with db_conn() as conn:
         with conn.cursor() as cur:
-          if q:
-            cur.execute("""
-              SELECT item_key, last_name, last_sale_price, last_cost_price,
-                     avg_sale_price, avg_cost_price, times, total_qty, last_sold
-              FROM v_item_suggest
-              WHERE item_key LIKE %s
-              ORDER BY times DESC, last_sold DESC
-              LIMIT %s
-            """, (q + "%", limit))
-          else:
-            cur.execute("""
-              SELECT item_key, last_name, last_sale_price, last_cost_price,
-                     avg_sale_price, avg_cost_price, times, total_qty, last_sold
-              FROM v_item_suggest
-              ORDER BY times DESC, last_sold DESC
-              LIMIT %s
-            """, (limit,))
-          for r in cur.fetchall():
-            rows.append({
-              "item_key": r[0],
-              "name": r[1],
-              "last_sale_price": int(r[2] or 0),
-              "last_cost_price": int(r[3] or 0),
-              "avg_sale_price": int(r[4] or 0),
-              "avg_cost_price": int(r[5] or 0),
-              "times": int(r[6] or 0),
-              "total_qty": int(r[7] or 0),
-              "last_sold": r[8].isoformat() if r[8] else None
-            })
+          run_stmt(cur, *item_suggest_fallback_query(q, limit))
+          rows = [item_suggest_row(r) for r in cur.fetchall()]
     except Exception as e:
       app.logger.exception("items suggest failed: %s", e)
       return {"ok": False, "error": "DB error"}, 500
 
     return {"ok": True, "items": rows}
 
-# Hanya jika belum ada
+# ---------- Pencarian pembeli ----------
+# Dengan migrations/005_buyers_search.sql: trigram (pg_trgm) untuk nama dan
+# kolom phone_digits untuk nomor, hasil diurut skor relevansi. Sebelum
+# migrasi jalan, pakai ILIKE lama (scan penuh) supaya halaman tetap hidup.
+BUYER_SEARCH = {}
+
+def probe_buyer_search(force: bool = False) -> dict:
+    if BUYER_SEARCH and not force:
+        return BUYER_SEARCH
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT to_regclass('buyers_name_trgm_idx') IS NOT NULL
+                   AND to_regclass('buyers_phone_digits_trgm_idx') IS NOT NULL
+            """)
+            trgm = cur.fetchone()[0]
+    BUYER_SEARCH["mode"] = "trgm" if trgm else "ilike"
+    app.logger.info("buyer search: %s", BUYER_SEARCH["mode"])
+    return BUYER_SEARCH
+
+SQL_BUYER_COLUMNS = "id, name, phone_e164, wa_opt_in, note"
+statement("buyers_list", f"""
+    SELECT {SQL_BUYER_COLUMNS}, NULL::real AS score
+    FROM buyers
+    ORDER BY created_at DESC, id
+    LIMIT %(limit)s OFFSET %(offset)s
+""")
+# skor: awalan nama (+1), mengandung q (+1), word_similarity 0..1
+statement("buyers_search_name", f"""
+    SELECT {SQL_BUYER_COLUMNS},
+           ((lower(name) LIKE %(prefix)s)::int
+            + (lower(name) LIKE %(contains)s)::int
+            + word_similarity(%(q)s, lower(name)))::real AS score
+    FROM buyers
+    WHERE lower(name) LIKE %(contains)s OR %(q)s <%% lower(name)
+    ORDER BY score DESC, lower(name), id
+    LIMIT %(limit)s OFFSET %(offset)s
+""")
+statement("buyers_search_name_short", f"""
+    SELECT {SQL_BUYER_COLUMNS}, 2::real AS score
+    FROM buyers
+    WHERE lower(name) LIKE %(prefix)s
+    ORDER BY lower(name), id
+    LIMIT %(limit)s OFFSET %(offset)s
+""")
+statement("buyers_search_phone", f"""
+    SELECT {SQL_BUYER_COLUMNS},
+           (1 + (phone_digits LIKE %(prefix)s)::int)::real AS score
+    FROM buyers
+    WHERE phone_digits LIKE %(contains)s
+    ORDER BY score DESC, phone_digits, id
+    LIMIT %(limit)s OFFSET %(offset)s
+""")
+statement("buyers_search_ilike", f"""
+    SELECT {SQL_BUYER_COLUMNS}, NULL::real AS score
+    FROM buyers
+    WHERE (name ILIKE %(contains)s OR COALESCE(phone_e164,'') ILIKE %(contains)s)
+    ORDER BY name ASC, id
+    LIMIT %(limit)s OFFSET %(offset)s
+""")
+
+def buyer_search_query(q: str, limit: int, offset: int):
+    """(nama statement, params) untuk daftar/pencarian pembeli."""
+    page = {"limit": limit, "offset": offset}
+    if not q:
+        return "buyers_list", page
+    if probe_buyer_search()["mode"] != "trgm":
+        return "buyers_search_ilike", {**page, "contains": f"%{like_escape(q)}%"}
+
+    digits = phone_query_digits(q)
+    if digits:
+        return "buyers_search_phone", {**page, "prefix": digits + "%", "contains": f"%{digits}%"}
+
+    q = q.lower()
+    params = {**page, "q": q, "prefix": like_escape(q) + "%", "contains": f"%{like_escape(q)}%"}
+    if len(q) < 3:
+        return "buyers_search_name_short", params
+    return "buyers_search_name", params
+
+# ---------- Saran pembeli (typeahead checkout) ----------
+statement("buyers_suggest_all", "SELECT id, name, phone_e164 FROM buyers")
+
+def load_buyer_suggest_rows():
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            run_stmt(cur, "buyers_suggest_all")
+            return [{"id": rid, "name": name, "phone_e164": phone} for rid, name, phone in cur.fetchall()]
+
+buyer_index = BuyerSuggestIndex(load_buyer_suggest_rows, ttl=app.config["BUYER_INDEX_TTL_SEC"])
+
+@app.get("/api/buyers/suggest")
+@login_required
+def api_buyers_suggest():
+    """
+    Query param:
+      - q: awalan/awal kata/potongan nama, atau nomor HP (08xx / 62xx)
+           kosong -> pembeli urut nama
+      - limit: default 10
+    """
+    q = (request.args.get("q") or "").strip()
+    limit = min(request.args.get("limit", type=int) or 10, 50)
+
+    try:
+        buyer_index.ensure_fresh()
+        return {"ok": True, "buyers": buyer_index.search(q, limit)}
+    except Exception as e:
+        app.logger.warning("buyer index unavailable: %s. Fallback query buyers.", e)
+
+    try:
+        with db_conn() as conn:
+            with conn.cursor() as cur:
+                run_stmt(cur, *buyer_search_query(q, limit, 0))
+                buyers = [{"id": str(r[0]), "name": r[1], "phone_e164": r[2]} for r in cur.fetchall()]
+    except Exception as e:
+        app.logger.exception("buyers suggest failed: %s", e)
+        return {"ok": False, "error": "DB error"}, 500
+    return {"ok": True, "buyers": buyers}
+
 @app.route("/pembeli", methods=["GET", "POST"])
 @login_required
 def pembeli_page():
@@ -349,38 +1008,34 @@ def pembeli_page():
                     cur.execute("""
                         INSERT INTO buyers (name, phone_e164, wa_opt_in, note)
                         VALUES (%s,%s,%s,%s)
+                        RETURNING id
                     """, (name, phone, wa_opt_in, note))
+                    bid = cur.fetchone()[0]
+            buyer_index.upsert({"id": bid, "name": name, "phone_e164": phone})
             flash("Pembeli ditambahkan", "success")
         except Exception as e:
             app.logger.exception("insert buyer failed")
             flash(f"Gagal simpan: {e}", "error")
         return redirect(url_for("pembeli_page"))
 
-    # GET list (with search)
+    # GET list (with search), per halaman
     q = (request.args.get("q") or "").strip()
+    page = max(1, request.args.get("page", type=int) or 1)
+    size = app.config["BUYERS_PAGE_SIZE"]
     buyers = []
     try:
         with db_conn() as conn:
             with conn.cursor() as cur:
-                if q:
-                    cur.execute("""
-                        SELECT id, name, phone_e164, wa_opt_in, note
-                        FROM buyers
-                        WHERE (name ILIKE %s OR COALESCE(phone_e164,'') ILIKE %s)
-                        ORDER BY name ASC LIMIT 1000
-                    """, (f"%{q}%", f"%{q}%"))
-                else:
-                    cur.execute("""
-                        SELECT id, name, phone_e164, wa_opt_in, note
-                        FROM buyers
-                        ORDER BY created_at DESC LIMIT 1000
-                    """)
-                for rid, name, phone, wa_opt_in, note in cur.fetchall():
-                    buyers.append({"id": rid, "name": name, "phone_e164": phone, "wa_opt_in": bool(wa_opt_in), "note": note})
+                # ambil size+1 untuk tahu masih ada halaman berikutnya
+                run_stmt(cur, *buyer_search_query(q, size + 1, (page - 1) * size))
+                for rid, name, phone, wa_opt_in, note, score in cur.fetchall():
+                    buyers.append({"id": rid, "name": name, "phone_e164": phone, "wa_opt_in": bool(wa_opt_in),
+                                   "note": note, "score": round(float(score), 2) if score is not None else None})
     except Exception as e:
         app.logger.exception("select buyers failed")
         flash(f"Gagal load data: {e}", "error")
-    return render_template("pembeli.html", buyers=buyers, q=q)
+    has_next = len(buyers) > size
+    return render_template("pembeli.html", buyers=buyers[:size], q=q, page=page, has_next=has_next)
 
 @app.post("/pembeli/delete")
 @login_required
@@ -393,6 +1048,9 @@ def pembeli_delete():
         with db_conn() as conn:
             with conn.cursor() as cur:
                 cur.execute("DELETE FROM buyers WHERE id=%s", (bid,))
+        buyer_index.remove(bid)
+        # nama pembeli bisa muncul di transaksi tanggal berapa pun
+        report_cache.clear()
         flash("Pembeli dihapus", "success")
     except Exception as e:
         app.logger.exception("delete buyer failed")
@@ -478,11 +1136,190 @@ def pemodal_delete():
         flash(f"Gagal hapus: {e}", "error")
     return redirect(url_for("pemodal_page"))
 
-@app.route("/laporan", methods=["GET"])
-@login_required
-def laporan_page():
-#    return render_template("base.html", page_title="Laporan", body="<div class='p-4'>Halaman Laporan (sementara)</div>")
-    # ambil parameter range; default = hari ini
+# =========================
+# Laporan
+# =========================
+# Sumber data laporan diputuskan sekali (probe saat start), bukan dengan
+# menangkap exception di setiap request.
+REPORT_SOURCES = {}
+
+# (endpoint, from, to, ...) -> data laporan; lihat report_cache.py
+report_cache = ReportCache(
+    maxsize=app.config["REPORT_CACHE_SIZE"],
+    ttl=app.config["REPORT_CACHE_TTL_SEC"],
+    today_ttl=app.config["REPORT_CACHE_TODAY_TTL_SEC"],
+)
+
+# Penulisan dari proses lain (worker gunicorn lain, app_async.py, wa_worker.py)
+# dikabarkan trigger di sales/buyers lewat NOTIFY (migrations/009). Satu
+# thread per proses mendengarkan dengan koneksi sendiri (di luar pool).
+REPORT_CACHE_CHANNEL = "report_cache"
+REPORT_CACHE_RECONNECT_SEC = 5
+_report_cache_listener = None
+
+def report_cache_listen():
+    while True:
+        try:
+            with psycopg.connect(app.config["DATABASE_URL"], autocommit=True) as conn:
+                conn.execute(f"LISTEN {REPORT_CACHE_CHANNEL}")
+                # notifikasi selama belum/tidak tersambung hilang → buang semua
+                report_cache.clear()
+                for n in conn.notifies():
+                    report_cache.apply_notify(n.payload)
+        except Exception as e:
+            app.logger.warning("report cache LISTEN failed, retry in %ss: %s", REPORT_CACHE_RECONNECT_SEC, e)
+        time.sleep(REPORT_CACHE_RECONNECT_SEC)
+
+def start_report_cache_listener():
+    """Sekali per proses (setelah fork gunicorn); tanpa cache tidak perlu."""
+    global _report_cache_listener
+    if _report_cache_listener or not report_cache.enabled or not app.config["DATABASE_URL"]:
+        return
+    _report_cache_listener = threading.Thread(target=report_cache_listen, name="report-cache-listen",
+                                              daemon=True)
+    _report_cache_listener.start()
+
+# Delta rekap harian (migrations/010) dilipat ke sales_daily di belakang,
+# bukan di transaksi checkout. Tiap worker mencoba; sales_daily_flush() sendiri
+# memastikan hanya satu yang jalan dalam satu waktu.
+_sales_daily_flusher = None
+
+def flush_sales_daily() -> int:
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT sales_daily_flush()")
+            return cur.fetchone()[0]
+
+def sales_daily_flush_loop():
+    while True:
+        time.sleep(app.config["SALES_DAILY_FLUSH_SEC"])
+        try:
+            n = flush_sales_daily()
+            if n:
+                app.logger.debug("sales_daily flush: %s days", n)
+        except Exception as e:
+            app.logger.warning("sales_daily flush failed: %s", e)
+
+def start_sales_daily_flusher():
+    """Sekali per proses, hanya kalau migrasi 010 sudah jalan."""
+    global _sales_daily_flusher
+    if (_sales_daily_flusher or app.config["SALES_DAILY_FLUSH_SEC"] <= 0
+            or not REPORT_SOURCES.get("sales_daily_delta")):
+        return
+    _sales_daily_flusher = threading.Thread(target=sales_daily_flush_loop, name="sales-daily-flush",
+                                            daemon=True)
+    _sales_daily_flusher.start()
+
+def probe_report_sources(force: bool = False) -> dict:
+    if REPORT_SOURCES and not force:
+        return REPORT_SOURCES
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT EXISTS (SELECT 1 FROM pg_proc WHERE proname = 'f_profit_sharing'),
+                       to_regclass('sales_daily') IS NOT NULL,
+                       to_regclass('sales_daily_current') IS NOT NULL,
+                       to_regclass('v_sales_by_day') IS NOT NULL
+            """)
+            f_ps, daily, daily_delta, by_day = cur.fetchone()
+    if daily:
+        # sejak migrasi 010 trigger menulis delta; sales_daily_current = rollup + delta
+        rekap_sql = f"""
+            SELECT day, trx_count, total_penjualan, total_modal, total_laba
+            FROM {"sales_daily_current" if daily_delta else "sales_daily"}
+            WHERE day BETWEEN %s AND %s
+            ORDER BY day
+        """
+    elif by_day:
+        rekap_sql = """
+            SELECT day, trx_count, total_penjualan, total_modal, total_laba
+            FROM v_sales_by_day
+            WHERE day BETWEEN %s AND %s
+            ORDER BY day
+        """
+    else:
+        rekap_sql = """
+            SELECT sale_date AS day,
+                   COUNT(*) AS trx_count,
+                   SUM(total_amount)::BIGINT AS total_penjualan,
+                   SUM(total_cost)::BIGINT   AS total_modal,
+                   SUM(total_profit)::BIGINT AS total_laba
+            FROM sales
+            WHERE sale_date BETWEEN %s AND %s
+            GROUP BY sale_date
+            ORDER BY sale_date
+        """
+    REPORT_SOURCES.update({
+        "f_profit_sharing": bool(f_ps),
+        "rekap": "sales_daily" if daily else ("v_sales_by_day" if by_day else "sales"),
+        "sales_daily_delta": bool(daily_delta),
+        # sumber bisa berubah setelah migrasi → statement didaftar ulang di sini
+        "rekap_sql": statement("laporan_rekap", rekap_sql),
+    })
+    app.logger.info("report sources: f_profit_sharing=%s rekap=%s",
+                    REPORT_SOURCES["f_profit_sharing"], REPORT_SOURCES["rekap"])
+    return REPORT_SOURCES
+
+def split_profit(total: int) -> dict:
+    # sama dengan pembagian di f_profit_sharing: karyawan 30%, pemodal 35%, kas 35%
+    return {
+        "total_laba": total,
+        "share_karyawan": total*30//100,
+        "share_pemodal":  total*35//100,
+        "share_kas":      total*35//100,
+    }
+
+def rekap_row(d, c, tp, tm, tl) -> dict:
+    return {
+        "day": d.isoformat() if hasattr(d, "isoformat") else str(d),
+        "trx_count": int(c or 0),
+        "total_penjualan": int(tp or 0),
+        "total_modal": int(tm or 0),
+        "total_laba": int(tl or 0)
+    }
+
+def trx_row(sid, day, buyer_name, tot, cost, profit, paid, change, wa, created_at) -> dict:
+    return {
+        "id": str(sid),
+        "sale_date": day.isoformat() if hasattr(day, "isoformat") else str(day),
+        "buyer_name": buyer_name,
+        "total_amount": int(tot or 0),
+        "total_cost": int(cost or 0),
+        "total_profit": int(profit or 0),
+        "paid_amount": int(paid or 0),
+        "change_amount": int(change or 0),
+        "wa_status": wa or "none",
+        "created_at": created_at.isoformat() if hasattr(created_at, "isoformat") else str(created_at),
+        # posisi baris untuk keyset pagination (sale_date, created_at, id)
+        "cursor": f"{day}|{created_at.isoformat() if hasattr(created_at, 'isoformat') else created_at}|{sid}"
+    }
+
+def parse_trx_cursor(raw: str):
+    """'YYYY-MM-DD|created_at ISO|id' → (date, datetime, id). ValueError kalau rusak."""
+    day, created_at, sid = raw.split("|", 2)
+    return date.fromisoformat(day), datetime.fromisoformat(created_at), sid
+
+SQL_LAPORAN_TRX = """
+    SELECT s.id,
+           s.sale_date,
+           COALESCE(b.name,'-') AS buyer_name,
+           s.total_amount, s.total_cost, s.total_profit,
+           s.paid_amount, s.change_amount,
+           s.wa_status,
+           s.created_at
+    FROM sales s
+    LEFT JOIN buyers b ON b.id = s.buyer_id
+    WHERE s.sale_date BETWEEN %s AND %s {after}
+    ORDER BY s.sale_date DESC, s.created_at DESC, s.id DESC
+    LIMIT %s
+"""
+# halaman pertama / halaman setelah cursor (keyset, pakai index sales_keyset_idx)
+SQL_LAPORAN_TRX_FIRST = statement("laporan_trx_first", SQL_LAPORAN_TRX.format(after=""))
+SQL_LAPORAN_TRX_AFTER = statement("laporan_trx_after", SQL_LAPORAN_TRX.format(
+    after="AND (s.sale_date, s.created_at, s.id) < (%s, %s, %s)"))
+
+def laporan_range():
+    """Ambil parameter range ?from=&to=; default = hari ini. Return (from, to) ISO."""
     today = date.today().isoformat()
     from_date = request.args.get("from") or today
     to_date   = request.args.get("to")   or today
@@ -495,315 +1332,527 @@ def laporan_page():
             from_date, to_date = fd.isoformat(), td.isoformat()
     except Exception:
         pass
+    return from_date, to_date
 
-    # 1) Bagi hasil via function f_profit_sharing(from,to)
-    
-    profit_data = {
-        "range_from": from_date,
-        "range_to": to_date,
-        "total_laba": 0,
-        "share_karyawan": 0,
-        "share_pemodal": 0,
-        "share_kas": 0,
-    }
+statement("profit_sharing", "SELECT * FROM f_profit_sharing(%s,%s)")
 
-    app.logger.debug("[PS] range: %s .. %s", from_date, to_date)
-    try:
-        with db_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT * FROM f_profit_sharing(%s,%s)", (from_date, to_date))
-                row = cur.fetchone()
-                app.logger.debug("[PS] f_profit_sharing row: %r", row)  # [LOG PS]
-                if row:
-                    profit_data.update({
-                        "range_from": row[0],
-                        "range_to": row[1],
-                        "total_laba": int(row[2] or 0),
-                        "share_karyawan": int(row[3] or 0),
-                        "share_pemodal": int(row[4] or 0),
-                        "share_kas": int(row[5] or 0),
-                    })
-                    # (range_from, range_to, total_laba, share_karyawan, share_pemodal, share_kas)
-                    #profit = {
-                    #    "range_from": row[0],
-                    #    "range_to": row[1],
-                    #    "total_laba": int(row[2] or 0),
-                    #    "share_karyawan": int(row[3] or 0),
-                    #    "share_pemodal": int(row[4] or 0),
-                    #    "share_kas": int(row[5] or 0)
-                    #}
-    except Exception as e:
-        app.logger.info("f_profit_sharing unavailable: %s", e)
-        app.logger.warning("f_profit_sharing error: %s. Fallback aggregate sales.", e)
-        # fallback jika function belum ada: hitung dari tabel sales
-        try:
-            with db_conn() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        SELECT COALESCE(SUM(total_profit),0)::BIGINT
-                        FROM sales
-                        WHERE sale_date BETWEEN %s AND %s
-                    """, (from_date, to_date))
-                    total = int(cur.fetchone()[0] or 0)
-                    profit_data = {
-                        "range_from": from_date,
-                        "range_to": to_date,
-                        "total_laba": total,
-                        "share_karyawan": total*30//100,
-                        "share_pemodal":  total*35//100,
-                        "share_kas":      total*35//100,
-                    }
-        except Exception as ee:
-            app.logger.exception("fallback profit failed: %s", ee)
-#            profit = None
-    app.logger.debug("[PS] result: %s", profit_data)
-    # --- siapkan angka yang dikirim ke template (hindari kirim dict) ---
-    ps_total = int(profit_data.get("total_laba", 0))
-    ps_emp   = int(profit_data.get("share_karyawan", 0))
-    ps_inv   = int(profit_data.get("share_pemodal", 0))
-    ps_cash  = int(profit_data.get("share_kas", 0))
-    app.logger.debug("[PS] final numbers: total=%s emp=%s inv=%s cash=%s",
-                     ps_total, ps_emp, ps_inv, ps_cash)
-    # 2) Rekap harian via view v_sales_by_day
+def load_laporan_summary(conn, from_date, to_date):
+    """
+    Bagi hasil + rekap harian dalam satu round trip (pipeline).
+    Return (profit_data, rekap, ok); ok=False kalau query gagal (jangan di-cache).
+    """
+    profit_data = {"range_from": from_date, "range_to": to_date, **split_profit(0)}
     rekap = []
     try:
-        with db_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT day, trx_count, total_penjualan, total_modal, total_laba
-                    FROM v_sales_by_day
-                    WHERE day BETWEEN %s AND %s
-                    ORDER BY day
-                """, (from_date, to_date))
-                for d, c, tp, tm, tl in cur.fetchall():
-                    rekap.append({
-                        "day": d.isoformat() if hasattr(d, "isoformat") else str(d),
-                        "trx_count": int(c or 0),
-                        "total_penjualan": int(tp or 0),
-                        "total_modal": int(tm or 0),
-                        "total_laba": int(tl or 0)
-                    })
+        sources = probe_report_sources()
+        # f_profit_sharing = sumber kebenaran bagi hasil (isi function di
+        # produksi bisa beda dengan 000_base); split_profit hanya kalau tidak ada
+        use_fn = sources["f_profit_sharing"]
+        with conn.pipeline():
+            cur_ps = conn.cursor()
+            cur_rekap = conn.cursor()
+            # 1) Bagi hasil via function f_profit_sharing(from,to)
+            if use_fn:
+                run_stmt(cur_ps, "profit_sharing", (from_date, to_date))
+            # 2) Rekap harian (sales_daily / v_sales_by_day / group by sales)
+            run_stmt(cur_rekap, "laporan_rekap", (from_date, to_date))
+
+        rekap = [rekap_row(*r) for r in cur_rekap.fetchall()]
+        if use_fn:
+            row = cur_ps.fetchone()
+            app.logger.debug("[PS] f_profit_sharing row: %r", row)  # [LOG PS]
+            if row:
+                # (range_from, range_to, total_laba, share_karyawan, share_pemodal, share_kas)
+                profit_data.update({
+                    "range_from": row[0],
+                    "range_to": row[1],
+                    "total_laba": int(row[2] or 0),
+                    "share_karyawan": int(row[3] or 0),
+                    "share_pemodal": int(row[4] or 0),
+                    "share_kas": int(row[5] or 0),
+                })
+        else:
+            # function belum ada: laba = jumlah rekap harian yang sudah diambil
+            profit_data.update(split_profit(sum(r["total_laba"] for r in rekap)))
     except Exception as e:
-        app.logger.warning("v_sales_by_day error: %s. Fallback group by sales.", e)
-        # fallback jika view belum ada
+        app.logger.exception("load laporan failed: %s", e)
+        conn.rollback()
+        return profit_data, rekap, False
+    return profit_data, rekap, True
+
+@app.route("/laporan", methods=["GET"])
+@login_required
+def laporan_page():
+#    return render_template("base.html", page_title="Laporan", body="<div class='p-4'>Halaman Laporan (sementara)</div>")
+    from_date, to_date = laporan_range()
+    page_size = app.config["LAPORAN_PAGE_SIZE"]
+    app.logger.debug("[PS] range: %s .. %s", from_date, to_date)
+
+    # Data (bagi hasil, rekap, halaman pertama transaksi = page_size baris)
+    # diambil dulu dan koneksi dikembalikan ke pool sebelum response dimulai:
+    # error DB masih bisa dirender sebagai halaman biasa, dan koneksi tidak
+    # tertahan selama browser yang lambat mengunduh. Yang di-stream hanya
+    # render template. Halaman berikutnya diambil browser lewat /laporan/trx
+    # (infinite scroll). Hasil per range di-cache (report_cache); cache hit =
+    # tanpa query DB.
+    cache_key = ("laporan", from_date, to_date, page_size)
+    t0 = time.perf_counter()
+    cached = report_cache.get(cache_key)
+    if cached is not None:
+        profit_data, rekap, trx = cached
+        app.logger.info("[laporan] %s..%s cache hit rows=%s", from_date, to_date, len(trx))
+    else:
+        profit_data = {"range_from": from_date, "range_to": to_date, **split_profit(0)}
+        rekap, trx, summary_ok, trx_ok = [], [], False, False
         try:
             with db_conn() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        SELECT sale_date AS day,
-                               COUNT(*) AS trx_count,
-                               SUM(total_amount)::BIGINT AS total_penjualan,
-                               SUM(total_cost)::BIGINT   AS total_modal,
-                               SUM(total_profit)::BIGINT AS total_laba
-                        FROM sales
-                        WHERE sale_date BETWEEN %s AND %s
-                        GROUP BY sale_date
-                        ORDER BY sale_date
-                    """, (from_date, to_date))
-                    for d, c, tp, tm, tl in cur.fetchall():
-                        rekap.append({
-                            "day": d.isoformat() if hasattr(d, "isoformat") else str(d),
-                            "trx_count": int(c or 0),
-                            "total_penjualan": int(tp or 0),
-                            "total_modal": int(tm or 0),
-                            "total_laba": int(tl or 0)
-                        })
-        except Exception as ee:
-            app.logger.exception("fallback rekap failed: %s", ee)
-            rekap = []
-
-    # 3) Daftar transaksi pada rentang yang sama
-    trx = []
+                profit_data, rekap, summary_ok = load_laporan_summary(conn, from_date, to_date)
+                app.logger.debug("[PS] result: %s", profit_data)
+                try:
+                    with conn.cursor() as cur:
+                        run_stmt(cur, "laporan_trx_first", (from_date, to_date, page_size))
+                        trx = [trx_row(*r) for r in cur.fetchall()]
+                    trx_ok = True
+                except Exception as e:
+                    app.logger.exception("load trx failed: %s", e)
+        except Exception as e:
+            # pool habis / DB mati: halaman tetap tampil dengan angka kosong
+            app.logger.exception("load laporan failed: %s", e)
+        # simpan hanya kalau semua query berhasil
+        if summary_ok and trx_ok:
+            report_cache.put(cache_key, from_date, to_date, (profit_data, rekap, trx))
+        app.logger.info("[laporan] %s..%s db=%.1fms rows=%s",
+                        from_date, to_date, (time.perf_counter() - t0) * 1000, len(trx))
+
+    def render_laporan(profit_data, rekap, trx):
+        # --- siapkan angka yang dikirim ke template (hindari kirim dict) ---
+        context = dict(
+            from_date=from_date,
+            to_date=to_date,
+            ps_total=int(profit_data.get("total_laba", 0)),
+            ps_emp=int(profit_data.get("share_karyawan", 0)),
+            ps_inv=int(profit_data.get("share_pemodal", 0)),
+            ps_cash=int(profit_data.get("share_kas", 0)),
+            rekap=rekap,
+            trx=trx,
+            page_size=page_size,
+            rekap_source=REPORT_SOURCES.get("rekap", "sales_daily")
+        )
+        app.update_template_context(context)
+        return timed_render(app.jinja_env.get_template("laporan.html").generate(context))
+
+    return Response(stream_with_context(render_laporan(profit_data, rekap, trx)), mimetype="text/html")
+
+@app.get("/laporan/trx")
+@login_required
+def laporan_trx_page():
+    """
+    JSON daftar transaksi per halaman (keyset) untuk infinite scroll.
+    Query param: from, to, after (cursor baris terakhir), limit.
+    Return: {"ok": true, "items": [...], "next": cursor|null}
+    """
+    from_date, to_date = laporan_range()
+    # kosong / bukan angka → default; di luar 1..500 → dijepit
+    limit = request.args.get("limit", type=int)
+    limit = max(1, min(app.config["LAPORAN_PAGE_SIZE"] if limit is None else limit, 500))
+    after = request.args.get("after")
+    try:
+        key = parse_trx_cursor(after) if after else None
+    except ValueError:
+        return {"ok": False, "error": "Cursor tidak valid"}, 400
+
+    cache_key = ("trx", from_date, to_date, after, limit)
+    cached = report_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
         with db_conn() as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT s.id,
-                           s.sale_date,
-                           COALESCE(b.name,'-') AS buyer_name,
-                           s.total_amount, s.total_cost, s.total_profit,
-                           s.paid_amount, s.change_amount,
-                           s.wa_status,
-                           s.created_at
-                    FROM sales s
-                    LEFT JOIN buyers b ON b.id = s.buyer_id
-                    WHERE s.sale_date BETWEEN %s AND %s
-                    ORDER BY s.sale_date DESC, s.created_at DESC
-                    LIMIT 1000
-                """, (from_date, to_date))
-                for (sid, day, buyer_name, tot, cost, profit, paid, change, wa, created_at) in cur.fetchall():
-                    trx.append({
-                        "id": str(sid),
-                        "sale_date": day.isoformat() if hasattr(day, "isoformat") else str(day),
-                        "buyer_name": buyer_name,
-                        "total_amount": int(tot or 0),
-                        "total_cost": int(cost or 0),
-                        "total_profit": int(profit or 0),
-                        "paid_amount": int(paid or 0),
-                        "change_amount": int(change or 0),
-                        "wa_status": wa or "none",
-                        "created_at": created_at.isoformat() if hasattr(created_at, "isoformat") else str(created_at)
-                    })
+                # ambil limit+1 untuk tahu masih ada halaman berikutnya
+                if key:
+                    run_stmt(cur, "laporan_trx_after", (from_date, to_date, *key, limit + 1))
+                else:
+                    run_stmt(cur, "laporan_trx_first", (from_date, to_date, limit + 1))
+                items = [trx_row(*r) for r in cur.fetchall()]
     except Exception as e:
-        app.logger.exception("load trx failed: %s", e)
-        trx = []
-
-    return render_template(
-        "laporan.html",
-        from_date=from_date,
-        to_date=to_date,
-        ps_total=ps_total, ps_emp=ps_emp, ps_inv=ps_inv, ps_cash=ps_cash,
-        #profit_ps=profit,
-        rekap=rekap,
-        trx=trx
-    )
+        app.logger.exception("load trx page failed: %s", e)
+        return {"ok": False, "error": "DB error"}, 500
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    result = {"ok": True, "items": items, "next": items[-1]["cursor"] if has_more else None}
+    report_cache.put(cache_key, from_date, to_date, result)
+    return result
+
+@app.get("/laporan/cache-stats")
+@login_required
+def laporan_cache_stats():
+    """Hit/miss cache laporan (per proses)."""
+    return {"ok": True, "report_cache": report_cache.stats(), "item_index": item_index.stats(),
+            "buyer_index": buyer_index.stats()}
+
+# ---------- Export (CSV / XLSX) ----------
+EXPORT_ITERSIZE = 2000          # baris per FETCH dari server-side cursor
+EXPORT_FLUSH_BYTES = 64 * 1024  # ukuran potongan CSV yang dikirim ke client
+XLSX_MAX_ROWS = 1_048_575       # batas baris per sheet Excel (tanpa header)
+
+EXPORT_SALES_COLUMNS = [
+    "sale_id", "tanggal", "dibuat", "pembeli", "total", "modal", "laba",
+    "bayar", "kembali", "status_wa",
+]
+EXPORT_ITEM_COLUMNS = ["barang", "harga_beli", "harga_jual", "qty", "subtotal", "laba_barang"]
+
+SQL_EXPORT_SALES = """
+    SELECT s.id, s.sale_date, s.created_at, COALESCE(b.name,''),
+           s.total_amount, s.total_cost, s.total_profit,
+           s.paid_amount, s.change_amount, COALESCE(s.wa_status,'none')
+    FROM sales s
+    LEFT JOIN buyers b ON b.id = s.buyer_id
+    WHERE s.sale_date BETWEEN %s AND %s
+    ORDER BY s.sale_date, s.created_at, s.id
+"""
+# satu baris per barang; kolom header transaksi diulang di tiap baris.
+# Barang diambil per transaksi lewat sale_items_sale_idx (LATERAL), bukan hash
+# join: biaya ikut panjang rentang, bukan ukuran seluruh sale_items. Syarat
+# sale_date membuat Postgres hanya membuka partisi bulan transaksi itu.
+SQL_EXPORT_SALE_ITEMS = """
+    SELECT s.id, s.sale_date, s.created_at, COALESCE(b.name,''),
+           s.total_amount, s.total_cost, s.total_profit,
+           s.paid_amount, s.change_amount, COALESCE(s.wa_status,'none'),
+           i.item_name, i.cost_price, i.sale_price, i.qty, i.line_total, i.line_profit
+    FROM sales s
+    LEFT JOIN buyers b ON b.id = s.buyer_id
+    CROSS JOIN LATERAL (
+        SELECT item_name, cost_price, sale_price, qty, line_total, line_profit, created_at
+        FROM sale_items
+        WHERE sale_id = s.id AND sale_date = s.sale_date
+        ORDER BY created_at
+    ) i
+    WHERE s.sale_date BETWEEN %s AND %s
+    ORDER BY s.sale_date, s.created_at, s.id, i.created_at
+"""
+SQL_EXPORT_SALE_ITEMS_NO_DATE = SQL_EXPORT_SALE_ITEMS.replace(" AND sale_date = s.sale_date", "")
+
+def export_rows(from_date, to_date, with_items: bool):
+    """
+    Generator baris export dari named (server-side) cursor: yang ada di memori
+    hanya satu batch EXPORT_ITERSIZE baris, berapa pun panjang range-nya.
+    """
+    tz = LOCAL_TZ
+    with db_conn() as conn:
+        with conn.cursor(name="laporan_export") as cur:
+            cur.itersize = EXPORT_ITERSIZE
+            if with_items:
+                sql = SQL_EXPORT_SALE_ITEMS if sales_partitioned() else SQL_EXPORT_SALE_ITEMS_NO_DATE
+            else:
+                sql = SQL_EXPORT_SALES
+            cur.execute(sql, (from_date, to_date))
+            for r in cur:
+                # id → str, created_at → jam lokal tanpa tz (Excel tidak kenal timezone)
+                yield (str(r[0]), r[1], r[2].astimezone(tz).replace(tzinfo=None, microsecond=0), *r[3:])
+
+def export_csv(header, rows):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    buf.write("\ufeff")  # BOM supaya Excel membaca UTF-8
+    w.writerow(header)
+    for r in rows:
+        w.writerow(r)
+        if buf.tell() >= EXPORT_FLUSH_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+def export_xlsx(header, rows):
+    """
+    Workbook write_only: baris langsung ditulis ke file sementara, bukan
+    ditahan di memori. Zip baru bisa jadi setelah baris terakhir, jadi file
+    dikirim bertahap setelah selesai ditulis.
+    """
+    from openpyxl import Workbook  # opsional, hanya dibutuhkan untuk export xlsx
+
+    wb = Workbook(write_only=True)
+    ws, n = None, XLSX_MAX_ROWS
+    for r in rows:
+        if n >= XLSX_MAX_ROWS:
+            ws = wb.create_sheet(f"penjualan_{len(wb.worksheets) + 1}" if wb.worksheets else "penjualan")
+            ws.append(header)
+            n = 0
+        ws.append(r)
+        n += 1
+    if ws is None:
+        wb.create_sheet("penjualan").append(header)
+
+    with tempfile.TemporaryFile() as f:
+        wb.save(f)
+        f.seek(0)
+        while chunk := f.read(EXPORT_FLUSH_BYTES):
+            yield chunk
+
+EXPORT_FORMATS = {
+    "csv": (export_csv, "text/csv; charset=utf-8"),
+    "xlsx": (export_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+@app.get("/laporan/export")
+@login_required
+def laporan_export():
+    """
+    Download penjualan untuk range tanggal berapa pun.
+    Query param: from, to, format=csv|xlsx (default csv), items=1 (satu baris per barang).
+    """
+    from_date, to_date = laporan_range()
+    fmt = (request.args.get("format") or "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        return {"ok": False, "error": "Format harus csv atau xlsx"}, 400
+    with_items = request.args.get("items") == "1"
+    writer, mimetype = EXPORT_FORMATS[fmt]
+    header = EXPORT_SALES_COLUMNS + (EXPORT_ITEM_COLUMNS if with_items else [])
+
+    @stream_with_context
+    def generate():
+        t0 = time.perf_counter()
+        n = 0
+        def counted():
+            nonlocal n
+            for r in export_rows(from_date, to_date, with_items):
+                n += 1
+                yield r
+        yield from writer(header, counted())
+        app.logger.info("[export] %s %s..%s items=%s rows=%s %.1fms",
+                        fmt, from_date, to_date, with_items, n, (time.perf_counter() - t0) * 1000)
+
+    filename = f"penjualan{'-barang' if with_items else ''}_{from_date}_{to_date}.{fmt}"
+    return Response(generate(), mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+SQL_SALE_DETAIL_HEADER = statement("sale_detail_header", """
+    SELECT s.id, s.sale_date, COALESCE(b.name,'-') AS buyer_name,
+           s.total_amount, s.total_cost, s.total_profit,
+           s.paid_amount, s.change_amount, s.wa_status, s.wa_sent_at
+    FROM sales s
+    LEFT JOIN buyers b ON b.id = s.buyer_id
+    WHERE s.id = %s AND s.sale_date = %s
+""")
+# tanpa tanggal (link lama): id dicari di index semua partisi
+SQL_SALE_DETAIL_HEADER_ANY_DATE = statement("sale_detail_header_any_date",
+                                            SQL_SALE_DETAIL_HEADER.replace(" AND s.sale_date = %s", ""))
+SQL_SALE_DETAIL_ITEMS = statement("sale_detail_items", """
+    SELECT item_name, sale_price, qty, line_total
+    FROM sale_items
+    WHERE sale_id = %s AND sale_date = %s
+    ORDER BY created_at
+""")
+SQL_SALE_DETAIL_ITEMS_NO_DATE = """
+    SELECT i.item_name, i.sale_price, i.qty, i.line_total
+    FROM sale_items i
+    JOIN sales s ON s.id = i.sale_id
+    WHERE i.sale_id = %s AND s.sale_date = %s
+    ORDER BY i.created_at
+"""
+
+def sale_detail_query(sale_id, sale_date):
+    """
+    (nama statement, params) header detail nota. ?date= (sale_date transaksi)
+    membatasi pencarian ke partisi bulan itu; None kalau tanggal tidak valid.
+    """
+    if not sale_date:
+        return "sale_detail_header_any_date", (sale_id,)
+    try:
+        return "sale_detail_header", (sale_id, date.fromisoformat(sale_date))
+    except ValueError:
+        return None
+
+def sale_detail_header(row) -> dict:
+    return {
+        "id": str(row[0]),
+        "sale_date": row[1].isoformat() if hasattr(row[1], "isoformat") else str(row[1]),
+        "buyer_name": row[2],
+        "total_amount": int(row[3] or 0),
+        "total_cost": int(row[4] or 0),
+        "total_profit": int(row[5] or 0),
+        "paid_amount": int(row[6] or 0),
+        "change_amount": int(row[7] or 0),
+        "wa_status": row[8] or "none",
+        "wa_sent_at": row[9].isoformat() if row[9] else None
+    }
+
+def sale_detail_item(row) -> dict:
+    name, price, qty, subtotal = row
+    return {
+        "item_name": name,
+        "sale_price": int(price or 0),
+        "qty": int(qty or 0),
+        "line_total": int(subtotal or 0)
+    }
 
 @app.get("/laporan/sale/<sale_id>")
 @login_required
 def laporan_sale_detail(sale_id):
     """
     Return JSON header + items untuk sebuah transaksi.
+    Query param date=YYYY-MM-DD (tanggal transaksi) opsional tapi dianjurkan.
     """
+    query = sale_detail_query(sale_id, request.args.get("date"))
+    if not query:
+        return {"ok": False, "error": "Tanggal tidak valid"}, 400
     header = None
     items = []
     try:
         with db_conn() as conn:
             with conn.cursor() as cur:
                 # Header
-                cur.execute("""
-                    SELECT s.id, s.sale_date, COALESCE(b.name,'-') AS buyer_name,
-                           s.total_amount, s.total_cost, s.total_profit,
-                           s.paid_amount, s.change_amount, s.wa_status, s.wa_sent_at
-                    FROM sales s
-                    LEFT JOIN buyers b ON b.id = s.buyer_id
-                    WHERE s.id = %s
-                """, (sale_id,))
+                run_stmt(cur, *query)
                 row = cur.fetchone()
                 if not row:
                     return {"ok": False, "error": "Transaksi tidak ditemukan"}, 404
-                header = {
-                    "id": str(row[0]),
-                    "sale_date": row[1].isoformat() if hasattr(row[1], "isoformat") else str(row[1]),
-                    "buyer_name": row[2],
-                    "total_amount": int(row[3] or 0),
-                    "total_cost": int(row[4] or 0),
-                    "total_profit": int(row[5] or 0),
-                    "paid_amount": int(row[6] or 0),
-                    "change_amount": int(row[7] or 0),
-                    "wa_status": row[8] or "none",
-                    "wa_sent_at": row[9].isoformat() if row[9] else None
-                }
-                # Items
-                cur.execute("""
-                    SELECT item_name, sale_price, qty, line_total
-                    FROM sale_items
-                    WHERE sale_id = %s
-                    ORDER BY created_at
-                """, (sale_id,))
-                for name, price, qty, subtotal in cur.fetchall():
-                    items.append({
-                        "item_name": name,
-                        "sale_price": int(price or 0),
-                        "qty": int(qty or 0),
-                        "line_total": int(subtotal or 0)
-                    })
+                header = sale_detail_header(row)
+                # Items (tanggal dari header → hanya partisi bulan itu)
+                run_stmt(cur, "sale_detail_items", (sale_id, row[1]))
+                items = [sale_detail_item(r) for r in cur.fetchall()]
     except Exception as e:
         app.logger.exception("detail trx error: %s", e)
         return {"ok": False, "error": str(e)}, 500
 
     return {"ok": True, "header": header, "items": items}
 
+# Kirim ulang = masukkan lagi ke outbox; wa_worker.py yang mengirim lewat
+# penjadwalnya (batas global + jarak per nomor, lihat wa_scheduler.py), sama
+# dengan nota checkout. Request web tidak lagi menunggu gateway WA.
+SQL_WA_RESEND_CHECK = """
+    SELECT s.wa_status, btrim(COALESCE(b.phone_e164,'')) <> '' AS has_phone
+    FROM sales s
+    LEFT JOIN buyers b ON b.id = s.buyer_id
+    WHERE s.id = %s AND s.sale_date = %s
+"""
+SQL_WA_REQUEUE_ONE = f"""
+    WITH q AS (
+        UPDATE sales s
+        SET wa_status = 'pending', wa_attempts = 0, wa_next_try_at = NULL,
+            wa_last_error = NULL, wa_requeued_at = now()
+        WHERE s.id = %s AND s.sale_date = %s AND s.wa_status IS DISTINCT FROM 'pending'
+        RETURNING s.id, s.sale_date
+    )
+    SELECT q.sale_date, pg_notify('{WA_OUTBOX_CHANNEL}', '') FROM q
+"""
+# tanpa tanggal (halaman lama): id dicari di semua partisi, seperti detail nota
+SQL_WA_RESEND_CHECK_ANY_DATE = SQL_WA_RESEND_CHECK.replace(" AND s.sale_date = %s", "")
+SQL_WA_REQUEUE_ONE_ANY_DATE = SQL_WA_REQUEUE_ONE.replace(" AND s.sale_date = %s", "")
+
 @app.post("/laporan/sale/<sale_id>/resend-wa")
 @login_required
 def laporan_resend_wa(sale_id):
     """
-    Kirim ulang nota WA untuk transaksi ini.
-    Ambil header + items dari DB, bangun teks nota, panggil API WA,
-    lalu update wa_status & wa_sent_at.
+    Kirim ulang nota WA untuk transaksi ini (via outbox).
+    Query param date=YYYY-MM-DD (tanggal transaksi) opsional, sama dengan detail nota.
+    409 kalau nota masih dalam antrean kirim.
     """
-    # Ambil header + items
+    sale_date = request.args.get("date")
+    if sale_date:
+        try:
+            params = (sale_id, date.fromisoformat(sale_date))
+        except ValueError:
+            return {"ok": False, "error": "Tanggal tidak valid"}, 400
+        check_sql, requeue_sql = SQL_WA_RESEND_CHECK, SQL_WA_REQUEUE_ONE
+    else:
+        params = (sale_id,)
+        check_sql, requeue_sql = SQL_WA_RESEND_CHECK_ANY_DATE, SQL_WA_REQUEUE_ONE_ANY_DATE
+
     try:
         with db_conn() as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT s.sale_date,
-                           COALESCE(b.name,'') AS buyer_name,
-                           COALESCE(b.phone_e164,'') AS phone,
-                           s.total_amount, s.paid_amount, s.change_amount,
-                           s.wa_status, s.wa_sent_at,
-                           CASE
-                             WHEN s.wa_sent_at IS NULL THEN FALSE
-                             WHEN (now() - s.wa_sent_at) < interval '30 seconds' THEN TRUE
-                             ELSE FALSE
-                           END AS recently_sent
-                    FROM sales s
-                    LEFT JOIN buyers b ON b.id = s.buyer_id
-                    WHERE s.id = %s
-                """, (sale_id,))
+                cur.execute(check_sql, params)
                 row = cur.fetchone()
                 if not row:
                     return {"ok": False, "error": "Transaksi tidak ditemukan"}, 404
+                wa_status, has_phone = row
+                if not has_phone:
+                    return {"ok": False, "error": "Pembeli tidak punya nomor WA"}, 400
 
-                (sale_date, buyer_name, phone,
-                 total_amount, paid_amount, change_amount,
-                 wa_status, wa_sent_at, recently_sent) = row
+                cur.execute(requeue_sql, params)
+                queued = cur.fetchone()
+    except Exception as e:
+        app.logger.exception("resend WA enqueue error: %s", e)
+        return {"ok": False, "error": str(e)}, 500
 
+    if not queued:
+        return {"ok": False, "error": "Nota masih dalam antrean kirim."}, 409
+    report_cache.invalidate_date(queued[0])
+    app.logger.info("Resend WA queued sale=%s (was %s)", sale_id, wa_status)
+    return {"ok": True, "queued": True}
 
-                cur.execute("""
-                    SELECT item_name, sale_price, qty
-                    FROM sale_items
-                    WHERE sale_id = %s
-                    ORDER BY created_at
-                """, (sale_id,))
-                items = [{"nama": n, "jual": int(p or 0), "qty": int(q or 0)} for (n, p, q) in cur.fetchall()]
+# ---------- Kirim ulang massal ----------
+# Setelah gateway WA down, semua nota 'failed' di rentang tanggal dimasukkan
+# lagi ke outbox dengan satu UPDATE. Pengiriman (batch, paralel, rate limit)
+# dikerjakan wa_worker.py; progres dibaca dari DB berdasarkan cap
+# wa_requeued_at (migrations/006_wa_bulk_resend.sql), jadi bisa dipantau dari
+# worker gunicorn mana pun.
+SQL_WA_REQUEUE_FAILED = f"""
+    WITH q AS (
+        UPDATE sales s
+        SET wa_status = 'pending', wa_attempts = 0, wa_next_try_at = NULL,
+            wa_last_error = NULL, wa_requeued_at = now()
+        FROM buyers b
+        WHERE s.wa_status = 'failed'
+          AND s.sale_date BETWEEN %s AND %s
+          AND b.id = s.buyer_id AND btrim(COALESCE(b.phone_e164,'')) <> ''
+        RETURNING s.id
+    )
+    SELECT count(*), now(),
+           CASE WHEN count(*) > 0 THEN pg_notify('{WA_OUTBOX_CHANNEL}', '') END
+    FROM q
+"""
+
+@app.post("/laporan/resend-wa")
+@login_required
+def laporan_resend_wa_bulk():
+    """Masukkan ulang semua nota WA gagal di ?from=&to= ke outbox. Return id batch."""
+    from_date, to_date = laporan_range()
+    try:
+        with db_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute(SQL_WA_REQUEUE_FAILED, (from_date, to_date))
+                queued, batch, _ = cur.fetchone()
     except Exception as e:
-        app.logger.exception("resend header/items error: %s", e)
+        app.logger.exception("bulk resend WA failed: %s", e)
         return {"ok": False, "error": str(e)}, 500
 
-    if not phone:
-        return {"ok": False, "error": "Pembeli tidak punya nomor WA"}, 400
-    if recently_sent:
-        return {"ok": False, "error": "Nota baru saja dikirim. Coba lagi dalam 30 detik."}, 409
-
-    # Build teks nota
-    message_text = build_receipt_text(
-        sale_date=sale_date.isoformat() if hasattr(sale_date,"isoformat") else str(sale_date),
-        buyer_name=buyer_name or "",
-        items=items,
-        total=int(total_amount or 0),
-        paid=int(paid_amount or 0),
-        change=int(change_amount or 0)
-    )
-    number = (phone or "").lstrip("+").strip()
+    # UTC + "Z": tanpa "+" supaya aman ditaruh di query string apa adanya
+    batch = batch.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    if queued:
+        report_cache.invalidate_range(from_date, to_date)
+    app.logger.info("Bulk resend WA %s..%s queued=%s batch=%s", from_date, to_date, queued, batch)
+    return {"ok": True, "queued": queued, "batch": batch if queued else None}
 
-    # Kirim
+@app.get("/laporan/resend-wa/progress")
+@login_required
+def laporan_resend_wa_progress():
+    """Jumlah per status untuk satu batch kirim ulang (?batch= dari POST /laporan/resend-wa)."""
+    try:
+        batch = datetime.fromisoformat(request.args.get("batch") or "")
+    except ValueError:
+        return {"ok": False, "error": "Batch tidak valid"}, 400
     try:
-        resp = requests.post(
-            "https://blast.sukipli.work/send-message",
-            json={"number": number, "message": message_text},
-            timeout=10
-        )
-        ok = 200 <= resp.status_code < 300
         with db_conn() as conn:
             with conn.cursor() as cur:
-                if ok:
-                    cur.execute("UPDATE sales SET wa_status='sent', wa_sent_at=now() WHERE id=%s", (sale_id,))
-                else:
-                    cur.execute("UPDATE sales SET wa_status='failed' WHERE id=%s", (sale_id,))
-        app.logger.info("Resend WA status=%s body=%s", resp.status_code, resp.text)
-        if not ok:
-            return {"ok": False, "error": f"Gagal kirim WA (HTTP {resp.status_code})"}
+                cur.execute("""
+                    SELECT count(*),
+                           count(*) FILTER (WHERE wa_status = 'pending'),
+                           count(*) FILTER (WHERE wa_status = 'sent'),
+                           count(*) FILTER (WHERE wa_status = 'failed'),
+                           count(*) FILTER (WHERE wa_status = 'none')
+                    FROM sales
+                    WHERE wa_requeued_at = %s
+                """, (batch,))
+                total, pending, sent, failed, none = cur.fetchone()
     except Exception as e:
-        app.logger.warning("Resend WA failed: %s", e)
-        try:
-            with db_conn() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("UPDATE sales SET wa_status='failed' WHERE id=%s", (sale_id,))
-        except Exception:
-            pass
-        return {"ok": False, "error": "Exception saat kirim WA"}
+        app.logger.exception("bulk resend progress failed: %s", e)
+        return {"ok": False, "error": str(e)}, 500
 
-    return {"ok": True}
+    return {"ok": True, "total": total, "pending": pending, "sent": sent,
+            "failed": failed, "none": none, "done": pending == 0}
 
 # Contoh: tes koneksi DB (opsional, hapus kalau tidak perlu)
 @app.route("/health")
@@ -821,9 +1870,161 @@ def health():
             msg = f"db error: {e}"
     return {"ok": ok, "msg": msg}
 
+@app.get("/health/db-pool")
+def health_db_pool():
+    """Ukuran pool, antrean, waktu tunggu & lama pinjam koneksi (per proses)."""
+    return {"ok": bool(db_pool), **db_pool_stats()}
+
+@app.get("/health/wa-outbox")
+def health_wa_outbox():
+    """
+    Kedalaman antrean nota WA (outbox) dan umur job tertua, dari DB → sama
+    untuk semua proses. Statistik penjadwal (antre di worker, lama tunggu)
+    dicatat wa_worker.py ke log.
+    """
+    try:
+        with db_conn() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT count(*),
+                           count(*) FILTER (WHERE wa_next_try_at IS NULL OR wa_next_try_at <= now()),
+                           extract(epoch FROM now() - min(COALESCE(wa_requeued_at, created_at)))
+                    FROM sales
+                    WHERE wa_status = 'pending'
+                """)
+                pending, due, oldest = cur.fetchone()
+    except Exception as e:
+        return {"ok": False, "msg": f"db error: {e}"}
+    return {"ok": True, "pending": pending, "due": due,
+            "oldest_age_sec": round(float(oldest), 1) if oldest is not None else None}
+
+# ---------- Metrics & SQL trace ----------
+def instrument_request_begin():
+    if app.config["METRICS_ENABLED"]:
+        request_timings.begin(time.perf_counter())
+    if sql_tracer.poll():
+        sql_tracer.begin()
+
+def instrument_request_end(response):
+    # endpoint (bukan path) supaya label tidak meledak oleh id di URL
+    labels = (request.endpoint or "unmatched", request.method, response.status_code)
+    if response.is_streamed:
+        # laporan/export: query & render terjadi saat body dikirim → catat setelah selesai
+        response.call_on_close(lambda: request_finished(*labels))
+    else:
+        request_finished(*labels)
+    return response
+
+def request_finished(ep: str, method: str, status: int):
+    sql_tracer.end(ep)
+    metrics_observe(ep, method, status)
+
+def metrics_observe(ep: str, method: str, status: int):
+    t = request_timings
+    if not t.active:
+        return
+    t.active = False
+    total = time.perf_counter() - t.start
+    HTTP_REQUESTS.inc(ep, method, status)
+    HTTP_SECONDS.observe(total, ep, method)
+    HTTP_DB_SECONDS.observe(t.db, ep)
+    HTTP_RENDER_SECONDS.observe(t.render, ep)
+    HTTP_PYTHON_SECONDS.observe(max(0.0, total - t.db - t.render - t.wa), ep)
+    HTTP_DB_QUERIES.observe(t.queries, ep)
+
+def metrics_render_begin(sender, template, context, **extra):
+    request_timings.render_start = time.perf_counter()
+
+def metrics_render_end(sender, template, context, **extra):
+    t = request_timings
+    if t.active:
+        t.render += time.perf_counter() - t.render_start
+
+app.before_request(instrument_request_begin)
+app.after_request(instrument_request_end)
+if app.config["METRICS_ENABLED"]:
+    before_render_template.connect(metrics_render_begin, app)
+    template_rendered.connect(metrics_render_end, app)
+
+@metrics.collector
+def metrics_state():
+    """Gauge/counter dari state yang sudah ada; dihitung saat scrape."""
+    if db_pool:
+        st = db_pool.get_stats()
+        for key, kind, help in (
+            ("pool_size", "gauge", "Koneksi DB yang sedang dibuka pool."),
+            ("pool_available", "gauge", "Koneksi DB idle di pool."),
+            ("requests_waiting", "gauge", "Request yang sedang menunggu koneksi DB."),
+            ("requests_num", "counter", "Total peminjaman koneksi DB."),
+            ("requests_queued", "counter", "Peminjaman yang harus antre."),
+            ("requests_errors", "counter", "Peminjaman gagal (timeout/antrean penuh)."),
+            ("connections_num", "counter", "Koneksi DB yang pernah dibuka."),
+            ("connections_lost", "counter", "Koneksi DB yang putus."),
+        ):
+            yield f"waserda_db_pool_{key}", kind, help, {}, st.get(key, 0)
+        yield ("waserda_db_pool_slow_waits_total", "counter", "Tunggu koneksi melebihi DB_POOL_SLOW_WAIT_MS.",
+               {}, pool_timings.slow_waits)
+
+    rc = report_cache.stats()
+    yield "waserda_report_cache_entries", "gauge", "Entri cache laporan.", {}, rc["entries"]
+    for key in ("hits", "misses", "invalidations"):
+        yield f"waserda_report_cache_{key}_total", "counter", f"Cache laporan: {key}.", {}, rc[key]
+
+    rm = receipt_cache_stats()
+    yield "waserda_receipt_cache_entries", "gauge", "Nota WA di memo.", {}, rm["entries"]
+    for key in ("hits", "misses"):
+        yield f"waserda_receipt_cache_{key}_total", "counter", f"Memo nota WA: {key}.", {}, rm[key]
+
+    for name, idx, size_key in (("item", item_index, "items"), ("buyer", buyer_index, "buyers")):
+        st = idx.stats()
+        yield "waserda_suggest_index_entries", "gauge", "Entri index saran di memori.", {"index": name}, st[size_key]
+        yield ("waserda_suggest_index_age_seconds", "gauge", "Umur muatan penuh terakhir index saran.",
+               {"index": name}, st["age_sec"])
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Metrik proses ini dalam format teks Prometheus."""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.get("/debug/sql-trace")
+@login_required
+def sql_trace_report():
+    """Statistik tracing SQL proses ini: query terberat, slow log, pola N+1."""
+    limit = min(int(request.args.get("limit") or 20), 200)
+    return {"ok": True, **sql_tracer.report(limit)}
+
+@app.post("/debug/sql-trace")
+@login_required
+def sql_trace_toggle():
+    """
+    Body JSON {"enabled": true|false, "reset": true}. enabled berlaku untuk
+    semua proses (lewat file flag, <= 1 detik); reset hanya proses ini.
+    """
+    data = request.get_json(silent=True) or {}
+    if "enabled" in data:
+        try:
+            sql_tracer.set_enabled(bool(data["enabled"]))
+        except OSError as e:
+            return {"ok": False, "error": f"Gagal menulis {sql_tracer.flag_file}: {e}"}, 500
+    if data.get("reset"):
+        sql_tracer.reset()
+    return {"ok": True, "enabled": sql_tracer.enabled}
+
+@app.cli.command("sql-trace")
+@click.argument("state", type=click.Choice(["on", "off", "status"]))
+def sql_trace_cmd(state):
+    """Nyalakan/matikan tracing SQL di semua proses yang sedang jalan."""
+    if state != "status":
+        sql_tracer.set_enabled(state == "on")
+    click.echo(f"sql trace {'on' if sql_tracer.poll() else 'off'} ({sql_tracer.flag_file})")
+
 # =========================
 # Run
 # =========================
+# Produksi: gunicorn -c gunicorn.conf.py app:app (lihat gunicorn.conf.py).
+# Blok di bawah hanya untuk development.
 if __name__ == "__main__":
+    open_db_pool(wait=True)
+    warm_up()
     # Gunakan host 0.0.0.0 agar bisa diakses dari jaringan (jika di docker)
     app.run(host="0.0.0.0", port=5000, debug=os.getenv("FLASK_DEBUG") == "1")
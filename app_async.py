@@ -0,0 +1,228 @@
+"""
+Versi async endpoint yang paling sering dipanggil, di atas Quart (API-nya
+sama dengan Flask) + psycopg AsyncConnectionPool:
+
+  POST /penjualan               checkout
+  GET  /api/items/suggest       saran barang
+  GET  /laporan/sale/<id>       detail transaksi
+
+Satu proses bisa menahan ratusan request yang sedang menunggu DB tanpa
+menambah thread. Halaman lain tetap dilayani app.py (gunicorn); arahkan
+path di atas ke proses ini dari reverse proxy:
+
+    pip install -r requirements-async.txt
+    hypercorn app_async:app --bind 0.0.0.0:5001 --workers 2
+
+SQL, parsing keranjang dan format JSON diambil dari app.py supaya kedua
+jalur tetap sama persis. Session cookie juga kompatibel (SECRET_KEY sama),
+jadi login dari app.py berlaku di sini.
+
+Checkout tidak memanggil API WA (nota lewat outbox, lihat wa_worker.py),
+jadi di sini tidak perlu HTTP client async.
+"""
+import asyncio
+import os
+from functools import wraps
+
+from psycopg_pool import AsyncConnectionPool
+from quart import Quart, request, session, redirect
+
+from app import (
+    Config, STATEMENTS, CartError, parse_sale, item_suggest_row, item_suggest_fallback_query,
+    sale_detail_header, sale_detail_item, sale_detail_query, SALES_PARTITION_MONTHS,
+    SQL_SALES_SCHEMA_PROBE, set_sales_schema, sales_partitioned,
+)
+from suggest_index import ItemSuggestIndex
+
+app = Quart(__name__)
+app.config.from_object(Config)
+# request async hanya memegang koneksi selama query → pool boleh lebih besar
+# dari jumlah thread, tapi tetap dibatasi supaya Postgres tidak kebanjiran.
+app.config["ASYNC_DB_POOL_MAX_SIZE"] = int(os.getenv("ASYNC_DB_POOL_MAX_SIZE", "20"))
+
+async def configure_db_conn(conn):
+    """Sekali per koneksi baru, sama dengan app.configure_db_conn."""
+    await conn.execute("SELECT set_config('TimeZone', %s, false)", (app.config["TZ"],))
+    await conn.commit()
+    if not app.config["DB_PREPARE"]:
+        conn.prepare_threshold = None
+
+db_pool = None
+if app.config["DATABASE_URL"]:
+    db_pool = AsyncConnectionPool(
+        conninfo=app.config["DATABASE_URL"],
+        min_size=min(app.config["DB_POOL_MIN_SIZE"], app.config["ASYNC_DB_POOL_MAX_SIZE"]),
+        max_size=app.config["ASYNC_DB_POOL_MAX_SIZE"],
+        timeout=app.config["DB_POOL_TIMEOUT_SEC"],
+        max_idle=app.config["DB_POOL_MAX_IDLE_SEC"],
+        max_lifetime=app.config["DB_POOL_MAX_LIFETIME_SEC"],
+        configure=configure_db_conn,
+        open=False,
+    )
+
+def db_conn():
+    """Gunakan: async with db_conn() as conn: ..."""
+    if not db_pool:
+        raise RuntimeError("DATABASE_URL belum diset. Cek .env")
+    return db_pool.connection()
+
+async def run_stmt(cur, name: str, params=()):
+    """Statement terdaftar di app.STATEMENTS, di-prepare per koneksi (lihat app.run_stmt)."""
+    return await cur.execute(STATEMENTS[name], params, prepare=app.config["DB_PREPARE"])
+
+
+def login_required(fn):
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        if not session.get("user"):
+            return redirect(f"/login?next={request.path}")
+        return await fn(*args, **kwargs)
+    return wrapper
+
+
+# =========================
+# Saran barang (index di memori, dimuat lewat pool async)
+# =========================
+async def fetch_item_suggest_rows():
+    async with db_conn() as conn:
+        async with conn.cursor() as cur:
+            await run_stmt(cur, "item_suggest_all")
+            return [item_suggest_row(r) for r in await cur.fetchall()]
+
+# loader sync tidak dipakai: index selalu diisi lewat load(rows)
+item_index = ItemSuggestIndex(None, ttl=app.config["ITEM_INDEX_TTL_SEC"])
+
+async def refresh_item_index():
+    try:
+        item_index.load(await fetch_item_suggest_rows())
+    except Exception as e:
+        app.logger.warning("item index refresh failed: %s", e)
+        item_index.refresh_failed()
+
+async def ensure_item_index():
+    if not item_index.loaded:
+        item_index.load(await fetch_item_suggest_rows())
+    elif item_index.claim_refresh():
+        asyncio.get_running_loop().create_task(refresh_item_index())
+
+
+@app.before_serving
+async def startup():
+    if db_pool:
+        await db_pool.open()
+        await db_pool.wait(timeout=app.config["DB_POOL_TIMEOUT_SEC"])
+        try:
+            async with db_conn() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(SQL_SALES_SCHEMA_PROBE)
+                    set_sales_schema((await cur.fetchone())[0])
+        except Exception as e:
+            app.logger.warning("sales schema probe failed: %s", e)
+        try:
+            await ensure_item_index()
+            app.logger.info("item index loaded: %s items", item_index.stats()["items"])
+        except Exception as e:
+            app.logger.warning("item index warm-up failed: %s", e)
+
+@app.after_serving
+async def shutdown():
+    if db_pool:
+        await db_pool.close()
+
+
+# =========================
+# Routes
+# =========================
+@app.post("/penjualan")
+@login_required
+async def penjualan_save():
+    """Sama dengan app.penjualan_save (body JSON & response identik)."""
+    try:
+        sale = parse_sale(await request.get_json(silent=True) or {}, item_index.lookup)
+    except CartError as e:
+        return {"ok": False, "error": str(e)}, 400
+
+    try:
+        # partisi baru di transaksi sendiri, bukan di transaksi checkout (lihat app.py)
+        if sales_partitioned() and sale["tgl"][:7] not in SALES_PARTITION_MONTHS:
+            async with db_conn() as conn:
+                async with conn.cursor() as cur:
+                    await run_stmt(cur, "sales_partitions_ensure", (sale["tgl"], sale["tgl"]))
+            SALES_PARTITION_MONTHS.add(sale["tgl"][:7])
+        async with db_conn() as conn:
+            async with conn.cursor() as cur:
+                await run_stmt(cur, "sale_header_insert", sale["header"])
+                sale_id = (await cur.fetchone())[0]
+                await run_stmt(cur, "sale_items_insert", (sale_id, sale["tgl"], *sale["columns"]))
+    except Exception as e:
+        app.logger.exception("Gagal simpan transaksi")
+        return {"ok": False, "error": str(e)}, 500
+
+    names, costs, prices, qtys = sale["columns"][:4]
+    item_index.record_sale(sale["tgl"], zip(names, costs, prices, qtys))
+    SALES_PARTITION_MONTHS.add(sale["tgl"][:7])
+    if sale["warnings"]:
+        app.logger.warning("sale %s price warnings: %s", sale_id, sale["warnings"])
+    return {"ok": True, "sale_id": sale_id, "warnings": sale["warnings"]}
+
+@app.get("/api/items/suggest")
+@login_required
+async def api_items_suggest():
+    q = (request.args.get("q") or "").strip().lower()
+    limit = min(int(request.args.get("limit") or 12), 50)
+
+    try:
+        await ensure_item_index()
+        return {"ok": True, "items": item_index.search(q, limit)}
+    except Exception as e:
+        app.logger.warning("item index unavailable: %s. Fallback query item_stats.", e)
+
+    try:
+        async with db_conn() as conn:
+            async with conn.cursor() as cur:
+                await run_stmt(cur, *item_suggest_fallback_query(q, limit))
+                rows = [item_suggest_row(r) for r in await cur.fetchall()]
+    except Exception as e:
+        app.logger.exception("items suggest failed: %s", e)
+        return {"ok": False, "error": "DB error"}, 500
+    return {"ok": True, "items": rows}
+
+@app.get("/laporan/sale/<sale_id>")
+@login_required
+async def laporan_sale_detail(sale_id):
+    query = sale_detail_query(sale_id, request.args.get("date"))
+    if not query:
+        return {"ok": False, "error": "Tanggal tidak valid"}, 400
+    try:
+        async with db_conn() as conn:
+            if query[0] == "sale_detail_header":
+                # tanggal sudah diketahui → header + items dalam satu round trip
+                async with conn.pipeline():
+                    cur_h = conn.cursor()
+                    cur_i = conn.cursor()
+                    await run_stmt(cur_h, *query)
+                    await run_stmt(cur_i, "sale_detail_items", query[1])
+                row = await cur_h.fetchone()
+            else:
+                cur_h = cur_i = conn.cursor()
+                await run_stmt(cur_h, *query)
+                row = await cur_h.fetchone()
+                if row:
+                    await run_stmt(cur_i, "sale_detail_items", (sale_id, row[1]))
+            if not row:
+                return {"ok": False, "error": "Transaksi tidak ditemukan"}, 404
+            items = [sale_detail_item(r) for r in await cur_i.fetchall()]
+    except Exception as e:
+        app.logger.exception("detail trx error: %s", e)
+        return {"ok": False, "error": str(e)}, 500
+
+    return {"ok": True, "header": sale_detail_header(row), "items": items}
+
+@app.route("/health")
+async def health():
+    try:
+        async with db_conn() as conn:
+            await conn.execute("SELECT 1")
+        return {"ok": True, "msg": "ok"}
+    except Exception as e:
+        return {"ok": False, "msg": f"db error: {e}"}
@@ -0,0 +1,133 @@
+"""
+Bandingkan jalur sync (app.py di gunicorn, ConnectionPool) dengan jalur
+async (app_async.py di hypercorn, AsyncConnectionPool) pada endpoint yang
+sama, dengan banyak request bersamaan.
+
+    python -m bench.bench_async --concurrency 50 200 --duration 10
+
+Butuh requirements-async.txt (quart, hypercorn).
+
+Default: 1 proses per server supaya yang dibandingkan adalah berapa banyak
+request yang bisa ditahan satu proses (sync: WEB_THREADS thread).
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from bench.bench_load import ROOT, login, wait_ready
+from bench.common import database_url, summarize
+
+PATHS = {
+    "suggest": ("GET", "/api/items/suggest?q=indo"),
+    "detail": ("GET", "/laporan/sale/{sale_id}?date={sale_date}"),
+    "checkout": ("POST", "/penjualan"),
+}
+
+
+def client_proc(args):
+    """Satu proses klien menjalankan `threads` thread yang masing-masing loop request."""
+    base, login_base, kind, threads, deadline, ctx = args
+    method, path = PATHS[kind]
+    url = base + path.format(**ctx)
+    cookies = login(login_base).cookies
+    lat, errors, lock = [], [0], threading.Lock()
+
+    def loop():
+        s = requests.Session()
+        s.cookies.update(cookies)
+        mine = []
+        while time.time() < deadline:
+            t0 = time.perf_counter()
+            try:
+                if method == "POST":
+                    r = s.post(url, json=ctx["cart"])
+                else:
+                    r = s.get(url)
+                ok = r.status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok:
+                mine.append((time.perf_counter() - t0) * 1000)
+            else:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            lat.extend(mine)
+
+    ts = [threading.Thread(target=loop) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return lat, errors[0]
+
+
+def drive(base, login_base, kind, concurrency, duration, ctx, procs):
+    per = max(1, concurrency // procs)
+    with multiprocessing.Pool(procs) as pool:
+        deadline = time.time() + duration
+        t0 = time.time()
+        results = pool.map(client_proc, [(base, login_base, kind, per, deadline, ctx)] * procs)
+        elapsed = time.time() - t0
+    lat = [x for r, _ in results for x in r]
+    return len(lat) / elapsed, summarize(lat), sum(e for _, e in results)
+
+
+def start(cmd, env, base):
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_ready(base, proc)
+    return proc
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    ap.add_argument("--duration", type=float, default=10)
+    ap.add_argument("--endpoints", nargs="+", default=list(PATHS), choices=list(PATHS))
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--threads", type=int, default=4, help="thread per worker gunicorn (sync)")
+    ap.add_argument("--client-procs", type=int, default=4)
+    a = ap.parse_args()
+
+    url = database_url()
+    env = dict(os.environ, DATABASE_URL=url, WEB_CONCURRENCY=str(a.workers), WEB_THREADS=str(a.threads),
+               WEB_BIND="127.0.0.1:5098", WEB_LOG_LEVEL="warning", WEB_ACCESS_LOG="")
+    sync_base, async_base = "http://127.0.0.1:5098", "http://127.0.0.1:5097"
+    servers = {
+        "sync": start([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"], env, sync_base),
+        "async": start([sys.executable, "-m", "hypercorn", "app_async:app", "--bind", "127.0.0.1:5097",
+                        "--workers", str(a.workers), "--log-level", "warning"], env, async_base),
+    }
+    try:
+        import psycopg
+        with psycopg.connect(url) as conn:
+            sale_id, buyer_id, sale_date = conn.execute(
+                "SELECT id, buyer_id, sale_date FROM sales WHERE buyer_id IS NOT NULL ORDER BY created_at DESC LIMIT 1"
+            ).fetchone()
+        ctx = {
+            "sale_id": sale_id,
+            "sale_date": sale_date,
+            "cart": {"tgl": "2025-01-15", "buyer_id": str(buyer_id), "paid_amount": 20000,
+                     "items": [{"nama": "bench item", "beli": 1000, "jual": 1500, "qty": 2}] * 5},
+        }
+        print(f"cores={os.cpu_count()} workers={a.workers} sync_threads={a.threads}")
+        for kind in a.endpoints:
+            for c in a.concurrency:
+                for name, base in (("sync", sync_base), ("async", async_base)):
+                    rps, s, err = drive(base, sync_base, kind, c, a.duration, ctx, a.client_procs)
+                    print(f"{kind:<9} {name:<6} conc={c:<4} req/s={rps:8.1f} p50={s['p50_ms']:7.1f}ms "
+                          f"p95={s['p95_ms']:7.1f}ms p99={s['p99_ms']:7.1f}ms errors={err}", flush=True)
+    finally:
+        for p in servers.values():
+            p.terminate()
+            p.wait(timeout=40)
+
+
+if __name__ == "__main__":
+    main()
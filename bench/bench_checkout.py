@@ -0,0 +1,136 @@
+"""
+Parse keranjang checkout: parse_sale lama (3 lintasan, tanpa validasi) vs
+checkout.parse_cart (1 lintasan + validasi), dengan & tanpa cek harga.
+
+    python -m bench.bench_checkout --lines 10 100 1000 10000 100000
+
+Skenario:
+  lama             : salinan parse_sale sebelum perubahan (baseline)
+  parse_cart       : validasi + total, tanpa lookup harga
+  parse_cart+harga : idem + cek harga terhadap index barang (20k barang)
+Selain waktu, dicek juga bahwa header & kolom hasilnya sama dengan versi
+lama dan payload rusak ditolak. Tidak butuh database.
+"""
+import argparse
+import random
+
+from bench.common import print_row, timeit
+from checkout import CartError, parse_cart
+from suggest_index import ItemSuggestIndex
+
+
+def legacy_parse_sale(data: dict):
+    tgl = data.get("tgl")
+    buyer_id = data.get("buyer_id")
+    items = data.get("items") or []
+    paid_amount = int(data.get("paid_amount") or 0)
+    if not tgl or not buyer_id or not items:
+        return None
+    total_amount = sum(int(it["jual"]) * int(it["qty"]) for it in items)
+    total_cost = sum(int(it["beli"]) * int(it["qty"]) for it in items)
+    total_profit = total_amount - total_cost
+    change_amount = max(0, paid_amount - total_amount)
+    names, costs, prices, qtys, totals, line_costs, profits = [], [], [], [], [], [], []
+    for it in items:
+        beli = int(it["beli"])
+        jual = int(it["jual"])
+        qty = int(it["qty"])
+        names.append(it["nama"])
+        costs.append(beli)
+        prices.append(jual)
+        qtys.append(qty)
+        totals.append(jual * qty)
+        line_costs.append(beli * qty)
+        profits.append(jual * qty - beli * qty)
+    return {
+        "tgl": tgl,
+        "header": (tgl, buyer_id, total_amount, total_cost, total_profit,
+                   paid_amount, change_amount, buyer_id),
+        "columns": (names, costs, prices, qtys, totals, line_costs, profits),
+    }
+
+
+def synthetic_prices(n_items: int, rnd: random.Random) -> list:
+    return [rnd.randrange(1000, 100000, 500) for _ in range(n_items)]
+
+
+def synthetic_index(prices: list) -> ItemSuggestIndex:
+    idx = ItemSuggestIndex(lambda: [])
+    rows = []
+    for i, jual in enumerate(prices):
+        rows.append({
+            "item_key": f"barang {i}", "name": f"Barang {i}",
+            "last_sale_price": jual, "last_cost_price": jual * 8 // 10,
+            "avg_sale_price": jual, "avg_cost_price": jual * 8 // 10,
+            "times": 10, "total_qty": 30, "last_sold": "2025-01-15",
+        })
+    idx.load(rows)
+    return idx
+
+
+def synthetic_cart(lines: int, prices: list, rnd: random.Random, outliers: float) -> dict:
+    """Harga sesuai index, kecuali ~`outliers` bagian baris (salah ketik 10x / 0 kurang)."""
+    items = []
+    for _ in range(lines):
+        i = rnd.randrange(len(prices))
+        jual = prices[i]
+        if rnd.random() < outliers:
+            jual = rnd.choice((jual * 10, jual // 10))
+        items.append({"nama": f"Barang {i}", "beli": jual * 8 // 10, "jual": jual, "qty": rnd.randint(1, 5)})
+    total = sum(it["jual"] * it["qty"] for it in items)
+    return {"tgl": "2025-01-15", "buyer_id": "00000000-0000-0000-0000-000000000001",
+            "paid_amount": total + 5000, "items": items}
+
+
+def check_rejects():
+    ok = {"tgl": "2025-01-15", "buyer_id": "x", "items": [{"nama": "a", "beli": 1, "jual": 2, "qty": 1}]}
+    bad = [
+        {**ok, "tgl": "15/01/2025"},
+        {**ok, "items": []},
+        {**ok, "items": [{"nama": "", "beli": 1, "jual": 2, "qty": 1}]},
+        {**ok, "items": [{"nama": "a", "beli": 1, "jual": 2, "qty": 0}]},
+        {**ok, "items": [{"nama": "a", "beli": -1, "jual": 2, "qty": 1}]},
+        {**ok, "items": [{"nama": "a", "beli": 1, "jual": "dua", "qty": 1}]},
+        {**ok, "items": [{"nama": "a", "beli": 1, "jual": 2.5, "qty": 1}]},
+        {**ok, "items": [{"nama": "a", "beli": 1, "jual": 2, "qty": True}]},
+        {**ok, "items": ["a"]},
+    ]
+    for payload in bad:
+        try:
+            parse_cart(payload)
+        except CartError:
+            continue
+        raise AssertionError(f"tidak ditolak: {payload}")
+    parse_cart(ok)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    ap.add_argument("--items", type=int, default=20000, help="barang di index harga")
+    ap.add_argument("--outliers", type=float, default=0.01, help="bagian baris berharga menyimpang")
+    ap.add_argument("--repeat", type=int, default=0, help="0 = otomatis sesuai ukuran keranjang")
+    args = ap.parse_args()
+
+    rnd = random.Random(1)
+    prices = synthetic_prices(args.items, rnd)
+    idx = synthetic_index(prices)
+    check_rejects()
+
+    for lines in args.lines:
+        data = synthetic_cart(lines, prices, rnd, args.outliers)
+        repeat = args.repeat or max(5, 200_000 // lines)
+
+        old = legacy_parse_sale(data)
+        cart = parse_cart(data, lookup=idx.lookup)
+        assert cart.columns == tuple(old["columns"])
+        assert (cart.total, cart.cost, cart.profit, cart.paid, cart.change) == old["header"][2:7]
+
+        print(f"--- {lines} baris ({repeat}x), peringatan harga: {len(cart.warnings)}")
+        print_row("lama", timeit(lambda: legacy_parse_sale(data), repeat))
+        print_row("parse_cart", timeit(lambda: parse_cart(data), repeat))
+        print_row("parse_cart+harga", timeit(lambda: parse_cart(data, lookup=idx.lookup), repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Ukur /laporan/export: durasi, jumlah byte, dan puncak memori Python
+(tracemalloc) selama response di-stream.
+
+    python -m bench.bench_export --from 2025-01-01 --to 2025-12-31 --format csv --items
+
+Puncak memori harus kira-kira konstan berapa pun panjang range-nya.
+"""
+import argparse
+import time
+import tracemalloc
+
+from bench.common import database_url
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--from", dest="from_date", required=True)
+    ap.add_argument("--to", dest="to_date", required=True)
+    ap.add_argument("--format", default="csv", choices=["csv", "xlsx"])
+    ap.add_argument("--items", action="store_true")
+    args = ap.parse_args()
+
+    database_url()
+    import app as webapp
+
+    client = webapp.app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"username": "bench"}
+    url = (f"/laporan/export?from={args.from_date}&to={args.to_date}"
+           f"&format={args.format}{'&items=1' if args.items else ''}")
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    r = client.get(url, buffered=False)
+    assert r.status_code == 200, r.status_code
+    size = 0
+    for chunk in r.response:
+        size += len(chunk)
+    r.close()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"GET {url}")
+    print(f"  bytes={size:,}  time={elapsed * 1000:.0f}ms  peak_py_mem={peak / 1024 / 1024:.1f}MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Ukur waktu render /laporan (Flask test client, DB dari DATABASE_URL).
+
+    python -m bench.bench_laporan --from 2025-01-01 --to 2025-01-31 --repeat 50
+
+Jalankan di commit sebelum & sesudah perubahan untuk membandingkan.
+"""
+import argparse
+
+from bench.common import database_url, timeit, print_row
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--from", dest="from_date", required=True)
+    ap.add_argument("--to", dest="to_date", required=True)
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    database_url()
+    import app as webapp
+    if getattr(webapp, "warm_up", None):
+        webapp.warm_up()
+
+    client = webapp.app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"username": "bench"}
+    url = f"/laporan?from={args.from_date}&to={args.to_date}"
+
+    def hit():
+        r = client.get(url)
+        assert r.status_code == 200, r.status_code
+        r.get_data()
+
+    print_row(f"GET /laporan {args.from_date}..{args.to_date}", timeit(hit, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
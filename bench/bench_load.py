@@ -0,0 +1,113 @@
+"""
+Load test gunicorn: throughput vs jumlah worker.
+
+Untuk tiap nilai --workers, script ini menyalakan gunicorn (gunicorn.conf.py)
+di port lokal, login, lalu memukul endpoint dari beberapa proses klien
+selama --duration detik dan mencetak req/s + latency.
+
+    python -m bench.bench_load --workers 1 2 4 --threads 4 --clients 16 \\
+        --path "/api/items/suggest?q=indo" --duration 15
+
+Klien dijalankan di proses terpisah (bukan thread) supaya GIL klien tidak
+ikut membatasi hasil; idealnya jalankan di mesin dengan core > worker.
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+from bench.common import database_url, summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def login(base):
+    s = requests.Session()
+    r = s.post(f"{base}/login", data={"username": "admin", "password": "123456"}, allow_redirects=False)
+    assert r.status_code in (302, 303), f"login gagal: HTTP {r.status_code}"
+    return s
+
+
+def client_loop(args):
+    base, path, deadline = args
+    s = login(base)
+    lat, errors = [], 0
+    while time.time() < deadline:
+        t0 = time.perf_counter()
+        try:
+            r = s.get(base + path)
+            ok = r.status_code == 200
+        except requests.RequestException:
+            ok = False
+        if ok:
+            lat.append((time.perf_counter() - t0) * 1000)
+        else:
+            errors += 1
+    return lat, errors
+
+
+def wait_ready(base, proc, timeout=30):
+    end = time.time() + timeout
+    while time.time() < end:
+        if proc.poll() is not None:
+            sys.exit("gunicorn berhenti sebelum siap")
+        try:
+            if requests.get(f"{base}/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    sys.exit("gunicorn tidak siap dalam %ss" % timeout)
+
+
+def run_once(workers, a):
+    port = a.port
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, DATABASE_URL=database_url(), WEB_CONCURRENCY=str(workers),
+               WEB_THREADS=str(a.threads), WEB_BIND=f"127.0.0.1:{port}",
+               WEB_LOG_LEVEL="warning", WEB_ACCESS_LOG="")
+    cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    try:
+        wait_ready(base, proc)
+        # pemanasan: semua worker sudah buka pool + index
+        deadline = time.time() + 2
+        with multiprocessing.Pool(a.clients) as pool:
+            pool.map(client_loop, [(base, a.path, deadline)] * a.clients)
+            t0 = time.time()
+            deadline = t0 + a.duration
+            results = pool.map(client_loop, [(base, a.path, deadline)] * a.clients)
+            elapsed = time.time() - t0
+    finally:
+        proc.terminate()
+        proc.wait(timeout=40)
+
+    lat = [x for r, _ in results for x in r]
+    errors = sum(e for _, e in results)
+    s = summarize(lat)
+    print(f"workers={workers:<3} threads={a.threads:<3} clients={a.clients:<4} "
+          f"req/s={len(lat) / elapsed:9.1f}  p50={s['p50_ms']:7.2f}ms "
+          f"p95={s['p95_ms']:7.2f}ms p99={s['p99_ms']:7.2f}ms errors={errors}", flush=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=15)
+    ap.add_argument("--path", default="/api/items/suggest?q=indo")
+    ap.add_argument("--port", type=int, default=5099)
+    a = ap.parse_args()
+
+    print(f"cores={os.cpu_count()} path={a.path}")
+    for w in a.workers:
+        run_once(w, a)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Overhead instrumentasi latency (hook request + TimedCursor + /metrics)
+dan tracing SQL (sql_trace.py).
+
+    python -m bench.bench_metrics --repeat 5000
+
+Skenario:
+  observe/inc     : biaya satu Histogram.observe / Counter.inc
+  GET /login      : request tanpa DB (render template)
+  GET /health     : request dengan satu query DB
+                    masing-masing METRICS_ENABLED=0, =1, dan =1 + SQL_TRACE=1
+  render /metrics : biaya satu scrape setelah semua request di atas
+Tiap mode dijalankan di proses terpisah (flag dibaca saat import app).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.common import print_row, timeit
+from metrics import Registry
+
+
+def child(repeat: int):
+    import app as webapp
+    webapp.open_db_pool(wait=True)
+    client = webapp.app.test_client()
+    out = {}
+    for path in ("/login", "/health"):
+        def run():
+            r = client.get(path)
+            r.close()
+            assert r.status_code == 200, (path, r.status_code)
+        out[path] = timeit(run, repeat, warmup=50)
+    t0 = time.perf_counter()
+    text = webapp.metrics.render()
+    out["render_ms"] = (time.perf_counter() - t0) * 1000
+    out["render_lines"] = text.count("\n")
+    webapp.close_db_pool()
+    print(json.dumps(out))
+
+
+def micro(n: int = 200_000):
+    reg = Registry()
+    h = reg.histogram("h", "h", ("endpoint",))
+    c = reg.counter("c", "c", ("endpoint", "method", "status"))
+    for label, fn in (("Histogram.observe", lambda: h.observe(0.012, "penjualan_save")),
+                      ("Counter.inc", lambda: c.inc("penjualan_save", "POST", 200))):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        print(f"{label:<34} {(time.perf_counter() - t0) / n * 1e9:8.0f} ns/panggil")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5000)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        child(args.repeat)
+        return
+
+    micro()
+    # file flag sendiri supaya flag tracing dari app yang sedang jalan tidak ikut terbaca
+    flag = os.path.join(tempfile.gettempdir(), f"bench-sql-trace-{os.getpid()}")
+    modes = (
+        ("METRICS_ENABLED=0", {"METRICS_ENABLED": "0", "SQL_TRACE": "0"}),
+        ("METRICS_ENABLED=1", {"METRICS_ENABLED": "1", "SQL_TRACE": "0"}),
+        ("+SQL_TRACE=1", {"METRICS_ENABLED": "1", "SQL_TRACE": "1"}),
+    )
+    for label, extra in modes:
+        env = {**os.environ, **extra, "SQL_TRACE_FLAG_FILE": flag}
+        res = subprocess.run([sys.executable, "-m", "bench.bench_metrics", "--child", "--repeat", str(args.repeat)],
+                             env=env, capture_output=True, text=True, check=True)
+        out = json.loads(res.stdout.strip().splitlines()[-1])
+        for path in ("/login", "/health"):
+            print_row(f"GET {path} {label}", out[path])
+        if extra["METRICS_ENABLED"] == "1" and extra["SQL_TRACE"] == "0":
+            print(f"{'render /metrics':<34} {out['render_ms']:.2f}ms ({out['render_lines']} baris)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Query laporan & detail nota sebelum vs sesudah partisi bulanan (migrasi
+008), di beberapa panjang riwayat data.
+
+    python -m bench.bench_partitions --years 1 3 5 --sales-per-day 150
+
+Per nilai --years: buat database sementara di server BENCH_DATABASE_URL /
+DATABASE_URL, migrasi sampai 007, isi dengan bench.seed, ukur; lalu
+terapkan 008 (lama konversi data lama ikut dicetak) dan ukur lagi query yang
+sama. SQL diambil dari app.py. Kolom "partisi" = jumlah tabel sales /
+sale_items yang benar-benar dibaca (EXPLAIN ANALYZE). Database sementara
+dihapus di akhir kecuali --keep.
+"""
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+
+import migrate
+from bench.common import database_url, timeit, print_row
+
+# detail nota sebelum 008 (sale_items belum punya sale_date)
+SQL_DETAIL_ITEMS_BY_ID = """
+    SELECT item_name, sale_price, qty, line_total
+    FROM sale_items
+    WHERE sale_id = %s
+    ORDER BY created_at
+"""
+SQL_REKAP_RAW = "SELECT * FROM v_sales_by_day WHERE day BETWEEN %s AND %s ORDER BY day"
+
+
+def relations_read(plan: dict):
+    """Nama tabel yang dieksekusi (loops > 0) di pohon EXPLAIN ANALYZE."""
+    if plan.get("Relation Name") and plan.get("Actual Loops", 0) > 0:
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", ()):
+        yield from relations_read(child)
+
+
+def partitions_read(conn, sql, params) -> int:
+    plan = conn.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params).fetchone()[0][0]["Plan"]
+    conn.rollback()
+    return len({t for t in relations_read(plan) if t.startswith(("sales", "sale_items"))})
+
+
+def cases(partitioned: bool, end: date, sample):
+    """[(label, sql, params_fn)]; detail nota bergilir di `sample` [(id, sale_date)]."""
+    import app as webapp
+    S = webapp.STATEMENTS
+    month = (end - timedelta(days=29), end)
+    year = (end - timedelta(days=364), end)
+    nxt = itertools.cycle(sample).__next__
+    out = [
+        ("laporan trx (30 hari)", S["laporan_trx_first"], lambda: (*month, 100)),
+        ("bagi hasil (30 hari)", S["profit_sharing"], lambda: month),
+        ("rekap mentah (365 hari)", SQL_REKAP_RAW, lambda: year),
+        ("export nota (30 hari)", webapp.SQL_EXPORT_SALES, lambda: month),
+        ("export barang (30 hari)", webapp.SQL_EXPORT_SALE_ITEMS, lambda: month),
+        ("detail header (id+tgl)", S["sale_detail_header"], nxt),
+    ]
+    if partitioned:
+        out += [
+            ("detail header (id saja)", S["sale_detail_header_any_date"], lambda: nxt()[:1]),
+            ("detail items (id+tgl)", S["sale_detail_items"], nxt),
+        ]
+    else:
+        out.append(("detail items (id)", SQL_DETAIL_ITEMS_BY_ID, lambda: nxt()[:1]))
+    return out
+
+
+def measure(url, partitioned: bool, end: date, repeat: int):
+    with psycopg.connect(url) as conn:
+        conn.execute("SET TimeZone = 'Asia/Jakarta'")
+        # nota acak dari seluruh riwayat (bukan hanya bulan terakhir)
+        sample = conn.execute("SELECT id, sale_date FROM sales TABLESAMPLE SYSTEM (1) LIMIT 500").fetchall()
+        conn.commit()
+        for label, sql, params in cases(partitioned, end, sample):
+            parts = partitions_read(conn, sql, params())
+
+            def run():
+                # prepared seperti app (DB_PREPARE): plan generik + pruning saat eksekusi
+                conn.execute(sql, params(), prepare=True).fetchall()
+                conn.commit()
+
+            print_row(f"{label} [{'partisi' if partitioned else 'biasa'}]", timeit(run, repeat))
+            if parts:   # 0 = dibaca di dalam fungsi (f_profit_sharing), tidak terlihat di EXPLAIN
+                print(f"{'':<34} partisi/tabel dibaca={parts}")
+
+
+def run_years(admin_url, years: float, args, skip):
+    name = f"waserda_bench_part_{str(years).replace('.', '_')}"
+    url = make_conninfo(admin_url, dbname=name)
+    with psycopg.connect(admin_url, autocommit=True) as admin:
+        admin.execute(f"DROP DATABASE IF EXISTS {name}")
+        admin.execute(f"CREATE DATABASE {name} ENCODING 'UTF8' TEMPLATE template0")
+    try:
+        print(f"\n== {years} tahun ({name}) ==")
+        migrate.apply_all(url, target="007", skip=skip)
+        t0 = time.perf_counter()
+        seeded = subprocess.run(
+            [sys.executable, "-m", "bench.seed", "--years", str(years), "--sales-per-day", str(args.sales_per_day),
+             "--end", args.end.isoformat()],
+            env={**os.environ, "BENCH_DATABASE_URL": url}, capture_output=True, text=True)
+        if seeded.returncode:
+            sys.exit(seeded.stdout[-2000:] + seeded.stderr[-2000:])
+        with psycopg.connect(url) as conn:
+            n_sales, n_items = conn.execute(
+                "SELECT (SELECT count(*) FROM sales), (SELECT count(*) FROM sale_items)").fetchone()
+        print(f"seed: {n_sales} nota, {n_items} barang ({time.perf_counter() - t0:.0f}s)")
+
+        measure(url, False, args.end, args.repeat)
+        t0 = time.perf_counter()
+        migrate.apply_all(url, target="008", skip=skip)
+        print(f"konversi ke partisi (008): {time.perf_counter() - t0:.1f}s")
+        measure(url, True, args.end, args.repeat)
+    finally:
+        if not args.keep:
+            with psycopg.connect(admin_url, autocommit=True) as admin:
+                admin.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--years", type=float, nargs="+", default=[1, 3])
+    ap.add_argument("--sales-per-day", type=float, default=150)
+    ap.add_argument("--end", type=date.fromisoformat, default=date.today(), help="tanggal terakhir data")
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--keep", action="store_true", help="jangan hapus database sementara")
+    args = ap.parse_args()
+
+    admin_url = database_url()
+    with psycopg.connect(admin_url) as conn:
+        trgm = conn.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'").fetchone()
+    # 005 butuh pg_trgm (contrib); tidak mempengaruhi query yang diukur di sini
+    skip = () if trgm else ("005",)
+    for years in args.years:
+        run_years(admin_url, years, args, skip)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Latency per query: SQL teks biasa vs prepared statement (app.STATEMENTS).
+
+    python -m bench.bench_prepare --repeat 500
+
+Tiap iterasi di-commit seperti di app: ROLLBACK membuat psycopg membuang
+semua prepared statement koneksi itu, jadi benchmark yang rollback tiap
+query akan mengukur PREPARE ulang terus. Transaksi checkout yang dibuat
+benchmark dihapus lagi di akhir.
+"""
+import argparse
+
+import psycopg
+
+from bench.common import database_url, timeit, print_row
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=500)
+    ap.add_argument("--items", type=int, default=10, help="jumlah baris keranjang checkout")
+    args = ap.parse_args()
+
+    url = database_url()
+    import app as webapp
+    stmts = webapp.STATEMENTS
+
+    with psycopg.connect(url) as conn:
+        sale_id, buyer_id, day = conn.execute(
+            "SELECT id, buyer_id, sale_date FROM sales WHERE buyer_id IS NOT NULL ORDER BY created_at DESC LIMIT 1"
+        ).fetchone()
+        conn.rollback()
+        sale = webapp.parse_sale({
+            "tgl": day.isoformat(), "buyer_id": str(buyer_id), "paid_amount": 100000,
+            "items": [{"nama": f"bench {i}", "beli": 1000, "jual": 1500, "qty": 1} for i in range(args.items)],
+        })
+
+        created = []
+
+        def checkout(prepare):
+            def run():
+                with conn.cursor() as cur:
+                    cur.execute(stmts["sale_header_insert"], sale["header"], prepare=prepare)
+                    new_id = cur.fetchone()[0]
+                    cur.execute(stmts["sale_items_insert"], (new_id, sale["tgl"], *sale["columns"]), prepare=prepare)
+                conn.commit()
+                created.append(new_id)
+            return run
+
+        def query(name, params):
+            def factory(prepare):
+                def run():
+                    with conn.cursor() as cur:
+                        cur.execute(stmts[name], params, prepare=prepare)
+                        cur.fetchall()
+                    conn.commit()
+                return run
+            return factory
+
+        cases = [
+            ("checkout (header+items)", checkout),
+            ("suggest prefix (fallback)", query("item_suggest_prefix", ("indo%", 12))),
+            ("suggest top (fallback)", query("item_suggest_top", (12,))),
+            ("sale detail header", query("sale_detail_header", (sale_id, day))),
+            ("sale detail items", query("sale_detail_items", (sale_id, day))),
+            ("buyer index load", query("buyers_suggest_all", ())),
+        ]
+        try:
+            for label, factory in cases:
+                print_row(f"{label} [text]", timeit(factory(False), args.repeat))
+                print_row(f"{label} [prepared]", timeit(factory(True), args.repeat))
+        finally:
+            conn.rollback()
+            conn.execute("DELETE FROM sales WHERE id = ANY(%s)", (created,))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
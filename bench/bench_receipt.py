@@ -0,0 +1,122 @@
+"""
+Render nota WA: build_receipt_text lama vs baru, atas N nota sintetis.
+
+    python -m bench.bench_receipt --n 100000
+
+Skenario:
+  lama            : salinan build_receipt_text sebelum perubahan (baseline)
+  baru            : template jadi + rupiah ter-cache, tanpa memo
+  memo isi        : dengan sale_id, memo masih kosong (kiriman pertama)
+  memo hit        : nota yang sama lagi (retry / kirim ulang) → dari memo
+Tidak butuh database.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+
+def legacy_rupiah(n: int) -> str:
+    return "Rp {:,}".format(int(n)).replace(",", ".")
+
+
+def legacy_build_receipt_text(*, sale_date, buyer_name, items, total, paid, change, store_name, tz_name):
+    try:
+        now_local = datetime.now(ZoneInfo(tz_name))
+        ts = now_local.strftime("%Y-%m-%d %H:%M")
+    except Exception:
+        ts = datetime.now().strftime("%Y-%m-%d %H:%M")
+    lines = []
+    lines.append(f"*{store_name}*")
+    lines.append("Nota Belanja")
+    lines.append(f"Tanggal : {sale_date} {ts[11:]}")
+    if buyer_name:
+        lines.append(f"Pembeli : {buyer_name}")
+    lines.append("--------------------------------")
+    for it in items:
+        nama = it["nama"]
+        qty = int(it["qty"])
+        jual = int(it["jual"])
+        subtotal = qty * jual
+        lines.append(nama)
+        lines.append(f"{qty} x {legacy_rupiah(jual)} = {legacy_rupiah(subtotal)}")
+    lines.append("--------------------------------")
+    lines.append(f"Total   : *{legacy_rupiah(total)}*")
+    lines.append(f"Bayar   : {legacy_rupiah(paid)}")
+    lines.append(f"Kembali : {legacy_rupiah(change)}")
+    lines.append("--------------------------------")
+    lines.append("Terima kasih 🙏")
+    return "\n".join(lines)
+
+
+def synthetic_receipts(n: int, seed: int = 1):
+    rnd = random.Random(seed)
+    names = [f"Barang {i}" for i in range(500)]
+    prices = [rnd.randrange(500, 150000, 500) for _ in range(300)]
+    out = []
+    for i in range(n):
+        items = [{"nama": rnd.choice(names), "qty": rnd.randint(1, 5), "jual": rnd.choice(prices)}
+                 for _ in range(rnd.randint(1, 15))]
+        total = sum(it["qty"] * it["jual"] for it in items)
+        paid = total + rnd.choice((0, 500, 1000, 5000, 20000))
+        out.append({
+            "sale_id": f"sale-{i}", "sale_date": "2025-01-15", "buyer_name": f"Pembeli {i % 400}",
+            "items": items, "total": total, "paid": paid, "change": paid - total,
+        })
+    return out
+
+
+def run(label, fn, receipts):
+    t0 = time.perf_counter()
+    for r in receipts:
+        fn(r)
+    dt = time.perf_counter() - t0
+    print(f"{label:<20} {len(receipts):>7} nota  {dt:7.2f}s  {len(receipts) / dt:10.0f} nota/s  "
+          f"{dt / len(receipts) * 1e6:7.2f}µs/nota")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100_000)
+    args = ap.parse_args()
+
+    # memo cukup besar untuk seluruh nota bench (default app: RECEIPT_CACHE_SIZE)
+    os.environ.setdefault("RECEIPT_CACHE_SIZE", str(args.n))
+    import app as webapp
+
+    receipts = synthetic_receipts(args.n)
+    tz = webapp.app.config["TZ"]
+    now = datetime.now(webapp.LOCAL_TZ)
+
+    def legacy(r):
+        return legacy_build_receipt_text(
+            sale_date=r["sale_date"], buyer_name=r["buyer_name"], items=r["items"], total=r["total"],
+            paid=r["paid"], change=r["change"], store_name=webapp.STORE_NAME, tz_name=tz)
+
+    def new(r):
+        return webapp.build_receipt_text(
+            sale_date=r["sale_date"], buyer_name=r["buyer_name"], items=r["items"], total=r["total"],
+            paid=r["paid"], change=r["change"], created_at=now)
+
+    def memo(r):
+        return webapp.build_receipt_text(
+            sale_date=r["sale_date"], buyer_name=r["buyer_name"], items=r["items"], total=r["total"],
+            paid=r["paid"], change=r["change"], sale_id=r["sale_id"], created_at=now)
+
+    # isi harus sama persis dengan versi lama (jam nota = menit yang sama)
+    for r in receipts[:1000]:
+        assert new(r) == legacy(r), r["sale_id"]
+        assert memo(r) == legacy(r), r["sale_id"]
+    webapp._render_receipt_cached.cache_clear()
+
+    run("lama", legacy, receipts)
+    run("baru", new, receipts)
+    run("memo isi", memo, receipts)
+    run("memo hit", memo, receipts)
+    print("memo:", webapp.receipt_cache_stats())
+
+
+if __name__ == "__main__":
+    main()
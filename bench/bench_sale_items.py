@@ -0,0 +1,80 @@
+"""
+Bandingkan insert sale_items per baris (cara lama) vs satu INSERT ... unnest()
+(SQL_SALE_ITEMS_INSERT di app.py) terhadap Postgres lokal.
+
+    python -m bench.bench_sale_items --sizes 5 30 60 --repeat 200
+
+Memakai temp table tiruan sale_items (LIKE sale_items) dalam transaksi yang
+di-rollback, jadi data asli tidak tersentuh.
+"""
+import argparse
+import random
+from datetime import date
+
+import psycopg
+
+from bench.common import database_url, timeit, print_row
+
+OLD_SQL = """
+    INSERT INTO sale_items_bench
+      (sale_id, sale_date, item_name, cost_price, sale_price, qty, line_total, line_cost, line_profit)
+    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+"""
+
+NEW_SQL = """
+    INSERT INTO sale_items_bench
+      (sale_id, sale_date, item_name, cost_price, sale_price, qty, line_total, line_cost, line_profit)
+    SELECT %s, %s, u.*
+    FROM unnest(%s::text[], %s::bigint[], %s::bigint[], %s::int[],
+                %s::bigint[], %s::bigint[], %s::bigint[]) AS u
+"""
+
+
+def fake_cart(n):
+    out = []
+    for i in range(n):
+        beli = random.randint(1, 50) * 500
+        out.append({"nama": f"Barang {i}", "beli": beli, "jual": beli + 500, "qty": random.randint(1, 5)})
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[5, 30, 60])
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    with psycopg.connect(database_url()) as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TEMP TABLE sale_items_bench (LIKE sale_items INCLUDING DEFAULTS)")
+        cur.execute("ALTER TABLE sale_items_bench ALTER COLUMN sale_id DROP NOT NULL")
+        cur.execute("SELECT id, sale_date FROM sales LIMIT 1")
+        sale_id, day = cur.fetchone() or (None, date.today())
+
+        for n in args.sizes:
+            cart = fake_cart(n)
+
+            def old_path():
+                for it in cart:
+                    lt, lc = it["jual"] * it["qty"], it["beli"] * it["qty"]
+                    cur.execute(OLD_SQL, (sale_id, day, it["nama"], it["beli"], it["jual"], it["qty"], lt, lc, lt - lc))
+
+            def new_path():
+                cur.execute(NEW_SQL, (
+                    sale_id, day,
+                    [it["nama"] for it in cart],
+                    [it["beli"] for it in cart],
+                    [it["jual"] for it in cart],
+                    [it["qty"] for it in cart],
+                    [it["jual"] * it["qty"] for it in cart],
+                    [it["beli"] * it["qty"] for it in cart],
+                    [(it["jual"] - it["beli"]) * it["qty"] for it in cart],
+                ))
+
+            print_row(f"per-row  items={n}", timeit(old_path, args.repeat))
+            print_row(f"unnest   items={n}", timeit(new_path, args.repeat))
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Latency per kiriman WA: requests.post biasa (koneksi baru tiap nota) vs
+WAClient (Session keep-alive), terhadap gateway palsu lokal (fake_wa.py).
+
+    python -m bench.bench_wa --repeat 500 --threads 1 4
+
+fake_wa dijalankan di gunicorn gthread, bukan `python fake_wa.py`: server
+dev Flask menutup koneksi setelah tiap response, jadi keep-alive tidak
+pernah terjadi. Dengan --url, fake_wa tidak dijalankan dan yang diukur
+gateway itu (jangan arahkan ke gateway produksi: tiap iterasi = satu
+pesan terkirim).
+Lewat HTTPS selisihnya lebih besar karena handshake TLS ikut dihemat.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from bench.bench_load import ROOT
+from bench.common import print_row
+from wa_client import WAClient
+
+MESSAGE = "Nota bench\n" + "-" * 32 + "\nIndomie Goreng x2 Rp7.000\n" * 5
+
+
+def start_fake_wa(port: int, delay_ms: int):
+    env = {**os.environ, "FAKE_WA_DELAY_MS": str(delay_ms)}
+    cmd = [sys.executable, "-m", "gunicorn", "fake_wa:app", "--bind", f"127.0.0.1:{port}",
+           "--worker-class", "gthread", "--threads", "16", "--keep-alive", "30"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    end = time.time() + 15
+    while time.time() < end:
+        if proc.poll() is not None:
+            sys.exit("fake_wa berhenti sebelum siap")
+        try:
+            requests.get(f"{base}/messages", timeout=1)
+            return proc, f"{base}/send-message"
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    sys.exit("fake_wa tidak siap dalam 15s")
+
+
+def run(send, repeat: int, threads: int):
+    """send() dipanggil `repeat` kali per thread; return (latency ms, durasi total)."""
+    lat, lock = [], threading.Lock()
+
+    def loop():
+        mine = []
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            ok, status, _ = send("6281200000000", MESSAGE)
+            if not ok:
+                raise RuntimeError(f"HTTP {status}")
+            mine.append((time.perf_counter() - t0) * 1000)
+        with lock:
+            lat.extend(mine)
+
+    send("6281200000000", MESSAGE)   # warm-up
+    workers = [threading.Thread(target=loop) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return lat, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=500, help="kiriman per thread")
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    ap.add_argument("--url", default=None, help="gateway yang diukur (default: fake_wa lokal)")
+    ap.add_argument("--port", type=int, default=5056)
+    ap.add_argument("--delay-ms", type=int, default=0, help="jeda fake_wa per kiriman")
+    args = ap.parse_args()
+
+    proc, url = (None, args.url) if args.url else start_fake_wa(args.port, args.delay_ms)
+    try:
+        for threads in args.threads:
+            def plain(number, message):
+                resp = requests.post(url, json={"number": number, "message": message}, timeout=(3.05, 10))
+                return 200 <= resp.status_code < 300, resp.status_code, resp.text
+
+            client = WAClient(url, pool_size=threads)
+            for label, send in (("requests.post (baru)", plain), ("WAClient (keep-alive)", client.send)):
+                lat, wall = run(send, args.repeat, threads)
+                print_row(f"{label} t={threads}", lat)
+                print(f"{'':<34} throughput={len(lat) / wall:8.1f} kirim/s")
+            client.close()
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
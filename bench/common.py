@@ -0,0 +1,53 @@
+"""Helper kecil yang dipakai semua script benchmark di folder ini."""
+import os
+import statistics
+import sys
+import time
+
+from dotenv import load_dotenv
+
+
+def database_url() -> str:
+    load_dotenv()
+    url = os.getenv("BENCH_DATABASE_URL") or os.getenv("DATABASE_URL")
+    if not url:
+        sys.exit("Set BENCH_DATABASE_URL / DATABASE_URL ke Postgres lokal (jangan produksi)")
+    return url
+
+
+def percentile(samples, p: float) -> float:
+    if not samples:
+        return 0.0
+    xs = sorted(samples)
+    k = (len(xs) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def timeit(fn, repeat: int, warmup: int = 3):
+    """Jalankan fn() `repeat` kali, return list durasi dalam ms."""
+    for _ in range(warmup):
+        fn()
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def summarize(samples_ms) -> dict:
+    return {
+        "n": len(samples_ms),
+        "mean_ms": statistics.fmean(samples_ms) if samples_ms else 0.0,
+        "p50_ms": percentile(samples_ms, 50),
+        "p95_ms": percentile(samples_ms, 95),
+        "p99_ms": percentile(samples_ms, 99),
+    }
+
+
+def print_row(label: str, samples_ms):
+    s = summarize(samples_ms)
+    print(f"{label:<34} n={s['n']:<5} mean={s['mean_ms']:8.3f}ms "
+          f"p50={s['p50_ms']:8.3f}ms p95={s['p95_ms']:8.3f}ms p99={s['p99_ms']:8.3f}ms")
@@ -0,0 +1,315 @@
+"""
+Suite benchmark end-to-end: checkout, suggest barang, cari pembeli, dan
+laporan, dijalankan lewat Flask test client (in-process) atau HTTP ke
+server yang sedang jalan. Mencetak p50/p95/p99 + req/s, bisa disimpan
+sebagai baseline dan dibandingkan dengan run berikutnya.
+
+    python -m bench.seed --reset --yes --years 2          # data sintetis dulu
+    python -m bench.run --save baseline                   # → bench/results/baseline.json
+    python -m bench.run --compare bench/results/baseline.json --threshold 15
+    python -m bench.run --mode http --base-url http://127.0.0.1:8000 --concurrency 8
+
+Skenario (pilih dengan --only):
+  checkout      : POST /penjualan, keranjang 1-8 barang acak (nota dihapus lagi di akhir)
+  item_suggest  : GET /api/items/suggest?q=<awalan nama barang>
+  buyer_suggest : GET /api/buyers/suggest?q=<awalan nama pembeli>
+  buyer_list    : GET /pembeli?q=<awalan nama pembeli>
+  laporan_month : GET /laporan satu bulan acak (halaman penuh, di-stream)
+  laporan_trx   : GET /laporan/trx satu bulan acak (JSON keyset)
+  sale_detail   : GET /laporan/sale/<id>?date= nota acak
+
+Parameter diambil dari isi DB dengan --seed yang sama → urutan request sama
+antar run. --no-cache mematikan report_cache (mode client) supaya laporan
+selalu mengukur query, bukan cache hit.
+--compare keluar dengan kode 1 kalau p50 atau p95 suatu skenario lebih
+lambat dari baseline melebihi --threshold persen (bisa dipakai di CI).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import psycopg
+
+from bench.common import database_url, summarize
+from bench.bench_load import ROOT, login
+
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+SCENARIOS = ("checkout", "item_suggest", "buyer_suggest", "buyer_list",
+             "laporan_month", "laporan_trx", "sale_detail")
+
+
+# =========================
+# Parameter dari DB
+# =========================
+def load_params(url: str, seed: int) -> dict:
+    """Sampel nama barang, pembeli, id nota dan rentang tanggal (sekali di awal)."""
+    with psycopg.connect(url) as conn:
+        def sample(sql_sampled, sql_all):
+            rows = conn.execute(sql_sampled, (seed,)).fetchall()
+            return rows if len(rows) >= 20 else conn.execute(sql_all).fetchall()
+
+        items = sample("SELECT item_name, cost_price, sale_price FROM sale_items "
+                       "TABLESAMPLE BERNOULLI (1) REPEATABLE (%s) LIMIT 2000",
+                       "SELECT item_name, cost_price, sale_price FROM sale_items LIMIT 2000")
+        sales = sample("SELECT id, sale_date FROM sales TABLESAMPLE BERNOULLI (1) REPEATABLE (%s) LIMIT 2000",
+                       "SELECT id, sale_date FROM sales LIMIT 2000")
+        buyers = conn.execute("SELECT id, name FROM buyers ORDER BY id LIMIT 5000").fetchall()
+        lo, hi = conn.execute("SELECT min(sale_date), max(sale_date) FROM sales").fetchone()
+        counts = dict(conn.execute(
+            "SELECT relname, reltuples::bigint FROM pg_class "
+            "WHERE relname IN ('sales', 'sale_items', 'buyers') AND relkind IN ('r', 'p')").fetchall())
+    if not items or not sales or not buyers or lo is None:
+        sys.exit("DB kosong: isi dulu dengan python -m bench.seed")
+    return {"items": items, "sales": [(str(r[0]), r[1].isoformat()) for r in sales], "buyers": buyers,
+            "range": (lo, hi), "counts": counts}
+
+
+def month_range(rnd: random.Random, lo: date, hi: date):
+    d = lo + timedelta(days=rnd.randrange(max(1, (hi - lo).days + 1)))
+    start = d.replace(day=1)
+    end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return start.isoformat(), min(end, hi).isoformat()
+
+
+def prefix(rnd: random.Random, name: str) -> str:
+    word = rnd.choice(name.split())
+    return word[:rnd.randint(2, min(5, len(word)))] if len(word) > 2 else word
+
+
+def make_request(name: str, rnd: random.Random, params: dict):
+    """(method, path, json_body|None) untuk satu request skenario `name`."""
+    if name == "checkout":
+        lines = rnd.sample(params["items"], k=min(len(params["items"]), rnd.randint(1, 8)))
+        items = [{"nama": n, "beli": int(b), "jual": int(j), "qty": rnd.randint(1, 3)} for n, b, j in lines]
+        total = sum(i["jual"] * i["qty"] for i in items)
+        buyer = rnd.choice(params["buyers"])[0]
+        return "POST", "/penjualan", {"tgl": date.today().isoformat(), "buyer_id": str(buyer),
+                                      "items": items, "paid_amount": total}
+    if name == "item_suggest":
+        return "GET", f"/api/items/suggest?q={prefix(rnd, rnd.choice(params['items'])[0])}", None
+    if name in ("buyer_suggest", "buyer_list"):
+        q = prefix(rnd, rnd.choice(params["buyers"])[1])
+        return "GET", (f"/api/buyers/suggest?q={q}" if name == "buyer_suggest" else f"/pembeli?q={q}"), None
+    if name == "laporan_month":
+        f, t = month_range(rnd, *params["range"])
+        return "GET", f"/laporan?from={f}&to={t}", None
+    if name == "laporan_trx":
+        f, t = month_range(rnd, *params["range"])
+        return "GET", f"/laporan/trx?from={f}&to={t}", None
+    if name == "sale_detail":
+        sale_id, day = rnd.choice(params["sales"])
+        return "GET", f"/laporan/sale/{sale_id}?date={day}", None
+    raise ValueError(name)
+
+
+# =========================
+# Driver: test client / HTTP
+# =========================
+class ClientDriver:
+    """Flask test client in-process: tanpa jaringan, mengukur app + DB saja."""
+    concurrency = 1
+
+    def __init__(self, no_cache: bool):
+        if no_cache:
+            os.environ["REPORT_CACHE_SIZE"] = "0"
+        sys.path.insert(0, ROOT)
+        import app as webapp
+        self.webapp = webapp
+        webapp.open_db_pool(wait=True)
+
+    def session(self):
+        client = self.webapp.app.test_client()
+        with client.session_transaction() as s:
+            s["user"] = {"username": "bench"}
+
+        def send(method, path, body):
+            r = client.open(path, method=method, json=body)
+            data = r.get_data()   # habiskan stream (laporan)
+            r.close()
+            return r.status_code, (json.loads(data) if r.is_json else None)
+        return send
+
+    def close(self):
+        self.webapp.close_db_pool()
+
+
+class HttpDriver:
+    """HTTP ke server yang sudah jalan (gunicorn/flask run); satu session per thread."""
+
+    def __init__(self, base_url: str, concurrency: int):
+        self.base = base_url.rstrip("/")
+        self.concurrency = concurrency
+
+    def session(self):
+        s = login(self.base)
+
+        def send(method, path, body):
+            r = s.request(method, self.base + path, json=body, timeout=60)
+            ctype = r.headers.get("Content-Type", "")
+            return r.status_code, (r.json() if ctype.startswith("application/json") else None)
+        return send
+
+    def close(self):
+        pass
+
+
+def run_scenario(driver, name: str, params: dict, n: int, warmup: int, seed: int):
+    """Return (latency ms list, errors, wall detik, id nota yang dibuat)."""
+    workers = max(1, driver.concurrency)
+    per_worker = [n // workers + (1 if i < n % workers else 0) for i in range(workers)]
+    lat, created, errors = [], [], [0]
+    lock = threading.Lock()
+
+    def worker(i, count):
+        rnd = random.Random(f"{seed}:{name}:{i}")
+        send = driver.session()
+        mine, ids, errs = [], [], 0
+        for k in range(warmup + count):
+            method, path, body = make_request(name, rnd, params)
+            t0 = time.perf_counter()
+            try:
+                status, data = send(method, path, body)
+                ok = status == 200 and (data is None or data.get("ok", True))
+            except Exception:
+                status, data, ok = None, None, False
+            dt = (time.perf_counter() - t0) * 1000
+            if data and data.get("sale_id"):
+                ids.append(data["sale_id"])
+            if k < warmup:
+                continue
+            if ok:
+                mine.append(dt)
+            else:
+                errs += 1
+        with lock:
+            lat.extend(mine)
+            created.extend(ids)
+            errors[0] += errs
+
+    threads = [threading.Thread(target=worker, args=(i, c)) for i, c in enumerate(per_worker)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return lat, errors[0], time.perf_counter() - t0, created
+
+
+def cleanup(url: str, sale_ids):
+    if not sale_ids:
+        return
+    with psycopg.connect(url) as conn:
+        conn.execute("DELETE FROM sales WHERE id = ANY(%s::uuid[])", (sale_ids,))
+    print(f"{len(sale_ids)} nota checkout benchmark dihapus")
+
+
+# =========================
+# Baseline
+# =========================
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """Cetak selisih vs baseline; return True kalau ada regresi > threshold%."""
+    print(f"\nvs baseline {baseline['meta'].get('name')} ({baseline['meta'].get('commit')}, "
+          f"{baseline['meta'].get('at')}), ambang {threshold:g}%")
+    for key in ("mode", "concurrency", "no_cache", "dataset"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"PERINGATAN: {key} beda dari baseline ({baseline['meta'].get(key)} vs "
+                  f"{current['meta'].get(key)}); angka tidak sebanding")
+    regressed = False
+    for name, cur in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old:
+            print(f"{name:<14} (tidak ada di baseline)")
+            continue
+        parts, bad = [], False
+        for key in ("p50_ms", "p95_ms", "rps"):
+            if not old.get(key):
+                continue
+            diff = (cur[key] - old[key]) / old[key] * 100
+            # latency naik = lebih buruk; throughput turun = lebih buruk
+            worse = diff > threshold if key != "rps" else -diff > threshold
+            bad |= worse and key != "rps"
+            parts.append(f"{key[:-3] if key.endswith('_ms') else key} {diff:+6.1f}%{' !' if worse else '  '}")
+        regressed |= bad
+        print(f"{name:<14} " + "  ".join(parts) + ("  REGRESI" if bad else ""))
+    return regressed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=("client", "http"), default="client")
+    ap.add_argument("--base-url", default="http://127.0.0.1:8000", help="untuk --mode http")
+    ap.add_argument("--concurrency", type=int, default=4, help="thread klien untuk --mode http")
+    ap.add_argument("--requests", type=int, default=200, help="request terukur per skenario")
+    ap.add_argument("--warmup", type=int, default=10, help="request pemanasan per thread (tidak diukur)")
+    ap.add_argument("--only", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--no-cache", action="store_true", help="REPORT_CACHE_SIZE=0 (mode client)")
+    ap.add_argument("--keep", action="store_true", help="jangan hapus nota hasil skenario checkout")
+    ap.add_argument("--save", metavar="NAME", help="simpan hasil ke bench/results/NAME.json")
+    ap.add_argument("--compare", metavar="FILE", help="bandingkan dengan hasil tersimpan")
+    ap.add_argument("--threshold", type=float, default=10.0, help="persen regresi yang ditoleransi")
+    args = ap.parse_args()
+
+    url = database_url()
+    params = load_params(url, args.seed)
+    lo, hi = params["range"]
+    print(f"data: {params['counts']} sales {lo}..{hi}; mode={args.mode}")
+    driver = ClientDriver(args.no_cache) if args.mode == "client" else HttpDriver(args.base_url, args.concurrency)
+
+    results, created = {}, []
+    try:
+        for name in args.only:
+            lat, errors, wall, ids = run_scenario(driver, name, params, args.requests, args.warmup, args.seed)
+            created.extend(ids)
+            s = summarize(lat)
+            s["errors"] = errors
+            s["rps"] = (len(lat) + errors) / wall if wall else 0.0
+            results[name] = s
+            print(f"{name:<14} n={s['n']:<5} err={errors:<3} mean={s['mean_ms']:8.2f}ms p50={s['p50_ms']:8.2f}ms "
+                  f"p95={s['p95_ms']:8.2f}ms p99={s['p99_ms']:8.2f}ms {s['rps']:8.1f} req/s", flush=True)
+    finally:
+        driver.close()
+        if not args.keep:
+            cleanup(url, created)
+
+    current = {
+        "meta": {
+            "name": args.save, "at": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+            "mode": args.mode, "concurrency": driver.concurrency, "requests": args.requests,
+            "seed": args.seed, "no_cache": args.no_cache, "dataset": params["counts"],
+            "range": [lo.isoformat(), hi.isoformat()], "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{args.save}.json")
+        with open(path, "w") as f:
+            json.dump(current, f, indent=2, default=str)
+            f.write("\n")
+        print(f"hasil disimpan: {os.path.relpath(path, ROOT)}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Isi Postgres lokal dengan data toko sintetis untuk benchmark (bench/run.py
+dan script bench_* lain). Deterministik: --seed yang sama → data yang sama.
+
+    python -m bench.seed --buyers 2000 --items 1500 --years 3 --sales-per-day 150
+    python -m bench.seed --reset --yes ...     # kosongkan sales/sale_items/buyers dulu
+
+Data ditulis dengan COPY per bulan (satu transaksi per bulan). Trigger
+dilewati (session_replication_role=replica, perlu superuser) lalu rollup
+sales_daily & item_stats dihitung ulang sekali di akhir; tanpa superuser
+trigger tetap jalan (jauh lebih lambat, hasil sama).
+
+Distribusi dibuat mirip warung: barang & pembeli populer jauh lebih sering
+(Zipf), ramai di akhir pekan, 1-12 barang per nota, ~70% transaksi punya
+pembeli, harga naik pelan-pelan dari tahun ke tahun.
+Pakai BENCH_DATABASE_URL / DATABASE_URL lokal, JANGAN database produksi.
+"""
+import argparse
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from zoneinfo import ZoneInfo
+
+import psycopg
+
+from bench.common import database_url
+
+BRANDS = ["Indomie", "Mie Sedaap", "Aqua", "Le Minerale", "Teh Pucuk", "Sosro", "Ultra", "Frisian Flag",
+          "Gulaku", "Bimoli", "Sania", "Rinso", "So Klin", "Lifebuoy", "Pepsodent", "Sunlight", "Kapal Api",
+          "ABC", "Good Day", "Roma", "Chitato", "Taro", "Beng-Beng", "SilverQueen", "Kecap Bango",
+          "Sasa", "Royco", "Masako", "Dancow", "Milo", "Pocari", "Yakult", "Sampoerna", "Gudang Garam"]
+PRODUCTS = ["Goreng", "Soto", "Kari Ayam", "Original", "Pedas", "Manis", "Coklat", "Vanila", "Kopi Susu",
+            "Jeruk", "Melon", "Strawberry", "Sachet", "Botol", "Kaleng", "Refill", "Jumbo", "Mini", "Lite"]
+SIZES = ["", "", "50g", "75g", "100g", "250g", "500g", "1kg", "200ml", "330ml", "600ml", "1L", "1.5L", "isi 10"]
+FIRST = ["Ani", "Budi", "Citra", "Dedi", "Eka", "Fajar", "Gita", "Hadi", "Indah", "Joko", "Kiki", "Lina",
+         "Made", "Nur", "Oki", "Putri", "Rina", "Sari", "Tono", "Udin", "Wati", "Yanto", "Zul", "Agus", "Bayu",
+         "Dewi", "Rudi", "Siti", "Wahyu", "Yuni"]
+LAST = ["", "", "Santoso", "Wijaya", "Saputra", "Lestari", "Hidayat", "Kurniawan", "Pratama", "Rahayu",
+        "Setiawan", "Nugroho", "Susanti", "Gunawan", "Permata", "Siregar", "Nasution", "Halim"]
+WEEKDAY_FACTOR = [0.9, 0.85, 0.9, 0.95, 1.05, 1.3, 1.25]   # Senin..Minggu
+
+
+def zipf_weights(n: int, s: float = 0.9):
+    return list(accumulate(1 / (r + 1) ** s for r in range(n)))
+
+
+def make_items(n: int, rnd: random.Random):
+    """[(nama, harga_beli, harga_jual)] unik, urut popularitas."""
+    names, seen = [], set()
+    while len(names) < n:
+        name = " ".join(p for p in (rnd.choice(BRANDS), rnd.choice(PRODUCTS), rnd.choice(SIZES)) if p)
+        if len(seen) >= len(BRANDS) * len(PRODUCTS) * len(SIZES) // 2:
+            name = f"{name} #{len(names)}"   # katalog besar: pastikan unik
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    items = []
+    for name in names:
+        cost = rnd.randrange(1000, 80000, 100)
+        items.append((name, cost, round(cost * rnd.uniform(1.08, 1.35) / 500) * 500 or 500))
+    return items
+
+
+def make_buyers(n: int, rnd: random.Random, start: date, tz):
+    rows = []
+    for i in range(n):
+        name = " ".join(p for p in (rnd.choice(FIRST), rnd.choice(LAST)) if p)
+        if i >= len(FIRST):
+            name = f"{name} {i}"
+        phone = f"628{rnd.randrange(11, 99)}{rnd.randrange(10**7, 10**8)}" if rnd.random() < 0.8 else None
+        created = datetime.combine(start, datetime.min.time(), tz) + timedelta(
+            seconds=rnd.randrange(0, 86400 * 30))
+        rows.append((uuid.UUID(int=rnd.getrandbits(128), version=4),
+                     name, phone, True, "bench", created))
+    return rows
+
+
+def months(start: date, end: date):
+    d = start.replace(day=1)
+    while d <= end:
+        nxt = (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+        yield max(d, start), min(nxt - timedelta(days=1), end)
+        d = nxt
+
+
+def gen_month(rnd, m_from: date, m_to: date, end: date, args, items, item_cum, buyers, buyer_cum, tz):
+    """Baris sales & sale_items untuk satu bulan (dibuat di memori, lalu di-COPY)."""
+    sales, lines = [], []
+    d = m_from
+    while d <= m_to:
+        # harga naik ~5%/tahun menuju tanggal akhir
+        drift = 1 - 0.05 * (end - d).days / 365
+        n = max(0, int(rnd.gauss(args.sales_per_day * WEEKDAY_FACTOR[d.weekday()], args.sales_per_day * 0.15)))
+        day_start = datetime.combine(d, datetime.min.time(), tz) + timedelta(hours=7)
+        times = sorted(rnd.randrange(0, 14 * 3600 * 1000) for _ in range(n))
+        for ms in times:
+            created = day_start + timedelta(milliseconds=ms)
+            sale_id = uuid.UUID(int=rnd.getrandbits(128), version=4)
+            buyer = rnd.choices(buyers, cum_weights=buyer_cum)[0] if buyers and rnd.random() < 0.7 else None
+            total = cost = 0
+            k = min(args.max_lines, 1 + int(rnd.expovariate(1 / 2.5)))
+            for j, (name, beli, jual) in enumerate(rnd.choices(items, cum_weights=item_cum, k=k)):
+                beli = max(100, round(beli * drift / 100) * 100)
+                jual = max(beli, round(jual * drift / 500) * 500)
+                qty = 1 if rnd.random() < 0.7 else rnd.randint(2, 6)
+                lt, lc = jual * qty, beli * qty
+                total += lt
+                cost += lc
+                lines.append((uuid.UUID(int=rnd.getrandbits(128), version=4), sale_id, name, beli, jual, qty,
+                              lt, lc, lt - lc, created + timedelta(microseconds=j), d))
+            paid = total if rnd.random() < 0.4 else -(-total // 5000) * 5000 + rnd.choice((0, 0, 5000, 10000))
+            phone = buyer is not None and buyer[2] is not None
+            wa = ("failed" if rnd.random() < 0.02 else "sent") if phone else "none"
+            sales.append((sale_id, d, buyer[0] if buyer else None, total, cost, total - cost, paid, paid - total,
+                          wa, created + timedelta(seconds=3) if wa == "sent" else None, created))
+        d += timedelta(days=1)
+    return sales, lines
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--buyers", type=int, default=2000)
+    ap.add_argument("--items", type=int, default=1500, help="jumlah nama barang berbeda")
+    ap.add_argument("--years", type=float, default=1)
+    ap.add_argument("--sales-per-day", type=float, default=150)
+    ap.add_argument("--max-lines", type=int, default=12, help="maks barang per nota")
+    ap.add_argument("--end", default=None, help="tanggal terakhir YYYY-MM-DD (default: hari ini)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--reset", action="store_true", help="TRUNCATE sales, sale_items, buyers, rollup dulu")
+    ap.add_argument("--yes", action="store_true", help="konfirmasi --reset")
+    args = ap.parse_args()
+    if args.reset and not args.yes:
+        sys.exit("--reset menghapus SEMUA transaksi & pembeli; tambahkan --yes kalau yakin")
+
+    url = database_url()
+    rnd = random.Random(args.seed)
+    tz = ZoneInfo("Asia/Jakarta")
+    end = date.fromisoformat(args.end) if args.end else date.today()
+    start = end - timedelta(days=int(args.years * 365) - 1)
+
+    items = make_items(args.items, rnd)
+    item_cum = zipf_weights(len(items))
+    buyers = make_buyers(args.buyers, rnd, start, tz)
+    buyer_cum = zipf_weights(len(buyers), 0.7)
+
+    t0 = time.perf_counter()
+    n_sales = n_lines = 0
+    with psycopg.connect(url) as conn:
+        conn.execute("SET TimeZone = 'Asia/Jakarta'")
+        try:
+            conn.execute("SET session_replication_role = replica")
+            triggers = False
+        except psycopg.Error as e:
+            conn.rollback()
+            triggers = True
+            print(f"trigger tidak bisa dilewati ({e.diag.message_primary}); seeding lebih lambat")
+        conn.commit()
+
+        if args.reset:
+            conn.execute("TRUNCATE sale_items, sales, buyers CASCADE")
+            for table in ("item_stats", "sales_daily", "sales_daily_delta"):
+                if conn.execute("SELECT to_regclass(%s)", (table,)).fetchone()[0]:
+                    conn.execute(f"TRUNCATE {table}")
+            conn.commit()
+            print("reset: sales, sale_items, buyers, rollup dikosongkan")
+
+        with conn.cursor() as cur:
+            with cur.copy("COPY buyers (id, name, phone_e164, wa_opt_in, note, created_at) FROM STDIN") as cp:
+                for row in buyers:
+                    cp.write_row(row)
+        conn.commit()
+
+        # sejak migrasi 008 sale_items ikut dipartisi per sale_date
+        partitioned = conn.execute(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'sale_items' AND column_name = 'sale_date'").fetchone() is not None
+        if partitioned:
+            conn.execute("SELECT ensure_sales_partitions(%s, %s)", (start, end))
+            conn.commit()
+        items_copy = ("COPY sale_items (id, sale_id, item_name, cost_price, sale_price, qty, line_total, "
+                      f"line_cost, line_profit, created_at{', sale_date' if partitioned else ''}) FROM STDIN")
+
+        for m_from, m_to in months(start, end):
+            sales, lines = gen_month(rnd, m_from, m_to, end, args, items, item_cum, buyers, buyer_cum, tz)
+            with conn.cursor() as cur:
+                with cur.copy("COPY sales (id, sale_date, buyer_id, total_amount, total_cost, total_profit, "
+                              "paid_amount, change_amount, wa_status, wa_sent_at, created_at) FROM STDIN") as cp:
+                    for row in sales:
+                        cp.write_row(row)
+                with cur.copy(items_copy) as cp:
+                    for row in lines:
+                        cp.write_row(row if partitioned else row[:-1])
+            conn.commit()
+            n_sales += len(sales)
+            n_lines += len(lines)
+            print(f"{m_from:%Y-%m}: {len(sales):>7} nota {len(lines):>8} barang  "
+                  f"(total {n_sales} / {n_lines}, {time.perf_counter() - t0:.0f}s)", flush=True)
+
+        if not triggers:
+            conn.execute("SET session_replication_role = DEFAULT")
+            for fn, call in (("sales_daily_rebuild", "SELECT sales_daily_rebuild(%s, %s)"),
+                             ("item_stats_rebuild", "SELECT item_stats_rebuild()")):
+                if conn.execute("SELECT to_regproc(%s)", (fn,)).fetchone()[0]:
+                    conn.execute(call, (start, end) if "%s" in call else ())
+                    print(f"{fn} selesai")
+            conn.commit()
+        elif conn.execute("SELECT to_regproc('sales_daily_flush')").fetchone()[0]:
+            # trigger jalan → delta rekap harian per nota (migrasi 010); lipat sekarang
+            conn.execute("SELECT sales_daily_flush()")
+            conn.commit()
+        conn.autocommit = True
+        conn.execute("ANALYZE buyers")
+        conn.execute("ANALYZE sales")
+        conn.execute("ANALYZE sale_items")
+
+    dt = time.perf_counter() - t0
+    print(f"selesai: {len(buyers)} pembeli, {n_sales} nota, {n_lines} barang, "
+          f"{start}..{end} dalam {dt:.1f}s ({(n_sales + n_lines) / dt:,.0f} baris/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Validasi & hitung keranjang checkout (POST /penjualan) dalam satu lintasan.
+
+parse_cart() mengubah body JSON menjadi Cart berisi CartLine (tuple ringan
+bertipe), menolak baris rusak sedini mungkin (CartError → HTTP 400), dan
+menghitung total per baris + header sekali jalan.
+
+Harga tidak lagi dipercaya begitu saja: kalau `lookup` diberikan (index
+saran barang, lihat suggest_index.py), harga jual/beli dibandingkan dengan
+harga terakhir & rata-rata barang itu. Yang menyimpang lebih dari
+`outlier_ratio` kali dari keduanya, atau dijual di bawah harga beli,
+ditandai sebagai peringatan (tidak ditolak: harga memang bisa berubah/promo).
+"""
+from datetime import date
+from typing import NamedTuple
+
+MAX_NAME_LEN = 200
+MAX_QTY = 100_000
+MAX_PRICE = 1_000_000_000
+
+
+class CartError(ValueError):
+    """Keranjang tidak valid; pesan ditampilkan ke kasir."""
+
+
+class CartLine(NamedTuple):
+    nama: str
+    beli: int
+    jual: int
+    qty: int
+    total: int
+    cost: int
+    profit: int
+
+
+class Cart(NamedTuple):
+    tgl: str
+    buyer_id: str
+    paid: int
+    # kolom per field (bukan list baris): langsung jadi parameter INSERT ... unnest(),
+    # urutan = field CartLine
+    columns: tuple
+    total: int
+    cost: int
+    profit: int
+    change: int
+    warnings: list
+
+    def lines(self):
+        return [CartLine(*row) for row in zip(*self.columns)]
+
+
+def _int(value, field: str, line: int = None) -> int:
+    # bool adalah int di Python, tapi bukan angka yang valid di sini
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    where = f"Baris {line + 1}: " if line is not None else ""
+    raise CartError(f"{where}{field} harus bilangan bulat")
+
+
+def _outside(price: int, last: int, avg: int, ratio: float) -> bool:
+    # menyimpang = jauh dari harga terakhir DAN dari rata-rata; satu salah ketik
+    # yang terlanjur jadi "harga terakhir" tidak membuat transaksi normal ikut ditandai
+    if not price or not (last or avg):
+        return False
+    for ref in (last, avg):
+        if ref and ref <= price * ratio and price <= ref * ratio:
+            return False
+    return True
+
+
+def price_warnings(i: int, nama: str, beli: int, jual: int, ref, ratio: float) -> list:
+    """Peringatan harga untuk satu baris. `ref` = entri index barang (atau None)."""
+    out = []
+    if jual < beli:
+        out.append({"line": i, "nama": nama, "kind": "below_cost", "jual": jual, "beli": beli})
+    if ref is None or not ratio:
+        return out
+    last, avg = ref["last_sale_price"], ref["avg_sale_price"]
+    if _outside(jual, last, avg, ratio):
+        out.append({"line": i, "nama": nama, "kind": "sale_price", "price": jual, "last": last, "avg": avg})
+    last, avg = ref["last_cost_price"], ref["avg_cost_price"]
+    if _outside(beli, last, avg, ratio):
+        out.append({"line": i, "nama": nama, "kind": "cost_price", "price": beli, "last": last, "avg": avg})
+    return out
+
+
+def parse_cart(data: dict, lookup=None, outlier_ratio: float = 3.0, max_lines: int = None) -> Cart:
+    """
+    data   : body JSON {tgl, buyer_id, items: [{nama, beli, jual, qty}], paid_amount}
+    lookup : fungsi nama → entri index barang (last/avg harga) atau None
+    """
+    if not isinstance(data, dict):
+        raise CartError("Data tidak lengkap")
+    tgl = data.get("tgl")
+    buyer_id = data.get("buyer_id")
+    items = data.get("items")
+    if not tgl or not buyer_id or not items:
+        raise CartError("Data tidak lengkap")
+    if not isinstance(items, list):
+        raise CartError("items harus berupa daftar")
+    if max_lines and len(items) > max_lines:
+        raise CartError(f"Keranjang maksimal {max_lines} baris")
+    try:
+        tgl = date.fromisoformat(str(tgl)).isoformat()
+    except ValueError:
+        raise CartError("Tanggal tidak valid (YYYY-MM-DD)") from None
+    paid = _int(data.get("paid_amount") or 0, "paid_amount")
+    if paid < 0:
+        raise CartError("paid_amount tidak boleh negatif")
+    if not outlier_ratio:
+        lookup = None
+
+    names, costs, prices, qtys, totals, line_costs, profits = [], [], [], [], [], [], []
+    warnings = []
+    total = cost = 0
+    for i, it in enumerate(items):
+        if type(it) is not dict:
+            raise CartError(f"Baris {i + 1}: format tidak valid")
+        nama = it.get("nama")
+        nama = nama.strip() if type(nama) is str else ""
+        if not nama or len(nama) > MAX_NAME_LEN:
+            raise CartError(f"Baris {i + 1}: nama barang wajib diisi (maks {MAX_NAME_LEN} huruf)")
+        # jalur cepat: JSON dari halaman kasir selalu int
+        beli = it.get("beli")
+        if type(beli) is not int:
+            beli = _int(beli, "Harga beli", i)
+        jual = it.get("jual")
+        if type(jual) is not int:
+            jual = _int(jual, "Harga jual", i)
+        qty = it.get("qty")
+        if type(qty) is not int:
+            qty = _int(qty, "Qty", i)
+        if not 0 < qty <= MAX_QTY:
+            raise CartError(f"Baris {i + 1}: qty harus 1..{MAX_QTY}")
+        if not (0 <= beli <= MAX_PRICE and 0 <= jual <= MAX_PRICE):
+            raise CartError(f"Baris {i + 1}: harga harus 0..{MAX_PRICE}")
+
+        line_total = jual * qty
+        line_cost = beli * qty
+        names.append(nama)
+        costs.append(beli)
+        prices.append(jual)
+        qtys.append(qty)
+        totals.append(line_total)
+        line_costs.append(line_cost)
+        profits.append(line_total - line_cost)
+        total += line_total
+        cost += line_cost
+
+        # cek harga sekali per baris (price_warnings); tanpa referensi dan
+        # tidak di bawah modal → tidak ada yang perlu dicek
+        ref = lookup(nama) if lookup is not None else None
+        if ref is not None or jual < beli:
+            warnings += price_warnings(i, nama, beli, jual, ref, outlier_ratio)
+
+    return Cart(tgl, str(buyer_id), paid, (names, costs, prices, qtys, totals, line_costs, profits),
+                total, cost, total - cost, max(0, paid - total), warnings)
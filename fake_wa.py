@@ -0,0 +1,58 @@
+"""
+Gateway WA palsu untuk tes lokal (pengganti blast.sukipli.work).
+
+    python fake_wa.py            # listen di 127.0.0.1:5055
+    WA_API_URL=http://127.0.0.1:5055/send-message python wa_worker.py
+
+Env:
+  FAKE_WA_DELAY_MS  : jeda tiap kiriman (simulasi gateway lambat), default 0
+  FAKE_WA_FAIL_RATE : peluang balas gagal (0..1), default 0
+  FAKE_WA_FAIL_STATUS: status HTTP balasan gagal, default 500
+                      (503/429 untuk menguji retry wa_client)
+"""
+import os
+import random
+import threading
+import time
+
+from flask import Flask, request
+
+app = Flask(__name__)
+
+DELAY_MS  = int(os.getenv("FAKE_WA_DELAY_MS", "0"))
+FAIL_RATE = float(os.getenv("FAKE_WA_FAIL_RATE", "0"))
+FAIL_STATUS = int(os.getenv("FAKE_WA_FAIL_STATUS", "500"))
+
+_lock = threading.Lock()
+MESSAGES = []  # list dict: {number, message, ts}
+
+
+@app.post("/send-message")
+def send_message():
+    data = request.get_json(silent=True) or {}
+    if DELAY_MS:
+        time.sleep(DELAY_MS / 1000)
+    if not data.get("number") or not data.get("message"):
+        return {"status": False, "message": "number/message kosong"}, 400
+    if FAIL_RATE and random.random() < FAIL_RATE:
+        return {"status": False, "message": "simulated failure"}, FAIL_STATUS
+    with _lock:
+        MESSAGES.append({"number": data["number"], "message": data["message"], "ts": time.time()})
+    return {"status": True, "message": "sent"}
+
+
+@app.get("/messages")
+def messages():
+    with _lock:
+        return {"count": len(MESSAGES), "messages": MESSAGES[-100:]}
+
+
+@app.post("/reset")
+def reset():
+    with _lock:
+        MESSAGES.clear()
+    return {"ok": True}
+
+
+if __name__ == "__main__":
+    app.run(host="127.0.0.1", port=int(os.getenv("FAKE_WA_PORT", "5055")), threaded=True)
@@ -0,0 +1,69 @@
+"""
+Konfigurasi gunicorn (entry point produksi, pengganti app.run).
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Env:
+  WEB_CONCURRENCY   jumlah proses worker (default: jumlah core)
+  WEB_THREADS       thread per worker (default 4) → request paralel per worker
+  WEB_BIND          alamat listen (default 0.0.0.0:5000)
+  WEB_TIMEOUT       detik sebelum worker yang macet di-restart (default 60)
+  WEB_ACCESS_LOG    file access log, "-" = stdout (default), "" = nonaktif
+  WEB_PRELOAD       1 = import app sekali di master (start lebih cepat, hemat RAM),
+                    tapi HUP tidak memuat ulang kode. Default 0.
+  DB_POOL_MAX_SIZE  koneksi DB per worker (default: WEB_THREADS + 2)
+  DB_MAX_CONNECTIONS  batas koneksi untuk app ini di Postgres; hanya untuk
+                    peringatan kalau workers * pool melebihinya (default 90)
+
+Reload tanpa putus (kode baru / env baru): kill -HUP <pid master>.
+Worker lama menyelesaikan request yang sedang jalan (graceful_timeout),
+worker baru dibuat dengan pool sendiri.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+threads = int(os.getenv("WEB_THREADS", "4"))
+worker_class = "gthread"
+timeout = int(os.getenv("WEB_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+preload_app = os.getenv("WEB_PRELOAD", "0") == "1"
+accesslog = os.getenv("WEB_ACCESS_LOG", "-") or None  # "" = tanpa access log
+errorlog = "-"
+loglevel = os.getenv("WEB_LOG_LEVEL", "info")
+
+# Satu koneksi per thread + cadangan untuk refresh index di background dan
+# response streaming (/laporan, export) yang memegang koneksi lebih lama.
+# Harus diset sebelum app di-import karena Config membaca env saat import.
+os.environ.setdefault("DB_POOL_MAX_SIZE", str(threads + 2))
+pool_size = int(os.environ["DB_POOL_MAX_SIZE"])
+max_connections = int(os.getenv("DB_MAX_CONNECTIONS", "90"))
+
+
+def on_starting(server):
+    # +1 per worker: koneksi LISTEN invalidasi cache laporan (di luar pool)
+    total = workers * (pool_size + 1)
+    server.log.info("workers=%s threads=%s pool/worker=%s → max %s koneksi DB",
+                    workers, threads, pool_size, total)
+    if total > max_connections:
+        server.log.warning("workers * DB_POOL_MAX_SIZE (%s) > DB_MAX_CONNECTIONS (%s)",
+                           total, max_connections)
+
+
+def post_worker_init(worker):
+    # Dipanggil di proses worker setelah fork dan setelah app di-import:
+    # koneksi DB dibuat di sini supaya tidak ada socket yang dipakai bersama
+    # antar proses. Index saran barang & probe laporan juga diisi per worker.
+    import app as webapp
+    webapp.open_db_pool(wait=True)
+    webapp.warm_up()
+
+
+def worker_exit(server, worker):
+    import sys
+    webapp = sys.modules.get("app")
+    if webapp is not None:
+        webapp.close_db_pool()
+        webapp.wa_client.close()
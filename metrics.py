@@ -0,0 +1,192 @@
+"""
+Metrik per proses dalam format teks Prometheus (GET /metrics), tanpa
+dependensi tambahan.
+
+  Counter   : naik terus (jumlah request per endpoint/status)
+  Histogram : distribusi latency per label; bucket kumulatif + _sum + _count
+  collector : fungsi yang dipanggil saat scrape → gauge/counter dari state
+              yang sudah ada (pool DB, cache laporan, index, memo nota)
+
+Jalur panas (observe/inc) hanya bisect + satu lock kecil; formatting teks
+baru terjadi saat /metrics di-scrape.
+
+Seperti /health/db-pool, angka ini per proses: di gunicorn tiap worker
+punya metrik sendiri (scrape tiap worker, atau baca sebagai sampel).
+
+RequestTimings menampung waktu DB/render/WA untuk request yang sedang
+berjalan di thread ini (satu request per thread di gunicorn gthread).
+"""
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v) -> str:
+    if isinstance(v, float):
+        if v == float("inf"):
+            return "+Inf"
+        return repr(v)
+    return str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def render(self, out: list):
+        out.append(f"# HELP {self.name} {self.help}")
+        out.append(f"# TYPE {self.name} {self.kind}")
+        with self._lock:
+            items = [(k, list(v) if isinstance(v, list) else v) for k, v in self._values.items()]
+        for labels, value in sorted(items):
+            self._render_value(out, labels, value)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _render_value(self, out, labels, value):
+        out.append(f"{self.name}{_labels(self.labelnames, labels)} {_num(value)}")
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        # slot per bucket (non-kumulatif) + slot +Inf + sum; dijumlah saat render
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            h = self._values.get(labels)
+            if h is None:
+                h = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            h[i] += 1
+            h[-1] += value
+
+    def _render_value(self, out, labels, h):
+        acc = 0
+        for bound, n in zip(self.buckets + (float("inf"),), h):
+            acc += n
+            le = 'le="%s"' % _num(float(bound))
+            out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {acc}")
+        lbl = _labels(self.labelnames, labels)
+        out.append(f"{self.name}_sum{lbl} {_num(h[-1])}")
+        out.append(f"{self.name}_count{lbl} {acc}")
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        m = Counter(name, help, labelnames)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        m = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(m)
+        return m
+
+    def collector(self, fn):
+        """
+        fn() → iterable (name, kind, help, labels: dict, value); dipanggil saat
+        render. Dipakai sebagai decorator.
+        """
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        out = []
+        for m in self._metrics:
+            m.render(out)
+        seen = set()
+        for fn in self._collectors:
+            try:
+                samples = list(fn())
+            except Exception as e:   # satu sumber rusak tidak boleh menggagalkan scrape
+                out.append(f"# collector {getattr(fn, '__name__', fn)} failed: {_escape(e)}")
+                continue
+            for name, kind, help, labels, value in samples:
+                if value is None:
+                    continue
+                if name not in seen:
+                    seen.add(name)
+                    out.append(f"# HELP {name} {help}")
+                    out.append(f"# TYPE {name} {kind}")
+                out.append(f"{name}{_labels(labels.keys(), labels.values())} {_num(value)}")
+        out.append("")
+        return "\n".join(out)
+
+
+class RequestTimings(threading.local):
+    """Akumulator per thread untuk request yang sedang berjalan."""
+    active = False
+    start = 0.0
+    db = 0.0
+    queries = 0
+    render = 0.0
+    render_start = 0.0
+    wa = 0.0
+
+    def begin(self, now: float):
+        self.active = True
+        self.start = now
+        self.db = self.render = self.wa = 0.0
+        self.queries = 0
+
+
+def serve(registry: Registry, port: int, host: str = "0.0.0.0"):
+    """
+    Layani GET /metrics di thread daemon; untuk proses tanpa Flask
+    (wa_worker.py). Return server (shutdown() untuk berhenti).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
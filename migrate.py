@@ -0,0 +1,234 @@
+"""
+Migrasi skema: file SQL di folder migrations/ (urut nama file, versi = angka
+di depan nama, mis. 007_hot_query_indexes.sql → 007).
+
+    python migrate.py            # terapkan versi yang belum tercatat
+    python migrate.py up --to 007   # ... sampai versi tertentu saja
+    python migrate.py status     # daftar versi: applied / pending / berubah
+    python migrate.py check      # EXPLAIN query panas app.py; gagal (exit 1)
+                                 # kalau ada Seq Scan di tabel besar
+
+Versi yang sudah diterapkan dicatat di tabel schema_migrations (plus
+checksum isi file); satu file = satu transaksi, dan advisory lock mencegah
+dua deploy menjalankan migrasi bersamaan. File tetap harus idempotent
+(IF NOT EXISTS, CREATE OR REPLACE, ...): database lama dari sebelum ada
+schema_migrations akan menjalankan ulang semua file sekali lalu tercatat.
+Objek yang di produksi mungkin sudah ada dengan definisi lain (view &
+function dari sebelum repo ini) hanya dibuat kalau belum ada, jangan
+di-REPLACE (lihat 000_base.sql).
+"""
+import argparse
+import hashlib
+import os
+import sys
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+
+import psycopg
+from dotenv import load_dotenv
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+LOCK_ID = 0x7761_7365   # pg_advisory_lock: satu runner migrasi dalam satu waktu
+
+SQL_SCHEMA_MIGRATIONS = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+      version    text        PRIMARY KEY,
+      name       text        NOT NULL,
+      checksum   text        NOT NULL,
+      applied_at timestamptz NOT NULL DEFAULT now()
+    )
+"""
+
+
+def migration_files():
+    return sorted(MIGRATIONS_DIR.glob("*.sql"))
+
+
+def version_of(path: Path) -> str:
+    return path.name.split("_", 1)[0]
+
+
+def checksum(sql: str) -> str:
+    return hashlib.sha256(sql.encode()).hexdigest()[:16]
+
+
+def applied_versions(conn) -> dict:
+    """version -> checksum yang tercatat."""
+    conn.execute(SQL_SCHEMA_MIGRATIONS)
+    return dict(conn.execute("SELECT version, checksum FROM schema_migrations").fetchall())
+
+
+def apply_all(conninfo: str, target: str = None, skip=()) -> int:
+    """
+    Terapkan file yang versinya belum tercatat, sampai versi `target`
+    (termasuk) kalau diisi. Versi di `skip` dilewati tanpa dicatat (mis.
+    005 di Postgres tanpa contrib, untuk benchmark). Return jumlah file.
+    """
+    n = 0
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        conn.execute("SELECT pg_advisory_lock(%s)", (LOCK_ID,))
+        try:
+            done = applied_versions(conn)
+            for path in migration_files():
+                version, sql = version_of(path), path.read_text(encoding="utf-8")
+                if target and version > target:
+                    break
+                if version in skip:
+                    print(f"skip {path.name}")
+                    continue
+                if version in done:
+                    if done[version] != checksum(sql):
+                        print(f"PERINGATAN: {path.name} berubah setelah diterapkan (tidak dijalankan ulang); "
+                              f"buat file migrasi baru untuk perubahan skema")
+                    continue
+                print(f"apply {path.name}")
+                # satu file = satu transaksi, termasuk catatan versinya
+                with conn.transaction():
+                    conn.execute(sql)
+                    conn.execute("INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                                 (version, path.name, checksum(sql)))
+                n += 1
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (LOCK_ID,))
+    return n
+
+
+def status(conninfo: str) -> int:
+    """Cetak status tiap file. Return jumlah versi yang belum diterapkan."""
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        done = applied_versions(conn)
+        at = dict(conn.execute("SELECT version, applied_at FROM schema_migrations").fetchall())
+    pending = 0
+    for path in migration_files():
+        version = version_of(path)
+        if version not in done:
+            pending += 1
+            print(f"{path.name:<40} pending")
+        elif done[version] != checksum(path.read_text(encoding="utf-8")):
+            print(f"{path.name:<40} applied {at[version]:%Y-%m-%d %H:%M}  (file berubah!)")
+        else:
+            print(f"{path.name:<40} applied {at[version]:%Y-%m-%d %H:%M}")
+    return pending
+
+
+# =========================
+# Cek rencana query (EXPLAIN)
+# =========================
+def hot_queries(conn):
+    """
+    [(nama, sql, params)] query panas app.py dengan parameter contoh dari
+    isi DB (hari terakhir yang ada transaksi). SQL diambil dari app.py
+    (STATEMENTS & konstanta SQL_*) supaya cek ini ikut berubah bersama app.
+    """
+    import app as webapp
+
+    # sumber rekap & mode cari pembeli tergantung migrasi yang ada → tanya app
+    webapp.open_db_pool(wait=True)
+    try:
+        webapp.probe_report_sources(force=True)
+        webapp.probe_buyer_search(force=True)
+        name_q, name_params = webapp.buyer_search_query("sar", 50, 0)
+        short_q, short_params = webapp.buyer_search_query("sa", 50, 0)
+        phone_q, phone_params = webapp.buyer_search_query("0812", 50, 0)
+    finally:
+        webapp.close_db_pool()
+
+    last = conn.execute("SELECT max(sale_date) FROM sales").fetchone()[0]
+    if last is None:
+        sys.exit("sales kosong: isi data dulu (python -m bench.seed) supaya rencana query realistis")
+    sale = conn.execute("SELECT id, sale_date, created_at, buyer_id FROM sales "
+                        "WHERE sale_date = %s LIMIT 1", (last,)).fetchone()
+    month = (last - timedelta(days=30), last)
+    S = webapp.STATEMENTS
+    return [
+        ("sale_header_insert", S["sale_header_insert"], (last, sale[3], 1, 1, 0, 1, 0, sale[3])),
+        ("item_suggest_top", S["item_suggest_top"], (12,)),
+        ("item_suggest_prefix", S["item_suggest_prefix"], ("ind%", 12)),
+        ("buyers_list", S["buyers_list"], {"limit": 50, "offset": 0}),
+        (f"{name_q} (sar)", S[name_q], name_params),
+        (f"{short_q} (sa)", S[short_q], short_params),
+        (f"{phone_q} (0812)", S[phone_q], phone_params),
+        ("laporan_rekap", S["laporan_rekap"], month),
+        ("laporan_trx_first", S["laporan_trx_first"], (*month, 100)),
+        ("laporan_trx_after", S["laporan_trx_after"], (*month, sale[1], sale[2], sale[0], 100)),
+        ("sale_detail_header", S["sale_detail_header"], (sale[0], sale[1])),
+        ("sale_detail_items", S["sale_detail_items"], (sale[0], sale[1])),
+        ("export_sales", webapp.SQL_EXPORT_SALES, month),
+        ("export_sale_items", webapp.SQL_EXPORT_SALE_ITEMS, month),
+        ("wa_resend_check", webapp.SQL_WA_RESEND_CHECK, (sale[0], sale[1])),
+        ("wa_requeue_one", webapp.SQL_WA_REQUEUE_ONE, (sale[0], sale[1])),
+        ("wa_requeue_failed", webapp.SQL_WA_REQUEUE_FAILED, month),
+        # yang dijalankan FK saat DELETE buyers (ON DELETE SET NULL) & DELETE sales (CASCADE)
+        # (sales/sale_items berpartisi sejak 008 → FK memeriksa tiap partisi)
+        ("fk_sales_buyer", "SELECT 1 FROM sales WHERE buyer_id = %s FOR KEY SHARE", (sale[3],)),
+        ("fk_sale_items_sale", "SELECT 1 FROM sale_items WHERE sale_id = %s AND sale_date = %s FOR KEY SHARE",
+         (sale[0], sale[1])),
+    ]
+
+
+def seq_scans(plan: dict):
+    """Nama tabel yang di-Seq Scan di seluruh pohon rencana."""
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", ()):
+        yield from seq_scans(child)
+
+
+def check(conninfo: str, min_rows: int, verbose: bool = False) -> int:
+    """EXPLAIN tiap query panas. Return jumlah query yang Seq Scan tabel >= min_rows baris."""
+    failed = 0
+    with psycopg.connect(conninfo) as conn:
+        conn.execute("SELECT set_config('TimeZone', %s, false)", (os.getenv("TZ", "Asia/Jakarta"),))
+        queries = hot_queries(conn)
+        sizes = dict(conn.execute("SELECT relname, reltuples::bigint FROM pg_class "
+                                  "WHERE relkind IN ('r', 'p') AND relnamespace = 'public'::regnamespace"))
+        # partisi (008) dihitung sebagai tabel induknya: Seq Scan semua partisi
+        # sales = Seq Scan sales, satu partisi bulan hasil pruning = kecil
+        parents = dict(conn.execute("SELECT c.relname, p.relname FROM pg_inherits i "
+                                    "JOIN pg_class c ON c.oid = i.inhrelid "
+                                    "JOIN pg_class p ON p.oid = i.inhparent"))
+        for name, sql, params in queries:
+            # EXPLAIN tanpa ANALYZE: query tidak dijalankan (aman untuk UPDATE/INSERT)
+            plan = conn.execute("EXPLAIN (FORMAT JSON) " + sql, params).fetchone()[0][0]["Plan"]
+            scanned = Counter()
+            for t in set(seq_scans(plan)):
+                scanned[parents.get(t, t)] += max(sizes.get(t, 0), 0)
+            big = sorted(t for t, n in scanned.items() if n >= min_rows)
+            failed += bool(big)
+            verdict = "SEQ SCAN " + ", ".join(f"{t} (~{scanned[t]:,} baris)" for t in big) if big else "ok"
+            print(f"{name:<32} cost={plan['Total Cost']:>12.1f}  {verdict}")
+            if verbose or big:
+                for line in conn.execute("EXPLAIN " + sql, params).fetchall():
+                    print("    " + line[0])
+        conn.rollback()
+    return failed
+
+
+def main():
+    load_dotenv()
+    ap = argparse.ArgumentParser(description="Migrasi skema waserda")
+    ap.add_argument("command", nargs="?", choices=("up", "status", "check"), default="up")
+    ap.add_argument("--to", metavar="VERSION", help="up: berhenti setelah versi ini (mis. 007)")
+    ap.add_argument("--min-rows", type=int, default=10_000,
+                    help="check: tabel dengan estimasi baris >= ini dianggap besar")
+    ap.add_argument("-v", "--verbose", action="store_true", help="check: cetak rencana semua query")
+    args = ap.parse_args()
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        sys.exit("DATABASE_URL belum diset. Cek .env")
+
+    if args.command == "status":
+        status(url)
+    elif args.command == "check":
+        failed = check(url, args.min_rows, args.verbose)
+        if failed:
+            sys.exit(f"{failed} query memakai Seq Scan di tabel besar")
+        print("semua query panas memakai index")
+    else:
+        n = apply_all(url, args.to)
+        print(f"selesai: {n} file diterapkan")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+-- Skema dasar yang dipakai app.py: tabel, view dan fungsi bagi hasil.
+-- Database lama yang sudah punya objek ini tidak berubah (IF NOT EXISTS /
+-- dibuat hanya kalau belum ada). Kolom WA outbox, rollup dan
+-- index tambahan ada di migrasi 001 dst.
+-- gen_random_uuid() bawaan Postgres 13+.
+
+CREATE TABLE IF NOT EXISTS buyers (
+  id         uuid        PRIMARY KEY DEFAULT gen_random_uuid(),
+  name       text        NOT NULL,
+  phone_e164 text,
+  wa_opt_in  boolean     NOT NULL DEFAULT true,
+  note       text,
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS investors (
+  id         uuid        PRIMARY KEY DEFAULT gen_random_uuid(),
+  name       text        NOT NULL,
+  year       integer     NOT NULL,
+  amount_idr bigint      NOT NULL DEFAULT 0,
+  note       text,
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- header transaksi; total dihitung app saat checkout
+CREATE TABLE IF NOT EXISTS sales (
+  id            uuid        PRIMARY KEY DEFAULT gen_random_uuid(),
+  sale_date     date        NOT NULL DEFAULT CURRENT_DATE,
+  buyer_id      uuid        REFERENCES buyers(id) ON DELETE SET NULL,
+  total_amount  bigint      NOT NULL DEFAULT 0,
+  total_cost    bigint      NOT NULL DEFAULT 0,
+  total_profit  bigint      NOT NULL DEFAULT 0,
+  paid_amount   bigint      NOT NULL DEFAULT 0,
+  change_amount bigint      NOT NULL DEFAULT 0,
+  wa_status     text        NOT NULL DEFAULT 'none',   -- none | pending | sent | failed
+  wa_sent_at    timestamptz,
+  created_at    timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS sale_items (
+  id          uuid        PRIMARY KEY DEFAULT gen_random_uuid(),
+  sale_id     uuid        NOT NULL REFERENCES sales(id) ON DELETE CASCADE,
+  item_name   text        NOT NULL,
+  cost_price  bigint      NOT NULL,
+  sale_price  bigint      NOT NULL,
+  qty         integer     NOT NULL,
+  line_total  bigint      NOT NULL,
+  line_cost   bigint      NOT NULL,
+  line_profit bigint      NOT NULL,
+  created_at  timestamptz NOT NULL DEFAULT now()
+);
+
+-- View & function di bawah di database produksi sudah ada dengan definisi
+-- aslinya (tidak disimpan di repo); di sini hanya dibuat kalau BELUM ada,
+-- tidak pernah di-REPLACE, supaya migrasi pertama di database lama tidak
+-- menimpanya (atau gagal "cannot change data type of view column").
+DO $$
+BEGIN
+  -- sumber saran barang sebelum item_stats (002); tetap dipakai sebagai fallback
+  IF to_regclass('v_item_suggest') IS NULL THEN
+    CREATE VIEW v_item_suggest AS
+    SELECT lower(btrim(item_name)) AS item_key,
+           max(item_name)          AS last_name,
+           max(sale_price)         AS last_sale_price,
+           max(cost_price)         AS last_cost_price,
+           avg(sale_price)         AS avg_sale_price,
+           avg(cost_price)         AS avg_cost_price,
+           count(*)                AS times,
+           sum(qty)                AS total_qty,
+           max(created_at)         AS last_sold
+    FROM sale_items
+    GROUP BY lower(btrim(item_name));
+  END IF;
+
+  -- rekap harian sebelum sales_daily (003); fallback laporan
+  IF to_regclass('v_sales_by_day') IS NULL THEN
+    CREATE VIEW v_sales_by_day AS
+    SELECT sale_date         AS day,
+           count(*)          AS trx_count,
+           sum(total_amount) AS total_penjualan,
+           sum(total_cost)   AS total_modal,
+           sum(total_profit) AS total_laba
+    FROM sales
+    GROUP BY sale_date;
+  END IF;
+
+  -- bagi hasil laba: karyawan 30%, pemodal 35%, kas 35% (sama dengan split_profit di app.py)
+  IF NOT EXISTS (SELECT 1 FROM pg_proc
+                 WHERE proname = 'f_profit_sharing' AND pronamespace = 'public'::regnamespace) THEN
+    CREATE FUNCTION f_profit_sharing(p_from date, p_to date)
+    RETURNS TABLE(range_from date, range_to date, total_laba bigint,
+                  share_karyawan bigint, share_pemodal bigint, share_kas bigint)
+    LANGUAGE sql AS $f$
+      SELECT p_from, p_to, t, t*30/100, t*35/100, t*35/100
+      FROM (SELECT COALESCE(sum(total_profit), 0)::bigint t
+            FROM sales WHERE sale_date BETWEEN p_from AND p_to) x
+    $f$;
+  END IF;
+END $$;
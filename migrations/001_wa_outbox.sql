@@ -0,0 +1,11 @@
+-- Outbox nota WA: sales.wa_status='pending' = antrean kirim.
+-- wa_worker.py mengambil baris pending, kirim, lalu update status.
+ALTER TABLE sales
+  ADD COLUMN IF NOT EXISTS wa_attempts    integer     NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS wa_next_try_at timestamptz,
+  ADD COLUMN IF NOT EXISTS wa_last_error  text;
+
+-- hanya baris pending yang diindex → tetap kecil walau sales jutaan baris
+CREATE INDEX IF NOT EXISTS sales_wa_pending_idx
+  ON sales (wa_next_try_at NULLS FIRST, created_at)
+  WHERE wa_status = 'pending';
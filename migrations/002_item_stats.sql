@@ -0,0 +1,114 @@
+-- Statistik per barang untuk saran barang (/api/items/suggest).
+-- Pengganti v_item_suggest yang menghitung ulang dari seluruh sale_items
+-- setiap query. Dijaga oleh trigger di sale_items; rebuild penuh:
+--   flask --app app rebuild-item-stats   (atau SELECT item_stats_rebuild();)
+CREATE TABLE IF NOT EXISTS item_stats (
+  item_key        text    PRIMARY KEY,          -- lower(btrim(item_name))
+  last_name       text    NOT NULL,
+  last_sale_price bigint  NOT NULL DEFAULT 0,
+  last_cost_price bigint  NOT NULL DEFAULT 0,
+  sum_sale_price  numeric NOT NULL DEFAULT 0,   -- avg = sum / times
+  sum_cost_price  numeric NOT NULL DEFAULT 0,
+  times           bigint  NOT NULL DEFAULT 0,   -- jumlah baris terjual
+  total_qty       bigint  NOT NULL DEFAULT 0,
+  last_sold       date
+);
+
+-- LIKE 'prefix%' tanpa tergantung collation
+CREATE INDEX IF NOT EXISTS item_stats_key_pattern_idx
+  ON item_stats (item_key text_pattern_ops);
+-- top N tanpa q
+CREATE INDEX IF NOT EXISTS item_stats_rank_idx
+  ON item_stats (times DESC, last_sold DESC);
+
+-- Insert sale_items → tambah statistik (sekali per statement, bukan per baris)
+CREATE OR REPLACE FUNCTION item_stats_after_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO item_stats AS st
+    (item_key, last_name, last_sale_price, last_cost_price,
+     sum_sale_price, sum_cost_price, times, total_qty, last_sold)
+  SELECT lower(btrim(n.item_name)),
+         (array_agg(n.item_name  ORDER BY n.created_at DESC))[1],
+         (array_agg(n.sale_price ORDER BY n.created_at DESC))[1],
+         (array_agg(n.cost_price ORDER BY n.created_at DESC))[1],
+         sum(n.sale_price), sum(n.cost_price), count(*), sum(n.qty),
+         max(s.sale_date)
+  FROM new_items n
+  JOIN sales s ON s.id = n.sale_id
+  WHERE btrim(n.item_name) <> ''
+  GROUP BY 1
+  ON CONFLICT (item_key) DO UPDATE SET
+    last_name       = EXCLUDED.last_name,
+    last_sale_price = EXCLUDED.last_sale_price,
+    last_cost_price = EXCLUDED.last_cost_price,
+    sum_sale_price  = st.sum_sale_price + EXCLUDED.sum_sale_price,
+    sum_cost_price  = st.sum_cost_price + EXCLUDED.sum_cost_price,
+    times           = st.times + EXCLUDED.times,
+    total_qty       = st.total_qty + EXCLUDED.total_qty,
+    last_sold       = GREATEST(st.last_sold, EXCLUDED.last_sold);
+  RETURN NULL;
+END $$;
+
+-- Delete sale_items → kurangi hitungan (harga "last" tidak bisa dihitung
+-- mundur; pakai rebuild kalau perlu persis)
+CREATE OR REPLACE FUNCTION item_stats_after_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  UPDATE item_stats st
+  SET sum_sale_price = st.sum_sale_price - d.sum_sale,
+      sum_cost_price = st.sum_cost_price - d.sum_cost,
+      times          = st.times - d.cnt,
+      total_qty      = st.total_qty - d.qty
+  FROM (
+    SELECT lower(btrim(o.item_name)) AS item_key,
+           sum(o.sale_price) AS sum_sale, sum(o.cost_price) AS sum_cost,
+           count(*) AS cnt, sum(o.qty) AS qty
+    FROM old_items o
+    GROUP BY 1
+  ) d
+  WHERE st.item_key = d.item_key;
+  DELETE FROM item_stats WHERE times <= 0;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS sale_items_item_stats_ins ON sale_items;
+CREATE TRIGGER sale_items_item_stats_ins
+  AFTER INSERT ON sale_items
+  REFERENCING NEW TABLE AS new_items
+  FOR EACH STATEMENT EXECUTE FUNCTION item_stats_after_insert();
+
+DROP TRIGGER IF EXISTS sale_items_item_stats_del ON sale_items;
+CREATE TRIGGER sale_items_item_stats_del
+  AFTER DELETE ON sale_items
+  REFERENCING OLD TABLE AS old_items
+  FOR EACH STATEMENT EXECUTE FUNCTION item_stats_after_delete();
+
+-- Hitung ulang seluruh item_stats dari sale_items. Selama rebuild, insert
+-- sale_items baru menunggu (SHARE lock) supaya hasil konsisten.
+CREATE OR REPLACE FUNCTION item_stats_rebuild() RETURNS bigint
+LANGUAGE plpgsql AS $$
+DECLARE
+  n bigint;
+BEGIN
+  LOCK TABLE sale_items IN SHARE MODE;
+  DELETE FROM item_stats;
+  INSERT INTO item_stats
+    (item_key, last_name, last_sale_price, last_cost_price,
+     sum_sale_price, sum_cost_price, times, total_qty, last_sold)
+  SELECT lower(btrim(i.item_name)),
+         (array_agg(i.item_name  ORDER BY s.sale_date DESC, i.created_at DESC))[1],
+         (array_agg(i.sale_price ORDER BY s.sale_date DESC, i.created_at DESC))[1],
+         (array_agg(i.cost_price ORDER BY s.sale_date DESC, i.created_at DESC))[1],
+         sum(i.sale_price), sum(i.cost_price), count(*), sum(i.qty),
+         max(s.sale_date)
+  FROM sale_items i
+  JOIN sales s ON s.id = i.sale_id
+  WHERE btrim(i.item_name) <> ''
+  GROUP BY 1;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END $$;
+
+-- backfill pertama kali
+SELECT item_stats_rebuild() WHERE NOT EXISTS (SELECT 1 FROM item_stats);
@@ -0,0 +1,111 @@
+-- Rekap harian yang dijaga incremental oleh trigger di sales, supaya laporan
+-- rentang panjang cukup membaca satu baris per hari (O(hari), bukan O(transaksi)).
+--   flask --app app rebuild-sales-daily [--from YYYY-MM-DD --to YYYY-MM-DD]
+--   flask --app app check-sales-daily   [--from ... --to ...]
+CREATE TABLE IF NOT EXISTS sales_daily (
+  day             date   PRIMARY KEY,
+  trx_count       bigint NOT NULL DEFAULT 0,
+  total_penjualan bigint NOT NULL DEFAULT 0,
+  total_modal     bigint NOT NULL DEFAULT 0,
+  total_laba      bigint NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION sales_daily_add(
+  p_day date, p_cnt bigint, p_amount bigint, p_cost bigint, p_profit bigint
+) RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO sales_daily AS d (day, trx_count, total_penjualan, total_modal, total_laba)
+  VALUES (p_day, p_cnt, p_amount, p_cost, p_profit)
+  ON CONFLICT (day) DO UPDATE SET
+    trx_count       = d.trx_count       + EXCLUDED.trx_count,
+    total_penjualan = d.total_penjualan + EXCLUDED.total_penjualan,
+    total_modal     = d.total_modal     + EXCLUDED.total_modal,
+    total_laba      = d.total_laba      + EXCLUDED.total_laba;
+  IF p_cnt < 0 THEN
+    DELETE FROM sales_daily WHERE day = p_day AND trx_count <= 0;
+  END IF;
+END $$;
+
+-- INSERT: tambah; DELETE: kurangi; UPDATE (koreksi total / pindah tanggal,
+-- termasuk trigger hitung total dari sale_items): kurangi lama, tambah baru.
+CREATE OR REPLACE FUNCTION sales_daily_on_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM sales_daily_add(OLD.sale_date, -1,
+      -COALESCE(OLD.total_amount, 0)::bigint,
+      -COALESCE(OLD.total_cost, 0)::bigint,
+      -COALESCE(OLD.total_profit, 0)::bigint);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM sales_daily_add(NEW.sale_date, 1,
+      COALESCE(NEW.total_amount, 0)::bigint,
+      COALESCE(NEW.total_cost, 0)::bigint,
+      COALESCE(NEW.total_profit, 0)::bigint);
+  END IF;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS sales_sales_daily ON sales;
+CREATE TRIGGER sales_sales_daily
+  AFTER INSERT OR DELETE OR UPDATE OF sale_date, total_amount, total_cost, total_profit
+  ON sales
+  FOR EACH ROW EXECUTE FUNCTION sales_daily_on_change();
+
+-- Hitung ulang rollup dari sales (semua hari, atau rentang tertentu).
+-- Selama rebuild, tulis ke sales menunggu (SHARE lock) supaya konsisten.
+CREATE OR REPLACE FUNCTION sales_daily_rebuild(p_from date DEFAULT NULL, p_to date DEFAULT NULL)
+RETURNS bigint
+LANGUAGE plpgsql AS $$
+DECLARE
+  n bigint;
+BEGIN
+  LOCK TABLE sales IN SHARE MODE;
+  DELETE FROM sales_daily
+  WHERE (p_from IS NULL OR day >= p_from) AND (p_to IS NULL OR day <= p_to);
+  INSERT INTO sales_daily (day, trx_count, total_penjualan, total_modal, total_laba)
+  SELECT sale_date, count(*),
+         COALESCE(sum(total_amount), 0), COALESCE(sum(total_cost), 0), COALESCE(sum(total_profit), 0)
+  FROM sales
+  WHERE (p_from IS NULL OR sale_date >= p_from) AND (p_to IS NULL OR sale_date <= p_to)
+  GROUP BY sale_date;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END $$;
+
+-- Bandingkan rollup dengan agregat mentah sales. Baris yang keluar = selisih.
+CREATE OR REPLACE FUNCTION sales_daily_check(p_from date DEFAULT NULL, p_to date DEFAULT NULL)
+RETURNS TABLE (
+  day date,
+  rollup_trx bigint, raw_trx bigint,
+  rollup_penjualan bigint, raw_penjualan bigint,
+  rollup_laba bigint, raw_laba bigint
+)
+LANGUAGE sql STABLE AS $$
+  WITH raw AS (
+    SELECT sale_date AS day, count(*)::bigint AS trx_count,
+           COALESCE(sum(total_amount), 0)::bigint AS total_penjualan,
+           COALESCE(sum(total_cost), 0)::bigint   AS total_modal,
+           COALESCE(sum(total_profit), 0)::bigint AS total_laba
+    FROM sales
+    WHERE (p_from IS NULL OR sale_date >= p_from) AND (p_to IS NULL OR sale_date <= p_to)
+    GROUP BY sale_date
+  ), r AS (
+    SELECT * FROM sales_daily
+    WHERE (p_from IS NULL OR sales_daily.day >= p_from) AND (p_to IS NULL OR sales_daily.day <= p_to)
+  )
+  SELECT COALESCE(r.day, raw.day),
+         r.trx_count, raw.trx_count,
+         r.total_penjualan, raw.total_penjualan,
+         r.total_laba, raw.total_laba
+  FROM r
+  FULL JOIN raw ON raw.day = r.day
+  WHERE (r.trx_count, r.total_penjualan, r.total_modal, r.total_laba)
+        IS DISTINCT FROM
+        (raw.trx_count, raw.total_penjualan, raw.total_modal, raw.total_laba)
+  ORDER BY 1
+$$;
+
+-- backfill pertama kali
+SELECT sales_daily_rebuild() WHERE NOT EXISTS (SELECT 1 FROM sales_daily);
@@ -0,0 +1,4 @@
+-- Daftar transaksi laporan: filter rentang sale_date lalu urut
+-- (sale_date, created_at, id) DESC + keyset pagination → satu index scan mundur.
+CREATE INDEX IF NOT EXISTS sales_keyset_idx
+  ON sales (sale_date, created_at, id);
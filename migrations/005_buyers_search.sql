@@ -0,0 +1,17 @@
+-- Pencarian pembeli (/pembeli?q=) tanpa scan seluruh tabel.
+--   nama    : trigram GIN → LIKE '%q%' dan word_similarity (<%) pakai index
+--   telepon : kolom digit saja (tanpa +, spasi, -) + trigram GIN
+-- pg_trgm ada di paket contrib Postgres standar (image resmi sudah ada).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE buyers
+  ADD COLUMN IF NOT EXISTS phone_digits text
+  GENERATED ALWAYS AS (regexp_replace(COALESCE(phone_e164, ''), '\D', '', 'g')) STORED;
+
+CREATE INDEX IF NOT EXISTS buyers_name_trgm_idx
+  ON buyers USING gin (lower(name) gin_trgm_ops);
+-- q 1-2 huruf: trigram tidak efektif → prefix lewat btree
+CREATE INDEX IF NOT EXISTS buyers_name_prefix_idx
+  ON buyers (lower(name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS buyers_phone_digits_trgm_idx
+  ON buyers USING gin (phone_digits gin_trgm_ops);
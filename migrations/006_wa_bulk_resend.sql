@@ -0,0 +1,14 @@
+-- Kirim ulang massal nota WA yang gagal (POST /laporan/resend-wa).
+-- Baris 'failed' di rentang tanggal dikembalikan ke outbox dalam satu UPDATE
+-- dan diberi cap wa_requeued_at yang sama → dipakai sebagai id batch untuk
+-- memantau progres.
+ALTER TABLE sales
+  ADD COLUMN IF NOT EXISTS wa_requeued_at timestamptz;
+
+CREATE INDEX IF NOT EXISTS sales_wa_failed_idx
+  ON sales (sale_date)
+  WHERE wa_status = 'failed';
+
+CREATE INDEX IF NOT EXISTS sales_wa_requeued_idx
+  ON sales (wa_requeued_at)
+  WHERE wa_requeued_at IS NOT NULL;
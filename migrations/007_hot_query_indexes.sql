@@ -0,0 +1,21 @@
+-- Index untuk query panas app.py yang belum tercakup migrasi sebelumnya.
+-- Dicek dengan: python migrate.py check  (EXPLAIN tiap query, gagal kalau
+-- ada Seq Scan di tabel besar).
+--
+-- sales(sale_date, created_at) sudah dicakup sales_keyset_idx (004) sebagai
+-- prefix: laporan, export, rekap fallback dan bagi hasil memakai index itu.
+
+-- detail nota (WHERE sale_id ORDER BY created_at), export per barang,
+-- nota WA di wa_worker, dan ON DELETE CASCADE dari sales
+CREATE INDEX IF NOT EXISTS sale_items_sale_idx
+  ON sale_items (sale_id, created_at);
+
+-- /pembeli tanpa q: ORDER BY created_at DESC, id LIMIT/OFFSET
+CREATE INDEX IF NOT EXISTS buyers_created_idx
+  ON buyers (created_at DESC, id);
+
+-- hapus pembeli: ON DELETE SET NULL mencari sales milik pembeli itu;
+-- tanpa index = scan seluruh sales per hapus. Transaksi tanpa pembeli tidak diindex.
+CREATE INDEX IF NOT EXISTS sales_buyer_idx
+  ON sales (buyer_id)
+  WHERE buyer_id IS NOT NULL;
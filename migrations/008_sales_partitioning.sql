@@ -0,0 +1,318 @@
+-- Partisi bulanan sales & sale_items berdasarkan sale_date.
+-- Laporan/export/rekap (filter sale_date BETWEEN) hanya membaca partisi bulan
+-- yang diminta, detail nota dicari per (id, sale_date), dan bulan lama bisa
+-- diarsip dengan DETACH tanpa DELETE besar.
+--
+--   sales_pYYYY_MM, sale_items_pYYYY_MM   satu pasang tabel per bulan
+--   ensure_sales_partitions(from, to)      buat partisi yang belum ada (app
+--                                          memanggilnya saat start & checkout,
+--                                          cron: flask --app app ensure-partitions)
+--   detach_sales_month(bulan)              lepas satu bulan jadi tabel arsip
+--
+-- sale_items mendapat kolom sale_date (sama dengan header) supaya ikut
+-- dipartisi; PK menjadi (id, sale_date) dan FK detail → header menjadi
+-- (sale_id, sale_date). Database lama dikonversi sekali di blok DO di bawah:
+-- data disalin ke tabel baru dalam transaksi migrasi ini (tulis ke sales
+-- terkunci selama salin, lamanya sebanding jumlah baris → jalankan saat toko
+-- tutup). Kalau sales sudah dipartisi, blok itu dilewati. Trigger dan index
+-- biasa tambahan di tabel lama ikut dibuat ulang dari definisinya; constraint
+-- atau index unik yang tidak dikenal membuat migrasi batal.
+
+CREATE OR REPLACE FUNCTION ensure_sales_partitions(p_from date, p_to date)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+  m date := date_trunc('month', p_from)::date;
+  part text;
+  n integer := 0;
+BEGIN
+  WHILE m <= p_to LOOP
+    part := to_char(m, '"p"YYYY_MM');
+    IF to_regclass('sales_' || part) IS NULL OR to_regclass('sale_items_' || part) IS NULL THEN
+      -- dua proses membuat bulan yang sama: yang kedua menunggu lalu melihat sudah ada
+      PERFORM pg_advisory_xact_lock(hashtext('ensure_sales_partitions'));
+      IF to_regclass('sales_' || part) IS NULL THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF sales FOR VALUES FROM (%L) TO (%L)',
+                       'sales_' || part, m, (m + interval '1 month')::date);
+        n := n + 1;
+      END IF;
+      IF to_regclass('sale_items_' || part) IS NULL THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF sale_items FOR VALUES FROM (%L) TO (%L)',
+                       'sale_items_' || part, m, (m + interval '1 month')::date);
+      END IF;
+    END IF;
+    m := (m + interval '1 month')::date;
+  END LOOP;
+  RETURN n;
+END $$;
+
+DO $$
+DECLARE
+  lo date;
+  hi date;
+  unknown text;
+  obj record;
+  g record;
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = 'sales'::regclass) = 'p' THEN
+    RETURN;
+  END IF;
+
+  -- Tabel lama di-DROP setelah disalin. Kolom, default, CHECK dan komentar
+  -- ikut lewat LIKE ... INCLUDING ALL; index, PK/FK dan trigger yang dikenal
+  -- dibuat ulang di bawah. Trigger dan index biasa lain (mis. dipasang
+  -- langsung di server) dibuat ulang dari pg_get_triggerdef/pg_get_indexdef.
+  -- Constraint dan index unik lain tidak bisa dipindah apa adanya (di tabel
+  -- berpartisi harus memuat sale_date) → batal di sini, jangan hilang
+  -- diam-diam. Sesuaikan/drop dulu lalu jalankan lagi.
+  SELECT string_agg(what, ', ') INTO unknown FROM (
+    SELECT format('constraint %s on %s', conname, conrelid::regclass) AS what
+    FROM pg_constraint
+    WHERE conrelid IN ('sales'::regclass, 'sale_items'::regclass)
+      AND contype <> 'c'
+      AND conname NOT IN ('sales_pkey', 'sales_buyer_id_fkey', 'sale_items_pkey', 'sale_items_sale_id_fkey')
+    UNION ALL
+    SELECT format('unique index %s on %s', indexrelid::regclass, indrelid::regclass)
+    FROM pg_index
+    WHERE indrelid IN ('sales'::regclass, 'sale_items'::regclass)
+      AND indisunique
+      AND indexrelid::regclass::text NOT IN ('sales_pkey', 'sale_items_pkey')
+  ) x;
+  IF unknown IS NOT NULL THEN
+    RAISE EXCEPTION '008: objek tidak dikenal di sales/sale_items, konversi dibatalkan: %', unknown
+      USING HINT = 'Tambahkan ke migrasi 008 atau pindahkan/drop dulu, lalu jalankan migrasi lagi.';
+  END IF;
+
+  -- pemilik, GRANT dan komentar tabel serta view yang bergantung padanya
+  -- (definisi view diambil sebelum rename, masih menyebut sales/sale_items)
+  -- trigger & index tambahan; definisinya menyebut sales/sale_items (nama
+  -- tabel baru nanti), enabled = 'D' → dibuat lalu di-DISABLE lagi
+  CREATE TEMP TABLE sales_conv_extra ON COMMIT DROP AS
+  SELECT tgrelid::regclass::text AS rel, tgname::text AS name,
+         pg_get_triggerdef(oid) AS def, tgenabled AS enabled
+  FROM pg_trigger
+  WHERE tgrelid IN ('sales'::regclass, 'sale_items'::regclass)
+    AND NOT tgisinternal
+    AND tgname NOT IN ('sales_sales_daily', 'sale_items_item_stats_ins', 'sale_items_item_stats_del')
+  UNION ALL
+  SELECT indrelid::regclass::text, NULL, pg_get_indexdef(indexrelid), NULL
+  FROM pg_index
+  WHERE indrelid IN ('sales'::regclass, 'sale_items'::regclass)
+    AND NOT indisunique
+    AND indexrelid::regclass::text NOT IN
+        ('sales_wa_pending_idx', 'sales_keyset_idx', 'sales_wa_failed_idx',
+         'sales_wa_requeued_idx', 'sales_buyer_idx', 'sale_items_sale_idx');
+
+  CREATE TEMP TABLE sales_conv_objs ON COMMIT DROP AS
+  SELECT c.relname::text AS name, NULL::text AS def,
+         c.relowner, c.relacl, obj_description(c.oid, 'pg_class') AS descr
+  FROM pg_class c
+  WHERE c.oid IN ('sales'::regclass, 'sale_items'::regclass)
+  UNION ALL
+  SELECT v.oid::regclass::text, pg_get_viewdef(v.oid),
+         v.relowner, v.relacl, obj_description(v.oid, 'pg_class')
+  FROM pg_class v
+  WHERE v.relkind = 'v'
+    AND v.oid IN (SELECT r.ev_class
+                  FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid
+                  WHERE d.classid = 'pg_rewrite'::regclass
+                    AND d.refobjid IN ('sales'::regclass, 'sale_items'::regclass));
+
+  ALTER TABLE sale_items RENAME TO sale_items_unpartitioned;
+  ALTER TABLE sales RENAME TO sales_unpartitioned;
+
+  CREATE TABLE sales (LIKE sales_unpartitioned INCLUDING ALL EXCLUDING INDEXES)
+    PARTITION BY RANGE (sale_date);
+  CREATE TABLE sale_items (LIKE sale_items_unpartitioned INCLUDING ALL EXCLUDING INDEXES,
+                           sale_date date NOT NULL)
+    PARTITION BY RANGE (sale_date);
+
+  -- semua bulan yang ada datanya + 3 bulan ke depan
+  SELECT min(sale_date), max(sale_date) INTO lo, hi FROM sales_unpartitioned;
+  PERFORM ensure_sales_partitions(COALESCE(lo, current_date),
+                                  (GREATEST(hi, current_date) + interval '3 months')::date);
+
+  -- salin dulu, index & constraint dibuat setelahnya (lebih cepat dari index per baris)
+  INSERT INTO sales SELECT * FROM sales_unpartitioned;
+  INSERT INTO sale_items
+  SELECT i.*, s.sale_date
+  FROM sale_items_unpartitioned i
+  JOIN sales_unpartitioned s ON s.id = i.sale_id;
+
+  -- tanpa CASCADE: objek lain yang masih bergantung (materialized view,
+  -- view di atas view) membuat migrasi gagal
+  FOR obj IN SELECT name FROM sales_conv_objs WHERE def IS NOT NULL LOOP
+    EXECUTE format('DROP VIEW %s', obj.name);
+  END LOOP;
+  DROP TABLE sale_items_unpartitioned;
+  DROP TABLE sales_unpartitioned;
+
+  -- kunci unik di tabel berpartisi wajib memuat kolom partisi
+  ALTER TABLE sales ADD CONSTRAINT sales_pkey PRIMARY KEY (id, sale_date);
+  ALTER TABLE sales ADD CONSTRAINT sales_buyer_id_fkey
+    FOREIGN KEY (buyer_id) REFERENCES buyers(id) ON DELETE SET NULL;
+  ALTER TABLE sale_items ADD CONSTRAINT sale_items_pkey PRIMARY KEY (id, sale_date);
+  ALTER TABLE sale_items ADD CONSTRAINT sale_items_sale_fkey
+    FOREIGN KEY (sale_id, sale_date) REFERENCES sales(id, sale_date) ON DELETE CASCADE ON UPDATE CASCADE;
+
+  -- index dari 001, 004, 006, 007 (dibuat ulang per partisi)
+  CREATE INDEX sales_wa_pending_idx ON sales (wa_next_try_at NULLS FIRST, created_at)
+    WHERE wa_status = 'pending';
+  CREATE INDEX sales_keyset_idx ON sales (sale_date, created_at, id);
+  CREATE INDEX sales_wa_failed_idx ON sales (sale_date) WHERE wa_status = 'failed';
+  CREATE INDEX sales_wa_requeued_idx ON sales (wa_requeued_at) WHERE wa_requeued_at IS NOT NULL;
+  CREATE INDEX sales_buyer_idx ON sales (buyer_id) WHERE buyer_id IS NOT NULL;
+  CREATE INDEX sale_items_sale_idx ON sale_items (sale_id, created_at);
+
+  -- trigger rollup dari 002 & 003
+  CREATE TRIGGER sales_sales_daily
+    AFTER INSERT OR DELETE OR UPDATE OF sale_date, total_amount, total_cost, total_profit
+    ON sales
+    FOR EACH ROW EXECUTE FUNCTION sales_daily_on_change();
+  CREATE TRIGGER sale_items_item_stats_ins
+    AFTER INSERT ON sale_items
+    REFERENCING NEW TABLE AS new_items
+    FOR EACH STATEMENT EXECUTE FUNCTION item_stats_after_insert();
+  CREATE TRIGGER sale_items_item_stats_del
+    AFTER DELETE ON sale_items
+    REFERENCING OLD TABLE AS old_items
+    FOR EACH STATEMENT EXECUTE FUNCTION item_stats_after_delete();
+
+  -- trigger & index tambahan (setelah salin: trigger tidak ikut jalan untuk
+  -- baris lama yang dipindah)
+  FOR obj IN SELECT * FROM sales_conv_extra LOOP
+    EXECUTE obj.def;
+    IF obj.enabled = 'D' THEN
+      EXECUTE format('ALTER TABLE %s DISABLE TRIGGER %I', obj.rel, obj.name);
+    END IF;
+  END LOOP;
+
+  -- view dibuat lagi dengan definisi yang ada di database (bukan versi 000)
+  FOR obj IN SELECT * FROM sales_conv_objs ORDER BY def IS NOT NULL LOOP
+    IF obj.def IS NOT NULL THEN
+      EXECUTE format('CREATE VIEW %s AS %s', obj.name, rtrim(obj.def, ';'));
+    END IF;
+    EXECUTE format('ALTER TABLE %s OWNER TO %I', obj.name, pg_get_userbyid(obj.relowner));
+    FOR g IN SELECT a.privilege_type, a.is_grantable,
+                    CASE a.grantee WHEN 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(a.grantee)) END AS who
+             FROM aclexplode(obj.relacl) a LOOP
+      EXECUTE format('GRANT %s ON %s TO %s%s', g.privilege_type, obj.name, g.who,
+                     CASE WHEN g.is_grantable THEN ' WITH GRANT OPTION' ELSE '' END);
+    END LOOP;
+    IF obj.descr IS NOT NULL THEN
+      EXECUTE format('COMMENT ON %s %s IS %L', CASE WHEN obj.def IS NULL THEN 'TABLE' ELSE 'VIEW' END,
+                     obj.name, obj.descr);
+    END IF;
+  END LOOP;
+
+  ANALYZE sales;
+  ANALYZE sale_items;
+END $$;
+
+-- database yang tidak punya view 000 (mis. dihapus manual) → buat versi 000
+DO $$
+BEGIN
+  IF to_regclass('v_item_suggest') IS NULL THEN
+    CREATE VIEW v_item_suggest AS
+    SELECT lower(btrim(item_name)) AS item_key,
+           max(item_name)          AS last_name,
+           max(sale_price)         AS last_sale_price,
+           max(cost_price)         AS last_cost_price,
+           avg(sale_price)         AS avg_sale_price,
+           avg(cost_price)         AS avg_cost_price,
+           count(*)                AS times,
+           sum(qty)                AS total_qty,
+           max(created_at)         AS last_sold
+    FROM sale_items
+    GROUP BY lower(btrim(item_name));
+  END IF;
+
+  IF to_regclass('v_sales_by_day') IS NULL THEN
+    CREATE VIEW v_sales_by_day AS
+    SELECT sale_date         AS day,
+           count(*)          AS trx_count,
+           sum(total_amount) AS total_penjualan,
+           sum(total_cost)   AS total_modal,
+           sum(total_profit) AS total_laba
+    FROM sales
+    GROUP BY sale_date;
+  END IF;
+END $$;
+
+-- item_stats (002): tanggal diambil dari sale_items.sale_date, tanpa join ke
+-- sales per id (yang harus memeriksa semua partisi)
+CREATE OR REPLACE FUNCTION item_stats_after_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO item_stats AS st
+    (item_key, last_name, last_sale_price, last_cost_price,
+     sum_sale_price, sum_cost_price, times, total_qty, last_sold)
+  SELECT lower(btrim(n.item_name)),
+         (array_agg(n.item_name  ORDER BY n.created_at DESC))[1],
+         (array_agg(n.sale_price ORDER BY n.created_at DESC))[1],
+         (array_agg(n.cost_price ORDER BY n.created_at DESC))[1],
+         sum(n.sale_price), sum(n.cost_price), count(*), sum(n.qty),
+         max(n.sale_date)
+  FROM new_items n
+  WHERE btrim(n.item_name) <> ''
+  GROUP BY 1
+  ON CONFLICT (item_key) DO UPDATE SET
+    last_name       = EXCLUDED.last_name,
+    last_sale_price = EXCLUDED.last_sale_price,
+    last_cost_price = EXCLUDED.last_cost_price,
+    sum_sale_price  = st.sum_sale_price + EXCLUDED.sum_sale_price,
+    sum_cost_price  = st.sum_cost_price + EXCLUDED.sum_cost_price,
+    times           = st.times + EXCLUDED.times,
+    total_qty       = st.total_qty + EXCLUDED.total_qty,
+    last_sold       = GREATEST(st.last_sold, EXCLUDED.last_sold);
+  RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION item_stats_rebuild() RETURNS bigint
+LANGUAGE plpgsql AS $$
+DECLARE
+  n bigint;
+BEGIN
+  LOCK TABLE sale_items IN SHARE MODE;
+  DELETE FROM item_stats;
+  INSERT INTO item_stats
+    (item_key, last_name, last_sale_price, last_cost_price,
+     sum_sale_price, sum_cost_price, times, total_qty, last_sold)
+  SELECT lower(btrim(i.item_name)),
+         (array_agg(i.item_name  ORDER BY i.sale_date DESC, i.created_at DESC))[1],
+         (array_agg(i.sale_price ORDER BY i.sale_date DESC, i.created_at DESC))[1],
+         (array_agg(i.cost_price ORDER BY i.sale_date DESC, i.created_at DESC))[1],
+         sum(i.sale_price), sum(i.cost_price), count(*), sum(i.qty),
+         max(i.sale_date)
+  FROM sale_items i
+  WHERE btrim(i.item_name) <> ''
+  GROUP BY 1;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END $$;
+
+-- Arsip: lepas partisi satu bulan (detail dulu, lalu header) dan ganti nama
+-- menjadi archived_*. Data tetap ada sebagai tabel biasa (pg_dump lalu DROP
+-- kalau sudah disimpan di tempat lain); sales_daily & item_stats tidak berubah,
+-- jadi rekap bulan itu tetap muncul di laporan.
+CREATE OR REPLACE FUNCTION detach_sales_month(p_month date)
+RETURNS text
+LANGUAGE plpgsql AS $$
+DECLARE
+  part text := to_char(p_month, '"p"YYYY_MM');
+  fk text;
+BEGIN
+  IF to_regclass('sales_' || part) IS NULL THEN
+    RAISE EXCEPTION 'partisi sales_% tidak ada', part;
+  END IF;
+  EXECUTE format('ALTER TABLE sale_items DETACH PARTITION %I', 'sale_items_' || part);
+  -- FK ke sales terbawa sebagai constraint biasa; lepas supaya header bisa di-detach
+  FOR fk IN SELECT conname FROM pg_constraint
+            WHERE conrelid = ('sale_items_' || part)::regclass AND contype = 'f' LOOP
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', 'sale_items_' || part, fk);
+  END LOOP;
+  EXECUTE format('ALTER TABLE sales DETACH PARTITION %I', 'sales_' || part);
+  EXECUTE format('ALTER TABLE %I RENAME TO %I', 'sale_items_' || part, 'archived_sale_items_' || part);
+  EXECUTE format('ALTER TABLE %I RENAME TO %I', 'sales_' || part, 'archived_sales_' || part);
+  RETURN 'archived_sales_' || part || ', archived_sale_items_' || part;
+END $$;
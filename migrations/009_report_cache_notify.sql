@@ -0,0 +1,42 @@
+-- Invalidasi cache laporan antar proses (report_cache.py). Cache ada di
+-- memori tiap worker gunicorn; penulisan dari proses lain (worker lain,
+-- app_async.py, wa_worker.py, psql) dikabarkan lewat NOTIFY saat commit:
+--   payload 'YYYY-MM-DD' → buang entri yang range-nya mencakup tanggal itu
+--   payload '*'          → buang semua (nama pembeli bisa muncul di tanggal mana pun)
+-- Nama channel sama dengan REPORT_CACHE_CHANNEL di app.py. NOTIFY dengan
+-- payload sama dalam satu transaksi digabung Postgres, jadi UPDATE massal
+-- per tanggal tetap satu notifikasi per tanggal.
+
+CREATE OR REPLACE FUNCTION report_cache_notify_sales() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM pg_notify('report_cache', OLD.sale_date::text);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM pg_notify('report_cache', NEW.sale_date::text);
+  END IF;
+  RETURN NULL;
+END $$;
+
+-- hanya kolom yang tampil di laporan; claim/lease wa_worker (wa_attempts,
+-- wa_next_try_at) tidak membuang cache
+DROP TRIGGER IF EXISTS sales_report_cache_notify ON sales;
+CREATE TRIGGER sales_report_cache_notify
+  AFTER INSERT OR DELETE OR UPDATE OF sale_date, buyer_id, total_amount, total_cost, total_profit,
+                                      paid_amount, change_amount, wa_status
+  ON sales
+  FOR EACH ROW EXECUTE FUNCTION report_cache_notify_sales();
+
+CREATE OR REPLACE FUNCTION report_cache_notify_all() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM pg_notify('report_cache', '*');
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS buyers_report_cache_notify ON buyers;
+CREATE TRIGGER buyers_report_cache_notify
+  AFTER DELETE OR UPDATE OF name
+  ON buyers
+  FOR EACH STATEMENT EXECUTE FUNCTION report_cache_notify_all();
@@ -0,0 +1,127 @@
+-- Rekap harian tanpa baris panas. Trigger 003 meng-upsert baris sales_daily
+-- hari itu di setiap checkout, jadi semua checkout yang jalan bersamaan
+-- antre di satu baris sampai commit. Sekarang trigger hanya menambah baris
+-- delta (INSERT biasa, tidak saling tunggu); sales_daily_flush() melipat
+-- delta ke sales_daily di belakang (app: tiap SALES_DAILY_FLUSH_SEC, atau
+-- flask --app app flush-sales-daily). Laporan membaca sales_daily_current
+-- = sales_daily + delta yang belum dilipat, jadi angkanya tetap persis.
+CREATE TABLE IF NOT EXISTS sales_daily_delta (
+  day             date   NOT NULL,
+  trx_count       bigint NOT NULL,
+  total_penjualan bigint NOT NULL,
+  total_modal     bigint NOT NULL,
+  total_laba      bigint NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sales_daily_delta_day_idx ON sales_daily_delta (day);
+
+CREATE OR REPLACE VIEW sales_daily_current AS
+SELECT day,
+       sum(trx_count)::bigint       AS trx_count,
+       sum(total_penjualan)::bigint AS total_penjualan,
+       sum(total_modal)::bigint     AS total_modal,
+       sum(total_laba)::bigint      AS total_laba
+FROM (
+  SELECT day, trx_count, total_penjualan, total_modal, total_laba FROM sales_daily
+  UNION ALL
+  SELECT day, trx_count, total_penjualan, total_modal, total_laba FROM sales_daily_delta
+) x
+GROUP BY day
+HAVING sum(trx_count) > 0;
+
+-- INSERT: +1; DELETE: -1; UPDATE: -lama +baru (sama dengan 003, ke tabel delta)
+CREATE OR REPLACE FUNCTION sales_daily_on_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    INSERT INTO sales_daily_delta VALUES (OLD.sale_date, -1,
+      -COALESCE(OLD.total_amount, 0), -COALESCE(OLD.total_cost, 0), -COALESCE(OLD.total_profit, 0));
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO sales_daily_delta VALUES (NEW.sale_date, 1,
+      COALESCE(NEW.total_amount, 0), COALESCE(NEW.total_cost, 0), COALESCE(NEW.total_profit, 0));
+  END IF;
+  RETURN NULL;
+END $$;
+
+-- Lipat semua delta yang sudah commit ke sales_daily. Satu pelipat dalam
+-- satu waktu (worker lain yang kebetulan bersamaan langsung mundur).
+-- Return jumlah hari yang berubah.
+CREATE OR REPLACE FUNCTION sales_daily_flush() RETURNS bigint
+LANGUAGE plpgsql AS $$
+DECLARE
+  n bigint;
+BEGIN
+  IF NOT pg_try_advisory_xact_lock(hashtext('sales_daily_flush')) THEN
+    RETURN 0;
+  END IF;
+  WITH d AS (
+    DELETE FROM sales_daily_delta RETURNING *
+  )
+  INSERT INTO sales_daily AS s (day, trx_count, total_penjualan, total_modal, total_laba)
+  SELECT day, sum(trx_count), sum(total_penjualan), sum(total_modal), sum(total_laba)
+  FROM d
+  GROUP BY day
+  ON CONFLICT (day) DO UPDATE SET
+    trx_count       = s.trx_count       + EXCLUDED.trx_count,
+    total_penjualan = s.total_penjualan + EXCLUDED.total_penjualan,
+    total_modal     = s.total_modal     + EXCLUDED.total_modal,
+    total_laba      = s.total_laba      + EXCLUDED.total_laba;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  DELETE FROM sales_daily WHERE trx_count <= 0;
+  RETURN n;
+END $$;
+
+CREATE OR REPLACE FUNCTION sales_daily_rebuild(p_from date DEFAULT NULL, p_to date DEFAULT NULL)
+RETURNS bigint
+LANGUAGE plpgsql AS $$
+DECLARE
+  n bigint;
+BEGIN
+  LOCK TABLE sales IN SHARE MODE;
+  PERFORM pg_advisory_xact_lock(hashtext('sales_daily_flush'));
+  DELETE FROM sales_daily_delta
+  WHERE (p_from IS NULL OR day >= p_from) AND (p_to IS NULL OR day <= p_to);
+  DELETE FROM sales_daily
+  WHERE (p_from IS NULL OR day >= p_from) AND (p_to IS NULL OR day <= p_to);
+  INSERT INTO sales_daily (day, trx_count, total_penjualan, total_modal, total_laba)
+  SELECT sale_date, count(*),
+         COALESCE(sum(total_amount), 0), COALESCE(sum(total_cost), 0), COALESCE(sum(total_profit), 0)
+  FROM sales
+  WHERE (p_from IS NULL OR sale_date >= p_from) AND (p_to IS NULL OR sale_date <= p_to)
+  GROUP BY sale_date;
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END $$;
+
+-- sama dengan 003, rollup = sales_daily_current (termasuk delta)
+CREATE OR REPLACE FUNCTION sales_daily_check(p_from date DEFAULT NULL, p_to date DEFAULT NULL)
+RETURNS TABLE (
+  day date,
+  rollup_trx bigint, raw_trx bigint,
+  rollup_penjualan bigint, raw_penjualan bigint,
+  rollup_laba bigint, raw_laba bigint
+)
+LANGUAGE sql STABLE AS $$
+  WITH raw AS (
+    SELECT sale_date AS day, count(*)::bigint AS trx_count,
+           COALESCE(sum(total_amount), 0)::bigint AS total_penjualan,
+           COALESCE(sum(total_cost), 0)::bigint   AS total_modal,
+           COALESCE(sum(total_profit), 0)::bigint AS total_laba
+    FROM sales
+    WHERE (p_from IS NULL OR sale_date >= p_from) AND (p_to IS NULL OR sale_date <= p_to)
+    GROUP BY sale_date
+  ), r AS (
+    SELECT * FROM sales_daily_current c
+    WHERE (p_from IS NULL OR c.day >= p_from) AND (p_to IS NULL OR c.day <= p_to)
+  )
+  SELECT COALESCE(r.day, raw.day),
+         r.trx_count, raw.trx_count,
+         r.total_penjualan, raw.total_penjualan,
+         r.total_laba, raw.total_laba
+  FROM r
+  FULL JOIN raw ON raw.day = r.day
+  WHERE (r.trx_count, r.total_penjualan, r.total_modal, r.total_laba)
+        IS DISTINCT FROM
+        (raw.trx_count, raw.total_penjualan, raw.total_modal, raw.total_laba)
+  ORDER BY 1
+$$;
@@ -0,0 +1,120 @@
+"""
+Cache hasil laporan di memori (per proses), TTL + LRU.
+
+Key = (endpoint, from, to, ...). Range yang sudah lewat (to < hari ini)
+jarang berubah → TTL panjang; range yang mencakup hari ini masih
+bertambah tiap ada penjualan → TTL pendek.
+
+Invalidasi terarah: penjualan/edit pada tanggal D membuang semua entri
+yang range-nya mencakup D; perubahan yang tidak terikat tanggal (mis.
+hapus pembeli → nama pembeli di transaksi lama) membuang semuanya.
+Penulisan dari proses lain sampai lewat NOTIFY (migrasi 009) →
+apply_notify().
+
+Tanggal disimpan & dibandingkan sebagai datetime.date (string, date dan
+datetime diterima), bukan string: '2020-1-5' vs '2020-01-05' atau
+'2020-01-05T10:00' tidak boleh lolos invalidasi.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+
+
+def as_date(value):
+    """date/datetime/string ISO → date; None kalau tidak bisa dibaca."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).strip()).date()
+    except ValueError:
+        pass
+    try:
+        y, m, d = str(value).strip().split("-")
+        return date(int(y), int(m), int(d))
+    except ValueError:
+        return None
+
+
+class ReportCache:
+    def __init__(self, maxsize: int = 128, ttl: float = 600, today_ttl: float = 15):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._today_ttl = today_ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()   # key -> (expires_at, from, to, value)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._maxsize > 0
+
+    def get(self, key):
+        """Return nilai yang masih berlaku, atau None."""
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None or hit[0] <= now:
+                if hit is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return hit[3]
+
+    def put(self, key, from_date, to_date, value):
+        if not self.enabled:
+            return
+        from_date, to_date = as_date(from_date), as_date(to_date)
+        if from_date is None or to_date is None:
+            return   # range yang tidak bisa diinvalidasi tidak di-cache
+        ttl = self._today_ttl if to_date >= date.today() else self._ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, from_date, to_date, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate_date(self, day):
+        """Buang entri yang range-nya mencakup `day` (YYYY-MM-DD / date)."""
+        self.invalidate_range(day, day)
+
+    def invalidate_range(self, from_date, to_date):
+        """Buang entri yang range-nya beririsan dengan from_date..to_date."""
+        from_date, to_date = as_date(from_date), as_date(to_date)
+        if from_date is None or to_date is None:
+            self.clear()   # tidak tahu tanggalnya → buang semua
+            return
+        with self._lock:
+            stale = [k for k, (_, f, t, _v) in self._data.items() if f <= to_date and from_date <= t]
+            for k in stale:
+                del self._data[k]
+            self.invalidations += len(stale)
+
+    def apply_notify(self, payload: str):
+        """Payload NOTIFY report_cache: 'YYYY-MM-DD' atau '*' (semua)."""
+        if payload == "*":
+            self.clear()
+        else:
+            self.invalidate_date(payload)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "maxsize": self._maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+            "invalidations": self.invalidations,
+        }
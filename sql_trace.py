@@ -0,0 +1,185 @@
+"""
+Tracing SQL opsional: fingerprint statement, lama, jumlah baris dan route
+pemanggil, untuk semua query yang lewat cursor pool (TimedCursor di app.py).
+
+  - fingerprint : SQL dinormalisasi (literal/parameter → ?, daftar IN
+                  diringkas, spasi & komentar dibuang). Parameter tidak
+                  pernah disimpan atau di-log.
+  - slow log    : query >= slow_ms dicatat ke log + disimpan N terakhir
+  - N+1         : fingerprint yang sama dijalankan >= n_plus_one kali dalam
+                  satu request (query di dalam loop) → dicatat per route
+
+Nonaktif secara default dan bisa dinyalakan/dimatikan saat jalan tanpa
+restart lewat file flag: semua proses (worker gunicorn, wa_worker) membaca
+isi file itu paling lama tiap `check_sec` detik. "1" = aktif, "0" = mati,
+tidak ada file = ikut default (SQL_TRACE). Angka statistik per proses.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from functools import lru_cache
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql: str):
+    """SQL → (id 8 hex, teks ternormalisasi). SQL di app.py konstan → hampir selalu dari cache."""
+    s = _COMMENT.sub(" ", sql)
+    s = _STRING.sub("?", s)
+    s = _PARAM.sub("?", s)
+    s = _NUMBER.sub("?", s)
+    s = _LIST.sub("(?..)", s)
+    s = _SPACE.sub(" ", s).strip()
+    return hashlib.md5(s.encode()).hexdigest()[:8], s
+
+
+class SqlTracer:
+    def __init__(self, default: bool = False, slow_ms: float = 200, n_plus_one: int = 10,
+                 flag_file: str = None, check_sec: float = 1.0, max_fingerprints: int = 500,
+                 window: int = 200, logger: logging.Logger = None):
+        self.log = logger or logging.getLogger(__name__)
+        self.default = default
+        self.enabled = default
+        self.slow_ms = slow_ms
+        self.n_plus_one = n_plus_one
+        self.flag_file = flag_file
+        self._check_sec = check_sec
+        self._next_check = 0.0
+        self._max_fp = max_fingerprints
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._reset()
+        self._slow = deque(maxlen=window)
+        self._n1 = deque(maxlen=window)
+
+    def _reset(self):
+        self._stats = {}            # fp id -> dict agregat
+        self._n1_routes = Counter() # (route, fp id) -> jumlah request yang kena
+        self.dropped = 0
+        self.since = time.time()
+
+    # ---------- toggle ----------
+    def poll(self):
+        """Baca file flag (paling sering tiap check_sec). Return status aktif."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return self.enabled
+        self._next_check = now + self._check_sec
+        enabled = self.default
+        if self.flag_file:
+            try:
+                with open(self.flag_file) as f:
+                    enabled = f.read().strip() == "1"
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.log.warning("sql trace flag unreadable: %s", e)
+        if enabled != self.enabled:
+            self.log.info("sql trace %s pid=%s", "on" if enabled else "off", os.getpid())
+            self.enabled = enabled
+        return enabled
+
+    def set_enabled(self, enabled: bool):
+        """Tulis file flag (berlaku untuk semua proses) dan terapkan langsung di proses ini."""
+        if self.flag_file:
+            tmp = f"{self.flag_file}.{os.getpid()}"
+            with open(tmp, "w") as f:
+                f.write("1" if enabled else "0")
+            os.replace(tmp, self.flag_file)
+        self.enabled = enabled
+        self._next_check = time.monotonic() + self._check_sec
+
+    # ---------- per request (N+1) ----------
+    def begin(self):
+        self._local.counts = Counter()
+
+    def end(self, route: str):
+        counts = getattr(self._local, "counts", None)
+        self._local.counts = None
+        if not counts:
+            return
+        repeated = [(fp, n) for fp, n in counts.items() if n >= self.n_plus_one]
+        if not repeated:
+            return
+        with self._lock:
+            for fp, n in repeated:
+                self._n1_routes[(route, fp)] += 1
+                sql = self._stats.get(fp, {}).get("sql", "")
+                self._n1.append({"at": time.time(), "route": route, "fingerprint": fp,
+                                 "count": n, "sql": sql})
+        for fp, n in repeated:
+            self.log.warning("sql N+1 route=%s fp=%s x%s", route, fp, n)
+
+    # ---------- record ----------
+    def record(self, sql: str, ms: float, rows, route: str):
+        fp, norm = fingerprint(sql)
+        counts = getattr(self._local, "counts", None)
+        # FETCH berulang dari satu cursor bernama = streaming, bukan N+1
+        if counts is not None and not sql.startswith("FETCH "):
+            counts[fp] += 1
+        with self._lock:
+            st = self._stats.get(fp)
+            if st is None and len(self._stats) < self._max_fp:
+                st = self._stats[fp] = {"sql": norm, "calls": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                        "rows": 0, "slow": 0, "routes": Counter()}
+            elif st is None:
+                self.dropped += 1   # fingerprint baru setelah batas: hanya slow log
+            if st is not None:
+                st["calls"] += 1
+                st["total_ms"] += ms
+                st["max_ms"] = max(st["max_ms"], ms)
+                st["rows"] += rows if rows and rows > 0 else 0
+                st["routes"][route] += 1
+            slow = ms >= self.slow_ms
+            if slow:
+                if st is not None:
+                    st["slow"] += 1
+                self._slow.append({"at": time.time(), "route": route, "fingerprint": fp,
+                                   "ms": round(ms, 2), "rows": rows, "sql": norm})
+        if slow:
+            self.log.warning("slow query %.1fms route=%s rows=%s fp=%s: %s", ms, route, rows, fp, norm[:300])
+
+    # ---------- report ----------
+    def report(self, limit: int = 20) -> dict:
+        with self._lock:
+            stats = [(fp, dict(st, routes=dict(st["routes"].most_common(5)))) for fp, st in self._stats.items()]
+            slow = list(self._slow)[-limit:]
+            n1 = list(self._n1)[-limit:]
+            n1_routes = self._n1_routes.most_common(limit)
+        stats.sort(key=lambda x: x[1]["total_ms"], reverse=True)
+        top = []
+        for fp, st in stats[:limit]:
+            st["fingerprint"] = fp
+            st["total_ms"] = round(st["total_ms"], 2)
+            st["max_ms"] = round(st["max_ms"], 2)
+            st["avg_ms"] = round(st["total_ms"] / st["calls"], 3) if st["calls"] else None
+            top.append(st)
+        return {
+            "enabled": self.enabled,
+            "pid": os.getpid(),
+            "since": self.since,
+            "slow_ms": self.slow_ms,
+            "n_plus_one": self.n_plus_one,
+            "fingerprints": len(stats),
+            "dropped": self.dropped,
+            "top": top,
+            "slow": slow[::-1],
+            "n_plus_one_recent": n1[::-1],
+            "n_plus_one_routes": [{"route": r, "fingerprint": fp, "requests": n} for (r, fp), n in n1_routes],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+            self._slow.clear()
+            self._n1.clear()
@@ -0,0 +1,371 @@
+"""
+Index saran di memori: barang (/api/items/suggest) dan pembeli
+(/api/buyers/suggest).
+
+Isi index = satu entri per item_key dengan statistik yang sama dengan
+tabel item_stats. Dimuat sekali dari DB, lalu diupdate langsung setiap
+penjualan_save commit, dan dimuat ulang penuh tiap `ttl` detik supaya
+penjualan dari proses lain ikut masuk.
+
+Pencarian (urutan prioritas hasil):
+  1. prefix        "indo"    → "indomie goreng"
+  2. awal kata     "goreng"  → "indomie goreng"
+  3. substring     "mie"     → "indomie goreng"
+  4. semua kata    "gor ind" → "indomie goreng"
+  5. fuzzy         "indmie"  → "indomie goreng" (huruf berurutan, boleh loncat)
+Di dalam tiap tingkat diurutkan times DESC, last_sold DESC (sama dengan SQL lama).
+
+Index pembeli (BuyerSuggestIndex) lebih sederhana: prefix nama, awal kata,
+substring, atau digit nomor HP kalau q berupa nomor ("0812" → "62812").
+"""
+import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+
+def item_key(name: str) -> str:
+    # harus sama dengan item_key di DB: lower(btrim(item_name))
+    return (name or "").strip(" ").lower()
+
+
+def _rank(e):
+    # times DESC, last_sold DESC → dipakai sebagai sort key ascending
+    return (-e["times"], _neg_str(e["last_sold"] or ""))
+
+
+def _neg_str(s: str):
+    # urut string descending tanpa reverse=True (supaya bisa digabung di tuple)
+    return tuple(-ord(c) for c in s)
+
+
+PHONE_QUERY_RE = re.compile(r"^[\d\s+()-]+$")
+
+
+def phone_query_digits(q: str):
+    """Digit nomor HP dari q ("0812-3" → "628123"), None kalau q bukan nomor."""
+    digits = re.sub(r"\D", "", q)
+    if not PHONE_QUERY_RE.match(q) or len(digits) < 3:
+        return None
+    # nomor disimpan 62xxx; user biasa mengetik 08xxx
+    if digits.startswith("0"):
+        digits = "62" + digits[1:]
+    return digits
+
+
+def _fuzzy_pattern(chars: str):
+    # huruf berurutan boleh loncat: a[^b\n]*b[^c\n]*c ...
+    # tiap [^x\n]* berhenti tepat di huruf berikutnya → tanpa backtracking
+    esc = re.escape
+    return re.compile(esc(chars[0]) + "".join("[^" + esc(c) + "\\n]*" + esc(c) for c in chars[1:]))
+
+
+class _RefreshingIndex:
+    """Muat dari loader(), muat ulang penuh di background tiap `ttl` detik."""
+    refresh_thread_name = "index-refresh"
+
+    def __init__(self, loader, ttl: float = 300):
+        self._loader = loader
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        self._refreshing = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at > 0
+
+    def load(self, rows=None):
+        raise NotImplementedError
+
+    def _mark_loaded(self):
+        # dipanggil subclass di dalam self._lock setelah isi index diganti
+        self._loaded_at = time.monotonic()
+        self._refreshing = False
+
+    def ensure_fresh(self):
+        """Muat pertama kali (blocking); kalau sudah basi, muat ulang di background."""
+        if not self.loaded:
+            self.load()
+            return
+        if self.claim_refresh():
+            threading.Thread(target=self._bg_refresh, name=self.refresh_thread_name, daemon=True).start()
+
+    def claim_refresh(self) -> bool:
+        """
+        True kalau index sudah basi dan belum ada yang memuat ulang; pemanggil
+        lalu wajib memanggil load(...) atau refresh_failed(). Dipakai app_async.py
+        yang memuat baris lewat pool async.
+        """
+        if time.monotonic() - self._loaded_at < self._ttl or self._refreshing:
+            return False
+        self._refreshing = True
+        return True
+
+    def refresh_failed(self):
+        # index lama tetap dipakai; coba lagi pada TTL berikutnya
+        self._loaded_at = time.monotonic()
+        self._refreshing = False
+
+    def _bg_refresh(self):
+        try:
+            self.load()
+        except Exception:
+            self.refresh_failed()
+
+    def _age(self):
+        return round(time.monotonic() - self._loaded_at, 1) if self.loaded else None
+
+
+class ItemSuggestIndex(_RefreshingIndex):
+    refresh_thread_name = "item-index-refresh"
+
+    def __init__(self, loader, ttl: float = 300):
+        """loader() → iterable dict baris (format sama dengan output API)."""
+        super().__init__(loader, ttl)
+        self._entries = {}      # item_key -> dict
+        self._keys = []         # item_key terurut (untuk bisect prefix)
+        self._ranked = []       # entri terurut ranking
+        self._hay = ""          # semua key urut ranking, dipisah "\n"
+        self._starts = []       # offset awal tiap key di _hay
+        self._dirty = False
+
+    # ---------- loading ----------
+    def load(self, rows=None):
+        """Isi ulang index dari loader(), atau dari `rows` kalau sudah diambil pemanggil."""
+        rows = list(self._loader() if rows is None else rows)
+        entries = {}
+        for r in rows:
+            e = dict(r)
+            e["_sum_sale"] = e["avg_sale_price"] * e["times"]
+            e["_sum_cost"] = e["avg_cost_price"] * e["times"]
+            entries[e["item_key"]] = e
+        with self._lock:
+            self._entries = entries
+            self._rebuild()
+            self._mark_loaded()
+        return len(entries)
+
+    def _rebuild(self):
+        self._keys = sorted(self._entries)
+        self._ranked = sorted(self._entries.values(), key=_rank)
+        starts, pos = [], 0
+        for e in self._ranked:
+            starts.append(pos)
+            pos += len(e["item_key"]) + 1
+        self._hay = "\n".join(e["item_key"] for e in self._ranked)
+        self._starts = starts
+        self._dirty = False
+
+    # ---------- incremental update ----------
+    def record_sale(self, sale_date: str, lines):
+        """lines: iterable (nama, beli, jual, qty) dari transaksi yang sudah commit."""
+        if not self.loaded:
+            return
+        with self._lock:
+            for nama, beli, jual, qty in lines:
+                key = item_key(nama)
+                if not key:
+                    continue
+                e = self._entries.get(key)
+                if e is None:
+                    e = self._entries[key] = {
+                        "item_key": key, "name": nama,
+                        "last_sale_price": 0, "last_cost_price": 0,
+                        "avg_sale_price": 0, "avg_cost_price": 0,
+                        "times": 0, "total_qty": 0, "last_sold": None,
+                        "_sum_sale": 0, "_sum_cost": 0,
+                    }
+                e["name"] = nama
+                e["last_sale_price"] = jual
+                e["last_cost_price"] = beli
+                e["times"] += 1
+                e["total_qty"] += qty
+                e["_sum_sale"] += jual
+                e["_sum_cost"] += beli
+                e["avg_sale_price"] = round(e["_sum_sale"] / e["times"])
+                e["avg_cost_price"] = round(e["_sum_cost"] / e["times"])
+                if not e["last_sold"] or sale_date >= e["last_sold"]:
+                    e["last_sold"] = sale_date
+            self._dirty = True
+
+    # ---------- query ----------
+    def lookup(self, nama: str):
+        """Statistik harga satu barang (entri index), atau None kalau belum ada / index belum dimuat."""
+        if not self.loaded:
+            return None
+        return self._entries.get(item_key(nama))
+
+    def search(self, q: str, limit: int = 12):
+        q = item_key(q)
+        with self._lock:
+            if self._dirty:
+                self._rebuild()
+            keys, ranked, entries = self._keys, self._ranked, self._entries
+            hay, starts = self._hay, self._starts
+
+        if not q:
+            return [_public(e) for e in ranked[:limit]]
+
+        # 1) prefix: bisect di array key terurut
+        lo = bisect_left(keys, q)
+        hi = bisect_left(keys, q + "\uffff", lo)
+        out = sorted((entries[k] for k in keys[lo:hi]), key=_rank)[:limit]
+        seen = {e["item_key"] for e in out}
+
+        # 2..5) cari di string gabungan key yang sudah urut ranking
+        #       (str.find / regex jalan di C) → hasil pertama = ranking terbaik
+        def scan(find, accept=None):
+            pos = find(0)
+            while pos >= 0 and len(out) < limit:
+                i = bisect_right(starts, pos) - 1
+                e = ranked[i]
+                if e["item_key"] not in seen and (accept is None or accept(e["item_key"])):
+                    seen.add(e["item_key"])
+                    out.append(e)
+                # lanjut dari key berikutnya
+                pos = find(starts[i + 1]) if i + 1 < len(starts) else -1
+
+        tokens = q.split()
+        chars = q.replace(" ", "")
+        scan(lambda p: hay.find(" " + q, p))                      # awal kata
+        scan(lambda p: hay.find(q, p))                            # substring
+        if len(tokens) > 1:                                       # semua kata
+            first = max(tokens, key=len)
+            scan(lambda p: hay.find(first, p), lambda k: all(t in k for t in tokens))
+        if len(chars) >= 3:                                       # fuzzy
+            pat = _fuzzy_pattern(chars)
+            def fuzzy_find(p):
+                m = pat.search(hay, p)
+                return m.start() if m else -1
+            scan(fuzzy_find)
+        return [_public(e) for e in out]
+
+    def stats(self) -> dict:
+        return {
+            "items": len(self._entries),
+            "age_sec": self._age(),
+        }
+
+
+class BuyerSuggestIndex(_RefreshingIndex):
+    """
+    Pembeli untuk typeahead checkout. Diupdate langsung saat pembeli
+    ditambah/dihapus di proses ini (upsert/remove), dan dimuat ulang penuh
+    tiap `ttl` detik untuk perubahan dari worker lain.
+    """
+    refresh_thread_name = "buyer-index-refresh"
+
+    def __init__(self, loader, ttl: float = 120):
+        """loader() → iterable dict {id, name, phone_e164}."""
+        super().__init__(loader, ttl)
+        self._entries = {}      # id -> dict
+        self._ordered = []      # entri urut nama
+        self._keys = []         # nama lower, sejajar _ordered (untuk bisect prefix)
+        self._hay = ""          # _keys dipisah "\n"
+        self._phones = ""       # digit nomor sejajar _ordered, dipisah "\n"
+        self._starts = []       # offset awal tiap entri di _hay
+        self._phone_starts = []
+        self._dirty = False
+
+    @staticmethod
+    def _entry(r) -> dict:
+        phone = r.get("phone_e164") or None
+        return {
+            "id": str(r["id"]), "name": r["name"], "phone_e164": phone,
+            "_key": (r["name"] or "").strip().lower(),
+            "_digits": re.sub(r"\D", "", phone or ""),
+        }
+
+    def load(self, rows=None):
+        rows = self._loader() if rows is None else rows
+        entries = {}
+        for r in rows:
+            e = self._entry(r)
+            entries[e["id"]] = e
+        with self._lock:
+            self._entries = entries
+            self._rebuild()
+            self._mark_loaded()
+        return len(entries)
+
+    def _rebuild(self):
+        self._ordered = sorted(self._entries.values(), key=lambda e: (e["_key"], e["id"]))
+        self._keys = [e["_key"] for e in self._ordered]
+        self._hay, self._starts = _joined(self._keys)
+        self._phones, self._phone_starts = _joined(e["_digits"] for e in self._ordered)
+        self._dirty = False
+
+    # ---------- incremental update ----------
+    def upsert(self, row):
+        """Pembeli baru/berubah yang sudah commit."""
+        if not self.loaded:
+            return
+        e = self._entry(row)
+        with self._lock:
+            self._entries[e["id"]] = e
+            self._dirty = True
+
+    def remove(self, buyer_id):
+        if not self.loaded:
+            return
+        with self._lock:
+            if self._entries.pop(str(buyer_id), None) is not None:
+                self._dirty = True
+
+    # ---------- query ----------
+    def search(self, q: str, limit: int = 10):
+        q = (q or "").strip().lower()
+        with self._lock:
+            if self._dirty:
+                self._rebuild()
+            ordered, keys = self._ordered, self._keys
+            hay, starts = self._hay, self._starts
+            phones, phone_starts = self._phones, self._phone_starts
+
+        if not q:
+            return [_public(e) for e in ordered[:limit]]
+
+        out, seen = [], set()
+
+        def scan(text, offsets, needle):
+            pos = text.find(needle)
+            while pos >= 0 and len(out) < limit:
+                i = bisect_right(offsets, pos) - 1
+                e = ordered[i]
+                if e["id"] not in seen:
+                    seen.add(e["id"])
+                    out.append(e)
+                pos = text.find(needle, offsets[i + 1]) if i + 1 < len(offsets) else -1
+
+        digits = phone_query_digits(q)
+        if digits:
+            scan(phones, phone_starts, "\n" + digits)            # awalan nomor
+            scan(phones, phone_starts, digits)                    # potongan nomor
+            return [_public(e) for e in out]
+
+        lo = bisect_left(keys, q)
+        hi = bisect_left(keys, q + "\uffff", lo)
+        for e in ordered[lo:min(hi, lo + limit)]:                 # prefix nama
+            seen.add(e["id"])
+            out.append(e)
+        scan(hay, starts, " " + q)                                # awal kata
+        scan(hay, starts, q)                                      # substring
+        return [_public(e) for e in out]
+
+    def stats(self) -> dict:
+        return {"buyers": len(self._entries), "age_sec": self._age()}
+
+
+def _joined(values):
+    """("a","bc") → ("\na\nbc", [0, 2]): offset tiap nilai termasuk "\n" di depannya."""
+    starts, pos, parts = [], 0, []
+    for v in values:
+        starts.append(pos)
+        parts.append(v)
+        pos += len(v) + 1
+    return "".join("\n" + v for v in parts), starts
+
+
+def _public(e) -> dict:
+    return {k: v for k, v in e.items() if not k.startswith("_")}
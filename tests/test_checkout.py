@@ -0,0 +1,93 @@
+import pytest
+
+from checkout import MAX_QTY, CartError, parse_cart
+
+
+def body(**kw):
+    data = {"tgl": "2025-01-10", "buyer_id": "b1", "paid_amount": 20000,
+            "items": [{"nama": "Indomie Goreng", "beli": 2500, "jual": 3000, "qty": 2}]}
+    data.update(kw)
+    return data
+
+
+def stats(last_sale, avg_sale, last_cost, avg_cost):
+    return {"last_sale_price": last_sale, "avg_sale_price": avg_sale,
+            "last_cost_price": last_cost, "avg_cost_price": avg_cost}
+
+
+def test_totals_and_column_order():
+    cart = parse_cart(body(items=[
+        {"nama": " Indomie Goreng ", "beli": 2500, "jual": 3000, "qty": 2},
+        {"nama": "Aqua", "beli": "3000", "jual": 4000.0, "qty": "1"},
+    ]))
+    # kolom = parameter INSERT ... unnest(): nama, beli, jual, qty, total, modal, laba
+    assert cart.columns == (
+        ["Indomie Goreng", "Aqua"], [2500, 3000], [3000, 4000], [2, 1],
+        [6000, 4000], [5000, 3000], [1000, 1000],
+    )
+    assert (cart.total, cart.cost, cart.profit, cart.change) == (10000, 8000, 2000, 10000)
+    assert cart.lines()[1].nama == "Aqua"
+    assert cart.warnings == []
+
+
+@pytest.mark.parametrize("data, message", [
+    ({"tgl": "2025-01-10", "items": [{}]}, "Data tidak lengkap"),
+    (body(items=[]), "Data tidak lengkap"),
+    (body(items={"nama": "x"}), "daftar"),
+    (body(tgl="10-01-2025"), "Tanggal tidak valid"),
+    (body(paid_amount=-1), "negatif"),
+    (body(items=["x"]), "Baris 1: format"),
+    (body(items=[{"nama": "  ", "beli": 1, "jual": 1, "qty": 1}]), "nama barang wajib"),
+    (body(items=[{"nama": "x" * 201, "beli": 1, "jual": 1, "qty": 1}]), "nama barang wajib"),
+    (body(items=[{"nama": "a", "beli": 1, "jual": 1, "qty": 0}]), "qty harus"),
+    (body(items=[{"nama": "a", "beli": 1, "jual": 1, "qty": MAX_QTY + 1}]), "qty harus"),
+    (body(items=[{"nama": "a", "beli": -1, "jual": 1, "qty": 1}]), "harga harus"),
+    (body(items=[{"nama": "a", "beli": 1, "jual": True, "qty": 1}]), "Harga jual harus bilangan bulat"),
+    (body(items=[{"nama": "a", "beli": 1.5, "jual": 1, "qty": 1}]), "Harga beli harus bilangan bulat"),
+    (body(items=[{"nama": "a", "beli": 1, "jual": 1, "qty": 1},
+                 {"nama": "b", "beli": 1, "jual": 1, "qty": "dua"}]), "Baris 2: Qty"),
+])
+def test_rejects(data, message):
+    with pytest.raises(CartError, match=message):
+        parse_cart(data)
+
+
+def test_rejects_too_many_lines():
+    items = [{"nama": f"b{i}", "beli": 1, "jual": 1, "qty": 1} for i in range(3)]
+    with pytest.raises(CartError, match="maksimal 2"):
+        parse_cart(body(items=items), max_lines=2)
+
+
+def test_warns_below_cost_without_lookup():
+    cart = parse_cart(body(items=[{"nama": "a", "beli": 3000, "jual": 2500, "qty": 1}]))
+    assert [w["kind"] for w in cart.warnings] == ["below_cost"]
+
+
+def test_warns_price_outlier():
+    ref = stats(3000, 3000, 2500, 2500)
+    # salah ketik satu nol: 30000 vs harga biasa 3000
+    cart = parse_cart(body(items=[{"nama": "Indomie Goreng", "beli": 2500, "jual": 30000, "qty": 1}]),
+                      lookup=lambda nama: ref)
+    assert cart.warnings == [{"line": 0, "nama": "Indomie Goreng", "kind": "sale_price",
+                              "price": 30000, "last": 3000, "avg": 3000}]
+
+
+def test_no_warning_when_close_to_either_reference():
+    # harga terakhir salah ketik, tapi rata-rata masih dekat → tidak ditandai
+    ref = stats(30000, 3100, 2500, 2500)
+    cart = parse_cart(body(items=[{"nama": "a", "beli": 2500, "jual": 3000, "qty": 1}]),
+                      lookup=lambda nama: ref)
+    assert cart.warnings == []
+
+
+def test_outlier_check_disabled():
+    ref = stats(3000, 3000, 2500, 2500)
+    cart = parse_cart(body(items=[{"nama": "a", "beli": 2500, "jual": 30000, "qty": 1}]),
+                      lookup=lambda nama: ref, outlier_ratio=0)
+    assert cart.warnings == []
+
+
+def test_unknown_item_not_flagged():
+    cart = parse_cart(body(items=[{"nama": "baru", "beli": 2500, "jual": 99000, "qty": 1}]),
+                      lookup=lambda nama: None)
+    assert cart.warnings == []
@@ -0,0 +1,99 @@
+from datetime import date, datetime
+
+import pytest
+
+import report_cache
+from report_cache import ReportCache
+
+PAST = ("2020-01-01", "2020-01-31")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(report_cache, "time", c)
+    return c
+
+
+def test_ttl_past_vs_today(clock):
+    c = ReportCache(maxsize=10, ttl=600, today_ttl=15)
+    c.put("past", *PAST, "p")
+    c.put("today", "2020-01-01", "9999-12-31", "t")
+    clock.now += 20
+    assert c.get("past") == "p"
+    assert c.get("today") is None
+    clock.now += 600
+    assert c.get("past") is None
+
+
+def test_lru_eviction(clock):
+    c = ReportCache(maxsize=2)
+    c.put("a", *PAST, 1)
+    c.put("b", *PAST, 2)
+    c.get("a")
+    c.put("c", *PAST, 3)
+    assert (c.get("a"), c.get("b"), c.get("c")) == (1, None, 3)
+
+
+def test_disabled(clock):
+    c = ReportCache(maxsize=0)
+    c.put("a", *PAST, 1)
+    assert c.get("a") is None
+
+
+def test_invalidate_date_only_overlapping(clock):
+    c = ReportCache(maxsize=10)
+    c.put("jan", "2020-01-01", "2020-01-31", 1)
+    c.put("feb", "2020-02-01", "2020-02-29", 2)
+    c.put("q1", "2020-01-01", "2020-03-31", 3)
+    c.invalidate_date("2020-01-31")
+    assert (c.get("jan"), c.get("feb"), c.get("q1")) == (None, 2, None)
+    assert c.invalidations == 2
+
+
+def test_invalidate_range(clock):
+    c = ReportCache(maxsize=10)
+    c.put("jan", "2020-01-01", "2020-01-31", 1)
+    c.put("mar", "2020-03-01", "2020-03-31", 3)
+    c.invalidate_range("2020-01-15", "2020-02-15")
+    assert (c.get("jan"), c.get("mar")) == (None, 3)
+
+
+def test_apply_notify(clock):
+    c = ReportCache(maxsize=10)
+    c.put("jan", "2020-01-01", "2020-01-31", 1)
+    c.put("feb", "2020-02-01", "2020-02-29", 2)
+    c.apply_notify("2020-02-10")
+    assert (c.get("jan"), c.get("feb")) == (1, None)
+    c.apply_notify("*")
+    assert c.get("jan") is None
+
+
+def test_dates_normalised(clock):
+    c = ReportCache(maxsize=10)
+    c.put("jan", "2020-1-1", "2020-01-31T23:59:00", 1)
+    c.put("feb", date(2020, 2, 1), "2020-02-29", 2)
+    c.invalidate_date("2020-01-05")
+    assert (c.get("jan"), c.get("feb")) == (None, 2)
+    c.invalidate_range(datetime(2020, 2, 10, 8, 30), "2020-2-11")
+    assert c.get("feb") is None
+    c.put("mar", "2020-03-01", "2020-03-31", 3)
+    c.apply_notify("2020-03-31T10:00:00+07:00")
+    assert c.get("mar") is None
+
+
+def test_unparseable_dates(clock):
+    c = ReportCache(maxsize=10)
+    c.put("bad", "kemarin", "2020-01-31", 1)
+    assert c.get("bad") is None
+    c.put("jan", *PAST, 1)
+    c.apply_notify("bukan-tanggal")
+    assert c.get("jan") is None
@@ -0,0 +1,20 @@
+from sql_trace import fingerprint
+
+
+def test_literals_and_params_normalized():
+    a = fingerprint("SELECT * FROM sales WHERE id = %s AND total > 100 -- komentar")
+    b = fingerprint("select  *  FROM sales\n WHERE id = 'abc' AND total > 5")
+    assert a[1] == "SELECT * FROM sales WHERE id = ? AND total > ?"
+    assert a[0] == fingerprint("SELECT * FROM sales WHERE id = $1 AND total > 7")[0]
+    assert b[1] == "select * FROM sales WHERE id = ? AND total > ?"
+
+
+def test_in_list_collapsed():
+    short = fingerprint("SELECT 1 FROM t WHERE id IN (%s, %s)")
+    long = fingerprint("SELECT 1 FROM t WHERE id IN (1, 2, 3, 4)")
+    assert short == long
+    assert "(?..)" in short[1]
+
+
+def test_identifiers_with_digits_kept():
+    assert fingerprint("SELECT * FROM sales_p2025_01")[1] == "SELECT * FROM sales_p2025_01"
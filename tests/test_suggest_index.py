@@ -0,0 +1,63 @@
+from suggest_index import BuyerSuggestIndex, ItemSuggestIndex
+
+
+def row(name, times, last_sold="2025-01-01", price=3000, cost=2500):
+    return {"item_key": name.lower(), "name": name, "last_sale_price": price, "last_cost_price": cost,
+            "avg_sale_price": price, "avg_cost_price": cost, "times": times, "total_qty": times,
+            "last_sold": last_sold}
+
+
+def index(*rows):
+    idx = ItemSuggestIndex(loader=lambda: rows)
+    idx.load()
+    return idx
+
+
+def keys(results):
+    return [r["item_key"] for r in results]
+
+
+def test_search_levels_in_priority_order():
+    idx = index(row("Indomie Goreng", 5), row("Mie Sedaap", 50), row("Goreng Pisang", 1),
+                row("Kopi Indocafe", 9))
+    assert keys(idx.search("indo")) == ["indomie goreng", "kopi indocafe"]    # prefix, lalu awal kata
+    assert keys(idx.search("goreng")) == ["goreng pisang", "indomie goreng"]
+    assert keys(idx.search("mie")) == ["mie sedaap", "indomie goreng"]        # prefix, lalu substring
+    assert keys(idx.search("gor ind")) == ["indomie goreng"]                  # semua kata
+    assert keys(idx.search("indmie")) == ["indomie goreng"]                   # fuzzy
+
+
+def test_empty_query_ranked_by_times():
+    idx = index(row("a", 1), row("b", 3), row("c", 2))
+    assert keys(idx.search("", limit=2)) == ["b", "c"]
+
+
+def test_lookup_and_record_sale():
+    idx = ItemSuggestIndex(loader=lambda: [row("Aqua", 2)])
+    assert idx.lookup("aqua") is None              # belum dimuat
+    idx.load()
+    idx.record_sale("2025-02-01", [("AQUA ", 2600, 4000, 3), ("Teh Botol", 3000, 5000, 1)])
+    aqua = idx.lookup(" Aqua")
+    assert (aqua["times"], aqua["last_sale_price"], aqua["last_sold"]) == (3, 4000, "2025-02-01")
+    assert aqua["avg_sale_price"] == round((3000 * 2 + 4000) / 3)
+    assert keys(idx.search("teh")) == ["teh botol"]
+
+
+def buyers(*rows):
+    idx = BuyerSuggestIndex(loader=lambda: [{"id": i, "name": n, "phone_e164": p} for i, n, p in rows])
+    idx.load()
+    return idx
+
+
+def test_buyer_name_and_phone():
+    idx = buyers((1, "Budi Santoso", "6281234"), (2, "Ani", None), (3, "Santi", "6285599"))
+    assert [b["name"] for b in idx.search("san")] == ["Santi", "Budi Santoso"]   # prefix, awal kata
+    assert [b["id"] for b in idx.search("0812")] == ["1"]                        # 08xx → 62xx
+    assert [b["id"] for b in idx.search("5599")] == ["3"]                        # potongan nomor
+
+
+def test_buyer_upsert_remove():
+    idx = buyers((1, "Budi", None))
+    idx.upsert({"id": 2, "name": "Bunga", "phone_e164": ""})
+    idx.remove(1)
+    assert [b["name"] for b in idx.search("bu")] == ["Bunga"]
@@ -0,0 +1,58 @@
+import pytest
+
+import wa_scheduler
+from wa_scheduler import SendScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(wa_scheduler, "time", c)
+    return c
+
+
+def test_rate_with_burst(clock):
+    s = SendScheduler(rate=2, burst=3, max_wait=60)
+    # 3 langsung (burst), sesudahnya berjarak 1/rate
+    delays = [s.acquire(f"62{i}")[1] for i in range(5)]
+    assert delays == pytest.approx([0, 0, 0, 0.5, 0.5])
+
+
+def test_bucket_refills_after_idle(clock):
+    s = SendScheduler(rate=1, burst=2, max_wait=60)
+    for i in range(4):
+        s.acquire(f"62{i}")
+    clock.now += 10
+    assert s.acquire("629")[1] == 0
+    assert s.acquire("628")[1] == 0
+
+
+def test_phone_spacing(clock):
+    s = SendScheduler(rate=0, phone_spacing=5, max_wait=60)
+    assert s.acquire("62811")[1] == 0
+    assert s.acquire("62812")[1] == 0           # nomor lain tidak ikut menunggu
+    assert s.acquire("62811")[1] == pytest.approx(5)
+
+
+def test_defer_beyond_max_wait_is_spread(clock):
+    s = SendScheduler(rate=0, phone_spacing=10, max_wait=1)
+    assert s.acquire("62811") == (True, 0)
+    ok1, retry1 = s.acquire("62811")
+    ok2, retry2 = s.acquire("62811")
+    assert (ok1, ok2) == (False, False)
+    assert retry1 == pytest.approx(10)
+    # job tertunda berikutnya untuk nomor sama dijadwalkan satu jarak sesudahnya
+    assert retry2 == pytest.approx(20)
+    assert s.stats()["deferred"] == 2
+    assert s.stats()["sent"] == 1
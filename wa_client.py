@@ -0,0 +1,68 @@
+"""
+Client HTTP ke gateway WA. Satu-satunya pengirim adalah wa_worker.py
+(lewat app.send_wa_message); checkout dan tombol kirim ulang di app.py
+hanya memasukkan nota ke outbox.
+
+Satu requests.Session per proses: koneksi TCP/TLS ke gateway dipakai ulang
+(keep-alive) alih-alih handshake baru tiap nota. Pool koneksi dibatasi
+`pool_size`; kalau semua sedang dipakai, pemanggil menunggu (pool_block)
+supaya jumlah koneksi ke gateway tidak melebihi batas itu.
+
+Retry di sini hanya untuk kegagalan yang pasti belum mengirim pesan:
+gagal connect dan balasan 429/503 (gateway menolak sebelum memproses,
+menghormati Retry-After). 502/504 dan read timeout TIDAK di-retry: proxy
+bisa timeout setelah gateway mengirim pesannya, jadi POST ulang bisa
+membuat nota dobel; keputusan kirim ulang diserahkan ke outbox (wa_worker)
+dengan backoff-nya.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUS = (429, 503)
+
+
+class WAClient:
+    def __init__(self, url: str, pool_size: int = 10, connect_timeout: float = 3.05,
+                 read_timeout: float = 10, retries: int = 2, backoff: float = 0.5):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self._retry = Retry(
+            total=retries, connect=retries, read=0, other=0, status=retries,
+            status_forcelist=RETRY_STATUS,
+            allowed_methods=frozenset({"POST"}),
+            backoff_factor=backoff,
+            respect_retry_after_header=True,
+            raise_on_status=False,   # status akhir tetap dikembalikan sebagai response
+        )
+        self._pool_size = pool_size
+        self._lock = threading.Lock()
+        self._session = None
+
+    @property
+    def session(self) -> requests.Session:
+        # dibuat saat pertama dipakai → aman untuk proses hasil fork (gunicorn)
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    s = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size,
+                                          pool_block=True, max_retries=self._retry)
+                    s.mount("http://", adapter)
+                    s.mount("https://", adapter)
+                    self._session = s
+        return self._session
+
+    def send(self, number: str, message: str):
+        """Kirim satu pesan. Return (ok, status_code, body); error jaringan dilempar."""
+        resp = self.session.post(self.url, json={"number": number, "message": message},
+                                 timeout=self.timeout)
+        return 200 <= resp.status_code < 300, resp.status_code, resp.text
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
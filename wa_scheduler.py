@@ -0,0 +1,104 @@
+"""
+Penjadwal kiriman WA di dalam proses wa_worker.py.
+
+Dua batas sekaligus:
+  - global  : token bucket `rate` kiriman/detik dengan `burst` (melindungi gateway)
+  - per nomor: jarak minimal `phone_spacing` detik antar kiriman ke nomor yang
+               sama (mis. klik kirim ulang berkali-kali, atau kirim ulang massal
+               untuk satu pembeli dengan banyak transaksi)
+
+Kiriman yang melewati batas tidak gagal: acquire() memesan slot berikutnya
+lalu menunggu (antre). Kalau slot itu lebih jauh dari `max_wait`, acquire()
+menolak dan mengembalikan kapan job sebaiknya dicoba lagi; worker lalu
+menunda job di outbox (wa_next_try_at) supaya thread dan lease job tidak
+tertahan lama. Job yang ditunda diberi waktu coba berbeda-beda (berjarak
+phone_spacing / 1/rate) supaya tidak kembali serentak lalu ditunda lagi.
+
+Token bucket diimplementasikan sebagai GCRA: cukup satu "theoretical
+arrival time" (tat), tanpa thread pengisi token.
+
+Status penjadwal ada di memori proses, jadi batasnya per proses: dua
+wa_worker berarti dua kali WA_RATE_PER_SEC dan jarak per nomor tidak
+berlaku lintas proses. wa_worker harus jalan satu replika saja (lihat
+docker-compose.yml); naikkan WA_WORKER_CONCURRENCY, bukan jumlah proses.
+"""
+import threading
+import time
+from collections import deque
+
+
+class SendScheduler:
+    def __init__(self, rate: float, burst: int = 1, phone_spacing: float = 0,
+                 max_wait: float = 30, window: int = 1024):
+        self._interval = 1 / rate if rate > 0 else 0   # 0 = tanpa batas global
+        self._tau = self._interval * max(0, burst - 1)
+        self._spacing = phone_spacing
+        self._max_wait = max_wait
+        self._lock = threading.Lock()
+        self._tat = 0.0
+        self._phone_next = {}                          # nomor -> slot paling awal berikutnya
+        self._phone_later = {}                         # nomor -> waktu coba job tertunda berikutnya
+        self._later = 0.0                              # idem, untuk batas global
+        self._waits = deque(maxlen=window)             # lama antre (ms), N terakhir
+        self.rate = rate
+        self.waiting = 0
+        self.sent = 0
+        self.deferred = 0
+
+    def acquire(self, phone: str, stop_event: threading.Event = None):
+        """
+        Tunggu giliran kirim ke `phone`. Return (True, detik menunggu), atau
+        (False, detik sampai job dicoba lagi) kalau melebihi max_wait.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if len(self._phone_next) + len(self._phone_later) > 10000:
+                self._prune(now)
+            slot = max(now, self._tat - self._tau, self._phone_next.get(phone, 0.0))
+            if slot - now > self._max_wait:
+                later = max(slot, self._later, self._phone_later.get(phone, 0.0))
+                self._later = later + self._interval
+                self._phone_later[phone] = later + self._spacing
+                self.deferred += 1
+                return False, later - now
+            if self._interval:
+                self._tat = max(self._tat, slot) + self._interval
+            if self._spacing:
+                self._phone_next[phone] = slot + self._spacing
+            self.waiting += 1
+
+        delay = slot - now
+        try:
+            if delay > 0:
+                if stop_event is not None:
+                    stop_event.wait(delay)
+                else:
+                    time.sleep(delay)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                self.sent += 1
+                self._waits.append(delay * 1000)
+        return True, delay
+
+    def _prune(self, now: float):
+        # nomor yang jedanya sudah lewat tidak perlu diingat lagi
+        self._phone_next = {p: t for p, t in self._phone_next.items() if t > now}
+        self._phone_later = {p: t for p, t in self._phone_later.items() if t > now}
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+
+        def pct(p):
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))], 1) if waits else None
+
+        return {
+            "rate_per_sec": self.rate or None,
+            "waiting": self.waiting,
+            "sent": self.sent,
+            "deferred": self.deferred,
+            "phones_spaced": len(self._phone_next),
+            "queue_wait_ms": {"p50": pct(.5), "p95": pct(.95), "p99": pct(.99),
+                              "max": round(waits[-1], 1) if waits else None},
+        }
@@ -0,0 +1,344 @@
+"""
+Worker outbox nota WA.
+
+Checkout hanya menandai sales.wa_status='pending' (lihat penjualan_save).
+Proses ini yang mengambil antrean, mengirim ke gateway WA, lalu update
+wa_status/wa_sent_at. Gagal → dicoba ulang dengan backoff eksponensial
+sampai WA_MAX_ATTEMPTS, setelah itu wa_status='failed'. Balasan 4xx (selain
+408/429) berarti permintaannya sendiri ditolak → langsung 'failed' tanpa
+retry (lihat permanent_failure).
+
+Semua nota masuk lewat outbox ini: checkout, kirim ulang satu transaksi
+dan kirim ulang massal (POST /laporan/resend-wa).
+
+Job diambil per batch (WA_BATCH_SIZE): header + item semua nota dalam
+batch dibaca dengan dua query (= ANY(ids)), lalu dikirim paralel
+(WA_WORKER_CONCURRENCY) lewat penjadwal (wa_scheduler.py): maksimal
+WA_RATE_PER_SEC kiriman/detik (burst WA_BURST) dan jarak minimal
+WA_PHONE_SPACING_SEC antar kiriman ke nomor yang sama. Kiriman yang harus
+menunggu lebih lama dari WA_MAX_QUEUE_WAIT_SEC ditunda di outbox.
+Statistik antrean dicatat ke log tiap WA_STATS_LOG_SEC. Batas itu per
+proses → jalankan tepat satu wa_worker (compose: deploy.replicas: 1).
+
+Jalankan terpisah dari web:
+
+    python wa_worker.py
+
+Untuk tes lokal pakai gateway palsu (fake_wa.py) dan set
+WA_API_URL=http://127.0.0.1:5055/send-message
+
+Koneksi ke gateway dipakai ulang lintas job lewat app.wa_client (lihat
+wa_client.py); WA_POOL_SIZE sebaiknya >= WA_WORKER_CONCURRENCY.
+
+WA_METRICS_PORT (mis. 9101) membuka GET /metrics format Prometheus untuk
+proses ini: lama kirim ke gateway, hasil job, query DB dan statistik penjadwal.
+"""
+import os
+import random
+import signal
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg
+
+from metrics import serve as serve_metrics
+from wa_scheduler import SendScheduler
+
+from app import (
+    app, db_conn, build_receipt_text, metrics, receipt_cache_stats, send_wa_message, wa_number, wa_client,
+    WA_OUTBOX_CHANNEL, probe_sales_schema, sales_partitioned,
+)
+
+CONCURRENCY  = int(os.getenv("WA_WORKER_CONCURRENCY", "4"))
+BATCH_SIZE   = int(os.getenv("WA_BATCH_SIZE", str(CONCURRENCY * 5)))
+RATE_PER_SEC = float(os.getenv("WA_RATE_PER_SEC", "5"))     # 0 = tanpa batas
+BURST        = int(os.getenv("WA_BURST", "5"))
+PHONE_SPACING = float(os.getenv("WA_PHONE_SPACING_SEC", "10"))
+MAX_ATTEMPTS = int(os.getenv("WA_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE = float(os.getenv("WA_BACKOFF_BASE_SEC", "5"))
+BACKOFF_MAX  = float(os.getenv("WA_BACKOFF_MAX_SEC", "600"))
+# selama lease, job "dipegang" worker ini; kalau worker mati job kembali due.
+# Harus > BATCH_SIZE / RATE_PER_SEC (lama satu batch terkirim).
+LEASE_SEC    = int(os.getenv("WA_LEASE_SEC", "60"))
+POLL_SEC     = float(os.getenv("WA_POLL_SEC", "5"))
+# antre lebih lama dari ini → job ditunda di DB, thread & lease tidak tertahan
+MAX_QUEUE_WAIT = float(os.getenv("WA_MAX_QUEUE_WAIT_SEC", str(LEASE_SEC / 4)))
+STATS_LOG_SEC = float(os.getenv("WA_STATS_LOG_SEC", "60"))
+METRICS_PORT = int(os.getenv("WA_METRICS_PORT", "0"))      # 0 = tanpa endpoint /metrics
+
+stop_event = threading.Event()
+
+scheduler = SendScheduler(RATE_PER_SEC, burst=BURST, phone_spacing=PHONE_SPACING,
+                          max_wait=MAX_QUEUE_WAIT)
+
+WA_JOBS = metrics.counter("waserda_wa_jobs_total", "Job outbox WA per hasil.", ("result",))
+
+
+@metrics.collector
+def scheduler_metrics():
+    st = scheduler.stats()
+    yield "waserda_wa_scheduler_waiting", "gauge", "Kiriman yang sedang antre di penjadwal.", {}, st["waiting"]
+    yield "waserda_wa_scheduler_sent_total", "counter", "Kiriman yang lolos penjadwal.", {}, st["sent"]
+    yield "waserda_wa_scheduler_deferred_total", "counter", "Kiriman yang ditunda ke outbox.", {}, st["deferred"]
+
+
+def claim_jobs(limit: int):
+    """Ambil maksimal `limit` job pending yang sudah due. Return [(sale_id, sale_date, attempts)]."""
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE sales s
+                SET wa_attempts = s.wa_attempts + 1,
+                    wa_next_try_at = now() + make_interval(secs => %s)
+                WHERE (s.id, s.sale_date) IN (
+                    SELECT id, sale_date FROM sales
+                    WHERE wa_status = 'pending'
+                      AND (wa_next_try_at IS NULL OR wa_next_try_at <= now())
+                    ORDER BY wa_next_try_at NULLS FIRST, created_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING s.id, s.sale_date, s.wa_attempts
+            """, (LEASE_SEC, limit))
+            return cur.fetchall()
+
+
+def load_receipts(cur, sale_ids, sale_dates):
+    """
+    Nota untuk banyak transaksi sekaligus (2 query). Return {sale_id: {phone, message}}.
+    `sale_dates` (tanggal transaksi job) membatasi pencarian ke partisi bulan itu.
+    """
+    cur.execute("""
+        SELECT s.id, s.sale_date, s.created_at,
+               COALESCE(b.name,'') AS buyer_name,
+               COALESCE(b.phone_e164,'') AS phone,
+               s.total_amount, s.paid_amount, s.change_amount
+        FROM sales s
+        LEFT JOIN buyers b ON b.id = s.buyer_id
+        WHERE s.id = ANY(%s) AND s.sale_date = ANY(%s)
+    """, (sale_ids, sale_dates))
+    headers = cur.fetchall()
+    if sales_partitioned():
+        cur.execute("""
+            SELECT sale_id, item_name, sale_price, qty
+            FROM sale_items
+            WHERE sale_id = ANY(%s) AND sale_date = ANY(%s)
+            ORDER BY sale_id, created_at
+        """, (sale_ids, sale_dates))
+    else:
+        # sebelum migrasi 008: sale_items belum punya sale_date
+        cur.execute("""
+            SELECT sale_id, item_name, sale_price, qty
+            FROM sale_items
+            WHERE sale_id = ANY(%s)
+            ORDER BY sale_id, created_at
+        """, (sale_ids,))
+    items = defaultdict(list)
+    for sid, n, p, q in cur.fetchall():
+        items[sid].append({"nama": n, "jual": int(p or 0), "qty": int(q or 0)})
+
+    receipts = {}
+    for sid, sale_date, created_at, buyer_name, phone, total_amount, paid_amount, change_amount in headers:
+        receipts[sid] = {
+            "phone": phone,
+            # di-memo per (sale_id, isi): retry/kirim ulang nota sama tidak render ulang
+            "message": build_receipt_text(
+                sale_id=sid,
+                created_at=created_at,
+                sale_date=sale_date.isoformat() if hasattr(sale_date, "isoformat") else str(sale_date),
+                buyer_name=buyer_name or "",
+                items=items[sid],
+                total=int(total_amount or 0),
+                paid=int(paid_amount or 0),
+                change=int(change_amount or 0)
+            ),
+        }
+    return receipts
+
+
+def backoff_seconds(attempts: int) -> float:
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** max(0, attempts - 1)))
+    # jitter supaya retry tidak serentak setelah gateway pulih
+    return delay * random.uniform(0.8, 1.2)
+
+
+# Kebijakan retry per status HTTP hanya diputuskan di sini; wa_client cuma
+# mengulang kegagalan yang pasti belum mengirim (connect, 429/503).
+#   408, 429, 5xx (termasuk 502/504) → backoff outbox. 502/504 bisa terjadi
+#     setelah gateway mengirim pesannya, jadi ada risiko nota dobel; dipilih
+#     dobel daripada nota hilang, dan jaraknya sudah backoff, bukan langsung.
+#   4xx lain (nomor/format ditolak, auth) → percobaan berikutnya pasti sama.
+def permanent_failure(status_code: int) -> bool:
+    return 400 <= status_code < 500 and status_code not in (408, 429)
+
+
+def mark_result(sale_id, sale_date, attempts: int, ok: bool, error: str = None, final: bool = False):
+    """`final` = gagal permanen: langsung 'failed' walau percobaan belum habis."""
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            if ok:
+                cur.execute("""
+                    UPDATE sales
+                    SET wa_status='sent', wa_sent_at=now(),
+                        wa_next_try_at=NULL, wa_last_error=NULL
+                    WHERE id=%s AND sale_date=%s
+                """, (sale_id, sale_date))
+            elif final or attempts >= MAX_ATTEMPTS:
+                cur.execute("""
+                    UPDATE sales
+                    SET wa_status='failed', wa_next_try_at=NULL, wa_last_error=%s
+                    WHERE id=%s AND sale_date=%s
+                """, (error, sale_id, sale_date))
+            else:
+                cur.execute("""
+                    UPDATE sales
+                    SET wa_next_try_at = now() + make_interval(secs => %s),
+                        wa_last_error=%s
+                    WHERE id=%s AND sale_date=%s
+                """, (backoff_seconds(attempts), error, sale_id, sale_date))
+
+
+def defer(sale_id, sale_date, delay: float):
+    """Belum dapat giliran kirim: kembalikan ke outbox, tidak dihitung sebagai percobaan."""
+    with db_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE sales
+                SET wa_attempts = GREATEST(wa_attempts - 1, 0),
+                    wa_next_try_at = now() + make_interval(secs => %s)
+                WHERE id=%s AND sale_date=%s
+            """, (delay, sale_id, sale_date))
+
+
+def deliver(job) -> str:
+    """Return "sent" / "failed" / "deferred"."""
+    sale_id, sale_date, attempts, receipt = job
+    number = wa_number(receipt["phone"])
+    go, delay = scheduler.acquire(number, stop_event)
+    if not go:
+        app.logger.info("WA defer sale=%s %.1fs (rate/phone spacing)", sale_id, delay)
+        try:
+            defer(sale_id, sale_date, delay)
+        except Exception:
+            # lease habis → job akan diambil lagi
+            app.logger.exception("WA defer failed sale=%s", sale_id)
+        return "deferred"
+    try:
+        ok, status_code, body = send_wa_message(number, receipt["message"])
+        app.logger.info("WA send sale=%s attempt=%s status=%s body=%s", sale_id, attempts, status_code, body)
+        mark_result(sale_id, sale_date, attempts, ok, None if ok else f"HTTP {status_code}",
+                    final=not ok and permanent_failure(status_code))
+        return "sent" if ok else "failed"
+    except Exception as e:
+        app.logger.warning("WA send sale=%s attempt=%s failed: %s", sale_id, attempts, e)
+        try:
+            mark_result(sale_id, sale_date, attempts, False, str(e)[:500])
+        except Exception:
+            # lease habis → job akan diambil lagi
+            app.logger.exception("WA mark result failed sale=%s", sale_id)
+        return "failed"
+
+
+def deliver_batch(jobs, pool):
+    """Muat nota semua job sekaligus, lalu kirim paralel lewat `pool`."""
+    ids = [sale_id for sale_id, _, _ in jobs]
+    dates = sorted({sale_date for _, sale_date, _ in jobs})
+    try:
+        with db_conn() as conn:
+            with conn.cursor() as cur:
+                receipts = load_receipts(cur, ids, dates)
+                # nomor pembeli sudah dihapus setelah checkout
+                no_phone = [sid for sid, r in receipts.items() if not r["phone"]]
+                if no_phone:
+                    cur.execute("UPDATE sales SET wa_status='none', wa_next_try_at=NULL "
+                                "WHERE id = ANY(%s) AND sale_date = ANY(%s)", (no_phone, dates))
+    except Exception as e:
+        # lease habis → job akan diambil lagi
+        app.logger.warning("WA load receipts failed (%s jobs): %s", len(jobs), e)
+        return
+
+    todo = [(sid, sale_date, attempts, receipts[sid]) for sid, sale_date, attempts in jobs
+            if sid in receipts and receipts[sid]["phone"]]
+    t0 = time.perf_counter()
+    done = Counter(pool.map(deliver, todo))
+    for result, n in done.items():
+        WA_JOBS.inc(result, amount=n)
+    if no_phone:
+        WA_JOBS.inc("no_phone", amount=len(no_phone))
+    app.logger.info("WA batch jobs=%s sent=%s failed=%s deferred=%s no_phone=%s in %.1fs",
+                    len(jobs), done["sent"], done["failed"], done["deferred"], len(no_phone),
+                    time.perf_counter() - t0)
+
+
+def listen_conn():
+    try:
+        conn = psycopg.connect(app.config["DATABASE_URL"], autocommit=True)
+        conn.execute(f"LISTEN {WA_OUTBOX_CHANNEL}")
+        return conn
+    except Exception as e:
+        app.logger.warning("LISTEN %s gagal, pakai polling saja: %s", WA_OUTBOX_CHANNEL, e)
+        return None
+
+
+def wait_for_work(conn):
+    """Tunggu NOTIFY dari checkout, maksimal POLL_SEC. Return koneksi (baru jika putus)."""
+    if conn is None or conn.closed:
+        stop_event.wait(POLL_SEC)
+        return listen_conn()
+    try:
+        for _ in conn.notifies(timeout=POLL_SEC, stop_after=1):
+            pass
+        return conn
+    except psycopg.OperationalError as e:
+        app.logger.warning("LISTEN connection lost: %s", e)
+        conn.close()
+        return listen_conn()
+
+
+def run():
+    app.logger.info("wa_worker start concurrency=%s batch=%s rate=%s/s burst=%s phone_spacing=%ss max_attempts=%s",
+                    CONCURRENCY, BATCH_SIZE, RATE_PER_SEC or "-", BURST, PHONE_SPACING, MAX_ATTEMPTS)
+    if METRICS_PORT:
+        serve_metrics(metrics, METRICS_PORT)
+        app.logger.info("wa_worker metrics on :%s/metrics", METRICS_PORT)
+    try:
+        probe_sales_schema()
+    except Exception as e:
+        app.logger.warning("sales schema probe failed: %s", e)
+    conn = listen_conn()
+    next_stats = time.monotonic() + STATS_LOG_SEC
+    with ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix="wa") as pool:
+        while not stop_event.is_set():
+            if time.monotonic() >= next_stats:
+                app.logger.info("WA scheduler stats %s receipts %s", scheduler.stats(), receipt_cache_stats())
+                next_stats = time.monotonic() + STATS_LOG_SEC
+            try:
+                jobs = claim_jobs(BATCH_SIZE)
+            except Exception as e:
+                app.logger.warning("claim WA jobs failed: %s", e)
+                stop_event.wait(POLL_SEC)
+                continue
+            if jobs:
+                # tunggu satu batch selesai → paling banyak CONCURRENCY kiriman bersamaan
+                deliver_batch(jobs, pool)
+                continue
+            conn = wait_for_work(conn)
+    if conn is not None:
+        conn.close()
+    wa_client.close()
+    app.logger.info("wa_worker stop %s", scheduler.stats())
+
+
+def _stop(signum, frame):
+    stop_event.set()
+
+
+if __name__ == "__main__":
+    import logging
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    app.logger.setLevel(logging.INFO)
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    run()